@@ -0,0 +1,25 @@
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004_cache_events'
+down_revision = '0003_drop_token_file_column'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'cache_events',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('topic', sa.String(length=40), nullable=False),
+        sa.Column('key', sa.String(length=200), nullable=True),
+        sa.Column('origin', sa.String(length=80), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_cache_events_created_at', 'cache_events', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cache_events_created_at', table_name='cache_events')
+    op.drop_table('cache_events')
@@ -3,14 +3,72 @@
 # - REST calls based on access token, includes error/rate limiter/circuit breaker utilities
 
 import os, time
-import threading
+import logging
+import uuid
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Any, Optional, Callable, Iterator, Literal, List
+from typing import Dict, Any, Optional, Callable, Iterator, Literal, List, Tuple
+from urllib.parse import urlsplit
 
 import httpx
 from app.config import cfg
+from app.context import add_timing, get_client_request_id, get_current_user_meta, report_progress, timed
+from app.coordination import get_backend
+from app.metrics import METRICS
+from app.tracing import span
+
+logger = logging.getLogger("mcp.graph")
 
 GRAPH = cfg.graph_base_url
+_GRAPH_PATH = urlsplit(GRAPH).path.rstrip("/")
+
+# -----------------------------
+# Upstream metrics (labels use route templates, never raw URLs)
+# -----------------------------
+_ROUTE_LITERALS = frozenset({"me", "users", "todo", "lists", "tasks", "delta", "checklistItems", "linkedResources", "attachments", "$batch"})
+_METHODS = frozenset({"GET", "POST", "PATCH", "PUT", "DELETE", ""})
+
+
+def _route_template(url: str) -> str:
+    """/me/todo/lists/AAMk.../tasks?$skiptoken=.. → /me/todo/lists/{id}/tasks"""
+    path = urlsplit(url).path
+    if _GRAPH_PATH and path.startswith(_GRAPH_PATH):
+        path = path[len(_GRAPH_PATH):]
+    segs = [s if s.rstrip("()") in _ROUTE_LITERALS else "{id}" for s in path.split("/") if s]
+    return "/" + "/".join(segs)
+
+
+def _is_status(v: str) -> bool:
+    return v == "error" or (len(v) == 3 and v.isdigit())
+
+
+_G_LATENCY = METRICS.histogram(
+    "graph_request_duration_ms", "Graph HTTP attempt latency by route template/method", ("route", "method"),
+    values={"method": _METHODS},
+)
+_G_RESPONSES = METRICS.counter(
+    "graph_responses_total", "Graph HTTP responses by route template/method/status (error = no response)",
+    ("route", "method", "status"), values={"method": _METHODS, "status": _is_status},
+)
+_G_RETRIES = METRICS.counter(
+    "graph_retries_total", "Graph retries by route template/status and wait source", ("route", "status", "source"),
+    values={"status": _is_status, "source": frozenset({"retry_after", "backoff"})},
+)
+_G_RETRY_WAIT = METRICS.summary(
+    "graph_retry_wait_ms", "Time slept before Graph retries (Retry-After or backoff)", ("source",),
+    values={"source": frozenset({"retry_after", "backoff"})},
+)
+_G_RATE_WAIT = METRICS.histogram(
+    "graph_ratelimit_wait_ms", "Time spent waiting in the client-side rate limiter",
+    buckets=(1, 5, 10, 50, 100, 200, 500, 1000, 2000, 5000),
+)
+_G_CIRCUIT = METRICS.counter(
+    "graph_circuit_open_total", "Graph calls rejected (rejected) / circuit trips (opened)", ("event",),
+    values={"event": frozenset({"rejected", "opened"})},
+)
+_G_BYTES = METRICS.histogram(
+    "graph_response_bytes", "Graph response body size in bytes", ("route",),
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
 
 
 def _headers(token: str) -> Dict[str, str]:
@@ -30,52 +88,58 @@ class GraphAPIError(Exception):
         self.message = message
 
 
+def _coord_key() -> str:
+    """Rate-limit/breaker scope: the caller's token profile (Graph throttles per user/app)."""
+    meta = get_current_user_meta() or {}
+    if meta.get("token_profile"):
+        return "p:" + meta["token_profile"]
+    if meta.get("token_id") is not None:
+        return f"t:{meta['token_id']}"
+    return "default"
+
+
 class _RateLimiter:
-    """Simple token bucket rate limiter"""
+    """Token bucket per profile; state lives in the coordination backend (shared across workers)"""
     def __init__(self, rate_per_sec: float, burst: int):
         self.capacity = burst
-        self.tokens = burst
         self.rate = rate_per_sec
-        self.last = time.time()
-        self.lock = threading.Lock()
-
-    def acquire(self) -> None:
-        with self.lock:
-            now = time.time()
-            delta = now - self.last
-            self.last = now
-            self.tokens = min(self.capacity, self.tokens + delta * self.rate)
-            if self.tokens < 1:
-                sleep_for = (1 - self.tokens) / self.rate
-                time.sleep(sleep_for)
-                self.tokens = 0
-            else:
-                self.tokens -= 1
+
+    def acquire(self, key: str = "default") -> float:
+        """Take one token; returns seconds slept waiting for it."""
+        try:
+            sleep_for = get_backend().reserve(key, self.rate, self.capacity)
+        except Exception:
+            logger.warning("rate limiter backend unavailable; not limiting", exc_info=True)
+            return 0.0
+        if sleep_for > 0:
+            time.sleep(sleep_for)
+        return sleep_for
 
 
 class _CircuitBreaker:
-    """Simple circuit breaker"""
+    """Circuit breaker per profile; state lives in the coordination backend (shared across workers)"""
     def __init__(self, fail_threshold: int = 3, cooldown_sec: int = 5):
-        self.fail = 0
-        self.open_until = 0.0
         self.fail_threshold = fail_threshold
         self.cooldown_sec = cooldown_sec
-        self.lock = threading.Lock()
 
-    def before(self) -> None:
-        with self.lock:
-            now = time.time()
-            if now < self.open_until:
-                raise GraphAPIError(503, "CircuitOpen", "circuit open")
+    def before(self, key: str = "default") -> None:
+        try:
+            open_until = get_backend().open_until(key)
+        except Exception:
+            logger.warning("circuit backend unavailable; treating circuit as closed", exc_info=True)
+            return
+        if time.time() < open_until:
+            _G_CIRCUIT.inc(event="rejected")
+            raise GraphAPIError(503, "CircuitOpen", "circuit open")
 
-    def record(self, ok: bool) -> None:
-        with self.lock:
-            if ok:
-                self.fail = 0
-            else:
-                self.fail += 1
-                if self.fail >= self.fail_threshold:
-                    self.open_until = time.time() + self.cooldown_sec
+    def record(self, ok: bool, key: str = "default") -> None:
+        try:
+            opened = get_backend().record(key, ok, self.fail_threshold, self.cooldown_sec)
+        except Exception:
+            logger.warning("circuit backend unavailable; outcome not recorded", exc_info=True)
+            return
+        if opened:
+            _G_CIRCUIT.inc(event="opened")
 
 
 _rate_limiter = _RateLimiter(rate_per_sec=cfg.rate_per_sec, burst=cfg.rate_burst)
@@ -109,11 +173,23 @@ def _request(method: Callable, url: str, token: str, *, max_retries: Optional[in
     """429/5xx backoff + rate limit + circuit breaker + standardized error handling
     - Honors Retry-After header when present
     - max_retries uses env (default 2) when None
+    - Sends client-request-id (request correlation) and records Graph's request-id on the span
     """
-    _circuit.before()
-    _rate_limiter.acquire()
+    route = _route_template(url)
+    crid = get_client_request_id() or str(uuid.uuid4())
+    with span("graph.request", route=route, client_request_id=crid) as sp:
+        return _send(method, url, token, route, crid, sp, max_retries=max_retries, **kwargs)
+
+
+def _send(method: Callable, url: str, token: str, route: str, crid: str, sp, *, max_retries: Optional[int], **kwargs) -> Dict[str, Any]:
+    key = _coord_key()
+    _circuit.before(key)
+    waited = _rate_limiter.acquire(key)
+    _G_RATE_WAIT.observe(waited * 1000)
+    add_timing("graph_wait", waited * 1000)
 
     headers = _headers(token)
+    headers["client-request-id"] = crid
     if "headers" in kwargs:
         headers.update(kwargs["headers"])
         kwargs.pop("headers")
@@ -123,14 +199,33 @@ def _request(method: Callable, url: str, token: str, *, max_retries: Optional[in
     backoff_factor = float(os.getenv("HTTP_BACKOFF_FACTOR", "2.0"))
 
     for attempt in range(retries + 1):
+        t0 = time.perf_counter()
         try:
             r = method(_HTTPX, url, headers=headers, **kwargs)
         except Exception as e:
-            _circuit.record(False)
+            try:
+                m = e.request.method  # httpx.RequestError carries the request
+            except Exception:
+                m = ""
+            _G_LATENCY.observe((time.perf_counter() - t0) * 1000, route=route, method=m)
+            _G_RESPONSES.inc(route=route, method=m, status="error")
+            _circuit.record(False, key)
             raise GraphAPIError(500, "Client", str(e)[:120])
 
+        m = r.request.method
+        io_ms = (time.perf_counter() - t0) * 1000
+        add_timing("graph_io", io_ms)
+        _G_LATENCY.observe(io_ms, route=route, method=m)
+        _G_RESPONSES.inc(route=route, method=m, status=str(r.status_code))
+        _G_BYTES.observe(len(r.content), route=route)
+        if sp is not None:
+            sp.set("http.method", m)
+            sp.set("http.status_code", r.status_code)
+            sp.set("graph.request_id", r.headers.get("request-id"))
+            sp.set("attempts", attempt + 1)
+
         if r.status_code < 400:
-            _circuit.record(True)
+            _circuit.record(True, key)
             return r.json() if r.content else {}
 
         try:
@@ -142,12 +237,16 @@ def _request(method: Callable, url: str, token: str, *, max_retries: Optional[in
 
         if r.status_code in (429, 500, 502, 503, 504) and attempt < retries:
             ra = r.headers.get("Retry-After")
-            wait = _parse_retry_after(ra) if ra else backoff
-            time.sleep(max(0.0, wait))
+            wait = max(0.0, _parse_retry_after(ra) if ra else backoff)
+            source = "retry_after" if ra else "backoff"
+            _G_RETRIES.inc(route=route, status=str(r.status_code), source=source)
+            _G_RETRY_WAIT.observe(wait * 1000, source=source)
+            add_timing("graph_wait", wait * 1000)
+            time.sleep(wait)
             backoff *= backoff_factor
             continue
 
-        _circuit.record(False)
+        _circuit.record(False, key)
         raise GraphAPIError(r.status_code, code, (msg or "")[:120])
 
 # -----------------------------
@@ -202,7 +301,7 @@ def delete_list(token: str, list_id: str) -> Dict[str, Any]:
 
 def delete_list_if_match(token: str, list_id: str, etag: str) -> Dict[str, Any]:
     try:
-        _request(lambda c, u, **kw: c.delete(u, headers={"If-Match": etag}, **kw), f"{GRAPH}/me/todo/lists/{list_id}", token)
+        _request(lambda c, u, **kw: c.delete(u, **kw), f"{GRAPH}/me/todo/lists/{list_id}", token, headers={"If-Match": etag})
         return {"success": True}
     except GraphAPIError as e:
         return {"error": str(e), "code": e.code, "status": e.status}
@@ -231,9 +330,13 @@ def list_tasks_all(token: str, list_id: str, filter_expr: Optional[str] = None,
         params["$top"] = str(page_size)
 
     url = f"{GRAPH}/me/todo/lists/{list_id}/tasks"
+    pages = count = 0
     while True:
         data = _request(lambda c, u, **kw: c.get(u, params=params if u == url else None, **kw), url, token)
         items = data.get("value", []) or []
+        pages += 1
+        count += len(items)
+        report_progress(count, message=f"page {pages}: {count} tasks")
         for it in items:
             yield it
         next_link = data.get("@odata.nextLink")
@@ -280,9 +383,10 @@ def update_task(token: str, list_id: str, task_id: str, patch: Dict[str, Any]) -
 
 def update_task_if_match(token: str, list_id: str, task_id: str, patch: Dict[str, Any], etag: str) -> Dict[str, Any]:
     return _request(
-        lambda c, u, **kw: c.patch(u, json=patch, headers={"If-Match": etag}, **kw),
+        lambda c, u, **kw: c.patch(u, json=patch, **kw),
         f"{GRAPH}/me/todo/lists/{list_id}/tasks/{task_id}",
         token,
+        headers={"If-Match": etag},
     )
 
 
@@ -295,7 +399,7 @@ def delete_task(token: str, list_id: str, task_id: str) -> Dict[str, Any]:
 
 def delete_task_if_match(token: str, list_id: str, task_id: str, etag: str) -> Dict[str, Any]:
     try:
-        _request(lambda c, u, **kw: c.delete(u, headers={"If-Match": etag}, **kw), f"{GRAPH}/me/todo/lists/{list_id}/tasks/{task_id}", token)
+        _request(lambda c, u, **kw: c.delete(u, **kw), f"{GRAPH}/me/todo/lists/{list_id}/tasks/{task_id}", token, headers={"If-Match": etag})
         return {"success": True}
     except GraphAPIError as e:
         return {"error": str(e), "code": e.code, "status": e.status}
@@ -313,21 +417,30 @@ def delta_tasks(token: str, list_id: str, delta_link: Optional[str] = None) -> D
     return _request(lambda c, u, **kw: c.get(u, **kw), url, token)
 
 
+def _walk_delta(token: str, url: str, what: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Follow @odata.nextLink to the end of a delta round; reports progress once per page."""
+    items: List[Dict[str, Any]] = []
+    pages = 0
+    while True:
+        data = _request(lambda c, u, **kw: c.get(u, **kw), url, token)
+        items.extend(data.get("value", []) or [])
+        pages += 1
+        report_progress(len(items), message=f"delta page {pages}: {len(items)} {what}")
+        nxt = data.get("@odata.nextLink")
+        if not nxt:
+            return items, data.get("@odata.deltaLink")
+        url = nxt
+
+
 def walk_delta_lists(token: str, delta_link: Optional[str] = None) -> Dict[str, Any]:
-    """Returns both deltaLink/nextLink for caller to store and reuse"""
-    data = delta_lists(token, delta_link=delta_link)
-    return {
-        "value": data.get("value", []),
-        "deltaLink": data.get("@odata.deltaLink") or data.get("@odata.nextLink"),
-    }
+    """All changes since delta_link (every page) and the deltaLink to store for the next round"""
+    items, link = _walk_delta(token, delta_link or f"{GRAPH}/me/todo/lists/delta", "lists")
+    return {"value": items, "deltaLink": link}
 
 
 def walk_delta_tasks(token: str, list_id: str, delta_link: Optional[str] = None) -> Dict[str, Any]:
-    data = delta_tasks(token, list_id, delta_link=delta_link)
-    return {
-        "value": data.get("value", []),
-        "deltaLink": data.get("@odata.deltaLink") or data.get("@odata.nextLink"),
-    }
+    items, link = _walk_delta(token, delta_link or f"{GRAPH}/me/todo/lists/{list_id}/tasks/delta", "tasks")
+    return {"value": items, "deltaLink": link}
 
 # -----------------------------
 # Convenience/Business Verbs
@@ -403,6 +516,7 @@ def batch_get_tasks_chunked(token: str, list_id: str, task_ids: List[str], *, ch
         chunk = task_ids[i:i+chunk_size]
         res = batch_get_tasks(token, list_id, chunk)
         out.extend(res.get("responses", []))
+        report_progress(min(i + chunk_size, len(task_ids)), total=len(task_ids), message=f"batch chunk {i // chunk_size + 1} done")
     return {"responses": out}
 
 
@@ -457,7 +571,8 @@ def list_tasks_lite(token: str, list_id: str, top: int = 20) -> Dict[str, Any]:
         "$top": str(top),
     }
     data = _request(lambda c, u, **kw: c.get(u, params=params, **kw), f"{GRAPH}/me/todo/lists/{list_id}/tasks", token)
-    items = [_project_task(x) for x in data.get("value", [])]
+    with timed("project"):
+        items = [_project_task(x) for x in data.get("value", [])]
     return {"items": items, "next": data.get("@odata.nextLink")}
 
 
@@ -468,9 +583,13 @@ def list_tasks_all_lite(token: str, list_id: str, page_size: int = 100) -> Dict[
     }
     url = f"{GRAPH}/me/todo/lists/{list_id}/tasks"
     out: List[Dict[str, Any]] = []
+    pages = 0
     while True:
         data = _request(lambda c, u, **kw: c.get(u, params=params if u == url else None, **kw), url, token)
-        out.extend(_project_task(x) for x in data.get("value", []) or [])
+        with timed("project"):
+            out.extend(_project_task(x) for x in data.get("value", []) or [])
+        pages += 1
+        report_progress(len(out), message=f"page {pages}: {len(out)} tasks")
         nxt = data.get("@odata.nextLink")
         if not nxt:
             break
@@ -490,6 +609,7 @@ def snooze_task_lite(token: str, list_id: str, task_id: str, remind_at_iso: str,
 
 
 def walk_delta_tasks_lite(token: str, list_id: str, delta_link: Optional[str] = None) -> Dict[str, Any]:
-    data = delta_tasks(token, list_id, delta_link=delta_link)
-    items = [_project_task(x) for x in data.get("value", []) or []]
-    return {"items": items, "delta": data.get("@odata.deltaLink") or data.get("@odata.nextLink")}
+    raw, link = _walk_delta(token, delta_link or f"{GRAPH}/me/todo/lists/{list_id}/tasks/delta", "tasks")
+    with timed("project"):
+        items = [_project_task(x) for x in raw]
+    return {"items": items, "delta": link}
@@ -0,0 +1,217 @@
+ # affinity.py (affinity front router for multi-worker deployments)
+ # - Run N server processes on their own ports and this ASGI app in front of them:
+ #     AFFINITY_UPSTREAMS=http://127.0.0.1:8091,http://127.0.0.1:8092 uvicorn app.affinity:app --port 8081
+ # - Every request goes to the worker picked by rendezvous (HRW) hashing of its affinity key, so one
+ #   principal's MCP sessions, SSE channels, token/RBAC caches and Graph connections stay on one worker
+ # - Key: the API key (AFFINITY_BY=key; no DB access) or the key's token profile (AFFINITY_BY=profile;
+ #   keys sharing a profile share a worker). An `X-Affinity-Key` request header overrides both
+ # - Rebalancing: a worker that refuses connections or fails its probe leaves the ring; only its principals
+ #   move (to their next-ranked worker) and they move back once the probe passes again
+ # - Responses are streamed through (SSE included); `x-mcp-worker` carries the chosen worker's index
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+
+from app import invalidation
+from app.apikeys import provided_key, resolve_key
+from app.config import cfg
+
+logger = logging.getLogger("mcp.affinity")
+
+# Not forwarded in either direction (per-connection, or recomputed by the next hop)
+_HOP_BY_HOP = frozenset({
+    b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization", b"te", b"trailers",
+    b"transfer-encoding", b"upgrade", b"host", b"content-length",
+})
+_PROFILE_TTL_SEC = 60.0
+_PROFILE_CACHE_MAX = 10000
+_PROBE_PATH = "/mcp/capabilities"  # unauthenticated, no DB
+
+
+def _score(upstream: str, key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{upstream}\0{key}".encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def rank(key: str, upstreams: Sequence[str]) -> List[str]:
+    """Upstreams in rendezvous order for `key`: the first owns it, the rest are its fallbacks in order."""
+    return sorted(upstreams, key=lambda u: _score(u, key), reverse=True)
+
+
+class AffinityRouter:
+    """ASGI app proxying to the worker that owns each request's affinity key."""
+
+    def __init__(
+        self,
+        upstreams: Sequence[str],
+        *,
+        by: str = "key",
+        health_sec: float = 2.0,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        if by not in ("key", "profile"):
+            raise ValueError(f"AFFINITY_BY must be key or profile, got {by!r}")
+        self.upstreams = [u.rstrip("/") for u in upstreams]
+        self.by = by
+        self.health_sec = health_sec
+        self.down: Dict[str, float] = {}  # upstream → time it left the ring
+        self._client = client
+        self._profiles: Dict[str, Tuple[str, float]] = {}  # api key → (affinity key, expires)
+        self._health_task: Optional[asyncio.Task] = None
+        self._unsubscribe: Optional[Callable[[], None]] = None
+
+    # ---- routing -----------------------------------------------------
+    def candidates(self, key: str) -> List[str]:
+        """Live upstreams in preference order (all of them if every worker looks down)."""
+        ranked = rank(key, self.upstreams)
+        live = [u for u in ranked if u not in self.down]
+        return live or ranked
+
+    async def affinity_key(self, request: Request) -> str:
+        explicit = request.headers.get("x-affinity-key")
+        if explicit:
+            return "x:" + explicit
+        key = provided_key(request, request.headers.get("x-api-key"), request.headers.get("authorization"))
+        if not key:
+            return "anon"
+        if self.by == "profile":
+            return await self._profile_key(key)
+        return "k:" + key
+
+    async def _profile_key(self, key: str) -> str:
+        now = time.monotonic()
+        hit = self._profiles.get(key)
+        if hit is not None and hit[1] > now:
+            return hit[0]
+        try:
+            ok, meta = await asyncio.to_thread(resolve_key, key)
+        except Exception:
+            logger.warning("affinity: key lookup failed; routing by key", exc_info=True)
+            return "k:" + key
+        profile = (meta or {}).get("token_profile") if ok else None
+        if not profile and ok and (meta or {}).get("token_id") is not None:
+            profile = f"id:{meta['token_id']}"
+        out = "p:" + profile if profile else "k:" + key
+        if len(self._profiles) >= _PROFILE_CACHE_MAX:
+            self._profiles.clear()
+        self._profiles[key] = (out, now + _PROFILE_TTL_SEC)
+        return out
+
+    def mark_down(self, upstream: str) -> None:
+        if upstream not in self.down:
+            self.down[upstream] = time.time()
+            logger.warning(json.dumps({"event": "affinity.down", "upstream": upstream, "live": len(self.upstreams) - len(self.down)}))
+
+    def mark_up(self, upstream: str) -> None:
+        if self.down.pop(upstream, None) is not None:
+            logger.info(json.dumps({"event": "affinity.up", "upstream": upstream, "live": len(self.upstreams) - len(self.down)}))
+
+    # ---- health ------------------------------------------------------
+    async def probe(self) -> None:
+        async def one(upstream: str) -> None:
+            try:
+                r = await self._client.get(upstream + _PROBE_PATH, timeout=1.0)
+                ok = r.status_code < 500
+            except httpx.HTTPError:
+                ok = False
+            (self.mark_up if ok else self.mark_down)(upstream)
+
+        await asyncio.gather(*(one(u) for u in self.upstreams))
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_sec)
+            try:
+                await self.probe()
+            except Exception:
+                logger.exception("affinity probe failed")
+
+    async def startup(self) -> None:
+        if not self.upstreams:
+            raise RuntimeError("AFFINITY_UPSTREAMS is empty (comma-separated worker base URLs)")
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(connect=2.0, read=None, write=30.0, pool=5.0),  # read=None: SSE streams
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=64),
+            )
+        if self.by == "profile":
+            if self._unsubscribe is None:
+                self._unsubscribe = invalidation.subscribe("apikey", lambda _principal: self._profiles.clear())
+            invalidation.start()
+        if self.health_sec > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def shutdown(self) -> None:
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+        if self._health_task is not None:
+            self._health_task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+
+    # ---- proxy -------------------------------------------------------
+    async def _forward(self, upstream: str, request: Request, body: bytes) -> StreamingResponse:
+        headers = [(k, v) for k, v in request.scope["headers"] if k not in _HOP_BY_HOP]
+        if request.client is not None:
+            headers.append((b"x-forwarded-for", request.client.host.encode("latin-1")))
+        url = upstream + request.scope.get("raw_path", request.url.path.encode()).decode("latin-1")
+        query = request.scope.get("query_string", b"")
+        if query:
+            url += "?" + query.decode("latin-1")
+        req = self._client.build_request(request.method, url, headers=headers, content=body)
+        resp = await self._client.send(req, stream=True)
+        out = StreamingResponse(resp.aiter_raw(), status_code=resp.status_code, background=BackgroundTask(resp.aclose))
+        out.raw_headers = [(k, v) for k, v in resp.headers.raw if k.lower() not in _HOP_BY_HOP]
+        out.raw_headers.append((b"x-mcp-worker", str(self.upstreams.index(upstream)).encode()))
+        return out
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    try:
+                        await self.startup()
+                    except Exception as e:
+                        await send({"type": "lifespan.startup.failed", "message": str(e)})
+                        return
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await self.shutdown()
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+        request = Request(scope, receive)
+        if request.url.path == "/_affinity":
+            status = {"by": self.by, "upstreams": self.upstreams, "down": sorted(self.down)}
+            await JSONResponse(status)(scope, receive, send)
+            return
+        body = await request.body()  # buffered: a refused connection is retried on the next-ranked worker
+        for upstream in self.candidates(await self.affinity_key(request)):
+            try:
+                resp = await self._forward(upstream, request, body)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                # never reached the worker → safe to retry elsewhere, even for non-idempotent calls
+                self.mark_down(upstream)
+                continue
+            except httpx.HTTPError as e:
+                # the worker may have acted on it (died mid-request): report, don't replay
+                logger.warning(json.dumps({"event": "affinity.upstream_error", "upstream": upstream, "error": type(e).__name__}))
+                await JSONResponse({"detail": "upstream worker error"}, status_code=502)(scope, receive, send)
+                return
+            await resp(scope, receive, send)
+            return
+        await JSONResponse({"detail": "no upstream worker available"}, status_code=503)(scope, receive, send)
+
+
+app = AffinityRouter(cfg.affinity_upstreams, by=cfg.affinity_by, health_sec=cfg.affinity_health_sec)
@@ -1,9 +1,52 @@
 import secrets
-from typing import Dict, Any, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Any, Optional, Tuple
 
 from app.config import cfg
 from app.db import get_engine, get_session
-from app.models import ApiKey, Token
+
+if TYPE_CHECKING:
+    from starlette.requests import Request
+
+
+def _models():
+    # app.models pulls in SQLAlchemy: import on first key lookup, not at server import
+    from app import models
+    return models
+
+
+def provided_key(request: "Request", x_api_key: Optional[str], authorization: Optional[str]) -> Optional[str]:
+    """API key presented by a request (shared by the server and the affinity router)."""
+    # Priority: X-API-Key header -> Authorization(Bearer/Basic) -> Cookie -> query param (?x-api-key|?api_key|?apikey)
+    if x_api_key:
+        return x_api_key
+    if authorization:
+        lower = authorization.lower()
+        if lower.startswith("bearer "):
+            return authorization.split(" ", 1)[1].strip()
+        if lower.startswith("basic "):
+            # Accept Basic user:pass, we take pass as api key
+            import base64
+            try:
+                raw = authorization.split(" ", 1)[1].strip()
+                dec = base64.b64decode(raw).decode("utf-8", "ignore")
+                if ":" in dec:
+                    return dec.split(":", 1)[1]
+            except Exception:
+                pass
+    # Cookie lookup
+    try:
+        ck = request.cookies.get("x-api-key") or request.cookies.get("api_key") or request.cookies.get("apikey")
+        if ck:
+            return ck
+    except Exception:
+        pass
+    qp = request.query_params.get("x-api-key")
+    if qp:
+        return qp
+    qp = request.query_params.get("api_key") or request.query_params.get("apikey")
+    if qp:
+        return qp
+    return None
 
 
 def list_keys() -> Dict[str, Any]:
@@ -11,7 +54,7 @@ def list_keys() -> Dict[str, Any]:
         raise RuntimeError("DB_URL must be configured for api-keys store")
     out: Dict[str, Any] = {}
     with get_session() as s:
-        for rec in s.query(ApiKey).all():
+        for rec in s.query(_models().ApiKey).all():
             out[rec.key] = {
                 "template": rec.template or "",
                 "allowed_tools": (rec.allowed_tools or {}).get("items", []) if isinstance(rec.allowed_tools, dict) else [],
@@ -25,11 +68,19 @@ def list_keys() -> Dict[str, Any]:
     return out
 
 
+def any_keys() -> bool:
+    """True if at least one generated key exists (open dev-mode check; reads one row, not the table)."""
+    if not get_engine():
+        return False
+    with get_session() as s:
+        return s.query(_models().ApiKey.key).limit(1).first() is not None
+
+
 def delete_key(key: str) -> bool:
     if not get_engine():
         raise RuntimeError("DB_URL must be configured for api-keys store")
     with get_session() as s:
-        rec = s.get(ApiKey, key)
+        rec = s.get(_models().ApiKey, key)
         if not rec:
             return False
         s.delete(rec)
@@ -37,9 +88,9 @@ def delete_key(key: str) -> bool:
 
 
 def _all_tool_names() -> list[str]:
-    # late import to avoid cyc deps
-    from app.tools import TOOLS_BY_NAME
-    return list(TOOLS_BY_NAME.keys())
+    # late import to avoid cyc deps; REGISTRY is re-read per call (hot reload swaps it)
+    from app import tools
+    return list(tools.REGISTRY.by_name)
 
 
 def _lite_tool_names() -> list[str]:
@@ -54,8 +105,9 @@ def _lite_tool_names() -> list[str]:
     # include read-only sync helpers if present
     for t in ("todo.sync.delta_lists", "todo.sync.delta_tasks", "todo.sync.walk_delta_lists", "todo.sync.walk_delta_tasks"):
         base.add(t)
-    from app.tools import TOOLS_BY_NAME
-    return [t for t in base if t in TOOLS_BY_NAME]
+    from app import tools
+    by_name = tools.REGISTRY.by_name
+    return [t for t in base if t in by_name]
 
 
 def generate_api_key(
@@ -100,7 +152,7 @@ def generate_api_key(
     if not get_engine():
         raise RuntimeError("DB_URL must be configured for api-keys store")
     with get_session() as s:
-        s.add(ApiKey(
+        s.add(_models().ApiKey(
             key=key,
             template=meta.get("template"),
             allowed_tools={"items": meta.get("allowed_tools", [])},
@@ -120,7 +172,7 @@ def resolve_key(key: Optional[str]) -> Tuple[bool, Optional[Dict[str, Any]]]:
     if not get_engine():
         return False, None
     with get_session() as s:
-        rec = s.get(ApiKey, key)
+        rec = s.get(_models().ApiKey, key)
         if not rec:
             return False, None
         meta = {
@@ -144,7 +196,7 @@ def update_key(key: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     if not get_engine():
         raise RuntimeError("DB_URL must be configured for api-keys store")
     with get_session() as s:
-        rec = s.get(ApiKey, key)
+        rec = s.get(_models().ApiKey, key)
         if not rec:
             return None
         allowed_fields = {
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dataclasses import dataclass, field
 from typing import List
 from dotenv import load_dotenv
@@ -37,6 +38,8 @@ class Config:
 
     # tool schema dir
     tool_schema_dir: str = os.getenv("TOOL_SCHEMA_DIR") or os.path.join(os.path.dirname(__file__), "tools")
+    # poll interval for hot-reloading TOOL_SCHEMA_DIR (0 = disabled; use POST /admin/tools/reload)
+    tool_schema_watch_sec: float = float(os.getenv("TOOL_SCHEMA_WATCH_SEC", "0"))
 
     # http/client
     http_timeout: int = int(os.getenv("HTTP_TIMEOUT", "30"))
@@ -52,13 +55,68 @@ class Config:
     cb_fails: int = int(os.getenv("CB_FAILS", "3"))
     cb_cooldown_sec: int = int(os.getenv("CB_COOLDOWN_SEC", "5"))
 
+    # rate-limit / breaker state shared across workers: local (per process) | sqlite (per node) | redis
+    coord_backend: str = os.getenv("COORD_BACKEND", "local").strip().lower()
+    coord_sqlite_path: str = os.getenv("COORD_SQLITE_PATH") or os.path.join(tempfile.gettempdir(), "mcp-ms-todo-coord.sqlite")
+    coord_redis_url: str = os.getenv("COORD_REDIS_URL", "redis://localhost:6379/0")
+    coord_redis_prefix: str = os.getenv("COORD_REDIS_PREFIX", "mcp:coord:")
+
+    # affinity router (app.affinity): worker base URLs, what to hash (key|profile), worker probe interval
+    affinity_upstreams: List[str] = field(default_factory=lambda: _get_env_list("AFFINITY_UPSTREAMS", []))
+    affinity_by: str = os.getenv("AFFINITY_BY", "key").strip().lower()
+    affinity_health_sec: float = float(os.getenv("AFFINITY_HEALTH_SEC", "2.0"))
+
     # features
     sse_enabled: bool = _get_env_bool("SSE_ENABLED", True)
+    # Server-Timing header on /mcp responses (per-phase breakdown)
+    server_timing: bool = _get_env_bool("SERVER_TIMING", True)
+    # GET /mcp event channels: replay buffer per channel, idle channel TTL, max channels
+    sse_buffer_size: int = int(os.getenv("SSE_BUFFER_SIZE", "256"))
+    sse_channel_ttl_sec: float = float(os.getenv("SSE_CHANNEL_TTL_SEC", "300"))
+    sse_max_channels: int = int(os.getenv("SSE_MAX_CHANNELS", "1000"))
+    # MCP sessions (Mcp-Session-Id): idle eviction and cap
+    session_ttl_sec: float = float(os.getenv("SESSION_TTL_SEC", "1800"))
+    session_max: int = int(os.getenv("SESSION_MAX", "10000"))
+
+    # JSON-RPC batches: max entries per batch, concurrent tools/call per API key
+    batch_max_size: int = int(os.getenv("BATCH_MAX_SIZE", "50"))
+    batch_max_concurrency: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+    # tracing: "" (off) | "jsonl" (TRACE_JSONL_PATH) | "otlp" (OTLP/HTTP JSON to TRACE_OTLP_ENDPOINT)
+    trace_export: str = os.getenv("TRACE_EXPORT", "").strip().lower()
+    trace_jsonl_path: str = os.getenv("TRACE_JSONL_PATH", "./traces.jsonl")
+    trace_otlp_endpoint: str = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+
+    # metrics: max series per family (new label sets beyond this fold into "other")
+    metrics_max_series: int = int(os.getenv("METRICS_MAX_SERIES", "2000"))
+    # metrics: multiprocess mode (several workers per host). Each process writes mmap'd files here and
+    # /metrics merges them; the directory must be private to this deployment and emptied on startup.
+    metrics_multiproc_dir: str = os.getenv("METRICS_MULTIPROC_DIR", os.getenv("PROMETHEUS_MULTIPROC_DIR", "")).strip()
 
     # database
     db_url: str | None = os.getenv("DB_URL")
     db_echo: bool = _get_env_bool("DB_ECHO", False)
     db_auto_create: bool = _get_env_bool("DB_AUTO_CREATE", True)
+    # connection pool (not used for in-memory SQLite): size, overflow, checkout timeout, recycle,
+    # pre-ping (unset = on for server databases, off for SQLite files, which cannot go stale)
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    db_pool_pre_ping: bool | None = _get_env_bool("DB_POOL_PRE_PING") if os.getenv("DB_POOL_PRE_PING") else None
+    # statement caches: SQLAlchemy compiled-SQL LRU, sqlite3 statements per connection, psycopg prepare threshold
+    db_query_cache_size: int = int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))
+    db_statement_cache: int = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+    db_prepare_threshold: int = int(os.getenv("DB_PREPARE_THRESHOLD", "5"))
+    # SQLite: WAL journal (readers never block the writer) + synchronous=NORMAL, and how long to wait for a lock
+    sqlite_wal: bool = _get_env_bool("SQLITE_WAL", True)
+    sqlite_busy_timeout_ms: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+    # cross-worker cache invalidation (cache_events table): poll interval (0 = off), row retention
+    invalidation_poll_sec: float = float(os.getenv("INVALIDATION_POLL_SEC", "1.0"))
+    invalidation_retention_sec: float = float(os.getenv("INVALIDATION_RETENTION_SEC", "3600"))
+    # Graph access tokens cached per process (also capped by the token's expires_on; 0 = read DB every call)
+    token_cache_ttl_sec: float = float(os.getenv("TOKEN_CACHE_TTL_SEC", "300"))
 
 
 cfg = Config()
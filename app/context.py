@@ -1,6 +1,8 @@
 from __future__ import annotations
-from typing import Optional, Dict, Any
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Dict, Any
 import contextvars
+import time
 
 
 _api_key_meta: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("api_key_meta", default=None)
@@ -13,3 +15,86 @@ def set_current_user_meta(meta: Optional[Dict[str, Any]]) -> None:
 def get_current_user_meta() -> Optional[Dict[str, Any]]:
     return _api_key_meta.get()
 
+
+# Service resolved once per MCP session (Mcp-Session-Id); None → resolve from user meta
+_todo_service: contextvars.ContextVar[Optional[Any]] = contextvars.ContextVar("todo_service", default=None)
+
+
+def set_current_service(svc: Optional[Any]) -> None:
+    _todo_service.set(svc)
+
+
+def get_current_service() -> Optional[Any]:
+    return _todo_service.get()
+
+
+# Progress reporting (tools/call over SSE): executors/adapters call report_progress();
+# the transport installs a reporter for the call's context. No-op when none is set.
+ProgressReporter = Callable[[Dict[str, Any]], None]
+_progress_reporter: contextvars.ContextVar[Optional[ProgressReporter]] = contextvars.ContextVar("progress_reporter", default=None)
+
+
+def set_progress_reporter(fn: Optional[ProgressReporter]) -> contextvars.Token:
+    return _progress_reporter.set(fn)
+
+
+# Graph client-request-id for the current JSON-RPC request (one per request, shared by all Graph calls)
+_client_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("client_request_id", default=None)
+
+
+def set_client_request_id(value: Optional[str]) -> None:
+    _client_request_id.set(value)
+
+
+def get_client_request_id() -> Optional[str]:
+    return _client_request_id.get()
+
+
+# Per-request timing breakdown (Server-Timing): phase → accumulated milliseconds.
+# The dict is shared with worker threads through the copied context; no-op when not started.
+_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("timings", default=None)
+
+
+def start_timing() -> Dict[str, float]:
+    t: Dict[str, float] = {}
+    _timings.set(t)
+    return t
+
+
+def get_timing() -> Optional[Dict[str, float]]:
+    return _timings.get()
+
+
+def add_timing(phase: str, ms: float) -> None:
+    t = _timings.get()
+    if t is not None:
+        t[phase] = t.get(phase, 0.0) + ms
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    t = _timings.get()
+    if t is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        t[phase] = t.get(phase, 0.0) + (time.perf_counter() - t0) * 1000
+
+
+def report_progress(progress: float, total: Optional[float] = None, message: Optional[str] = None) -> None:
+    """Report cumulative progress (must increase per call) to the current transport, if any."""
+    fn = _progress_reporter.get()
+    if fn is None:
+        return
+    ev: Dict[str, Any] = {"progress": progress}
+    if total is not None:
+        ev["total"] = total
+    if message:
+        ev["message"] = message
+    try:
+        fn(ev)
+    except Exception:
+        pass
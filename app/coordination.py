@@ -0,0 +1,234 @@
+ # coordination.py (Graph rate-limit / circuit-breaker state shared across workers)
+ # - Backend holds token buckets and breaker state by key (one key per token profile)
+ # - local: in-process (single worker; default) | sqlite: one file shared by all workers on a node
+ #   (stdlib, no extra service) | redis: shared across nodes (optional `redis` package)
+ # - Token buckets hand out reservations: the caller sleeps outside any lock/transaction,
+ #   so N workers waiting on one profile still see exactly RATE_PER_SEC in aggregate
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.config import cfg
+
+
+class CoordinationBackend:
+    name = ""
+
+    def reserve(self, key: str, rate: float, burst: int) -> float:
+        """Take one token from bucket `key`; returns seconds the caller must wait before using it."""
+        raise NotImplementedError
+
+    def open_until(self, key: str) -> float:
+        """Epoch seconds until which the breaker `key` is open (0 = closed)."""
+        raise NotImplementedError
+
+    def record(self, key: str, ok: bool, threshold: int, cooldown: float) -> bool:
+        """Record a call outcome; returns True if this failure (re)opened the breaker."""
+        raise NotImplementedError
+
+
+def _refill(tokens: float, ts: float, now: float, rate: float, burst: int) -> float:
+    return min(float(burst), tokens + max(0.0, now - ts) * rate)
+
+
+class LocalBackend(CoordinationBackend):
+    name = "local"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key → (tokens, ts)
+        self._circuits: Dict[str, List[float]] = {}  # key → [fails, open_until]
+
+    def reserve(self, key, rate, burst):
+        with self._lock:
+            now = time.time()
+            tokens, ts = self._buckets.get(key, (float(burst), now))
+            tokens = _refill(tokens, ts, now, rate, burst) - 1
+            self._buckets[key] = (tokens, now)
+        return -tokens / rate if tokens < 0 else 0.0
+
+    def open_until(self, key):
+        c = self._circuits.get(key)
+        return c[1] if c else 0.0
+
+    def record(self, key, ok, threshold, cooldown):
+        with self._lock:
+            c = self._circuits.setdefault(key, [0, 0.0])
+            if ok:
+                c[0] = 0
+                return False
+            c[0] += 1
+            if c[0] < threshold:
+                return False
+            now = time.time()
+            opened = now >= c[1]
+            c[1] = now + cooldown
+            return opened
+
+
+class SQLiteBackend(CoordinationBackend):
+    """State in a small SQLite file (WAL); every worker process on the node opens the same path."""
+    name = "sqlite"
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, ts REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS circuits (key TEXT PRIMARY KEY, fails INTEGER NOT NULL, open_until REAL NOT NULL)",
+    )
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn()  # create schema eagerly (fail fast on a bad path)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # autocommit mode; writes use explicit BEGIN IMMEDIATE (serializes workers on the file lock)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for stmt in self._SCHEMA:
+                conn.execute(stmt)
+            self._local.conn = conn
+        return conn
+
+    def reserve(self, key, rate, burst):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tokens, ts FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(row[0], row[1], now, rate, burst) if row else float(burst)
+            tokens -= 1
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, ts) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, ts = excluded.ts",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return -tokens / rate if tokens < 0 else 0.0
+
+    def open_until(self, key):
+        row = self._conn().execute("SELECT open_until FROM circuits WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0.0
+
+    def record(self, key, ok, threshold, cooldown):
+        conn = self._conn()
+        if ok:
+            # successes are the common case: only write when there is a failure streak to clear
+            row = conn.execute("SELECT fails FROM circuits WHERE key = ?", (key,)).fetchone()
+            if row and row[0]:
+                conn.execute("UPDATE circuits SET fails = 0 WHERE key = ?", (key,))
+            return False
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT fails, open_until FROM circuits WHERE key = ?", (key,)).fetchone()
+            fails, until = (row[0] + 1, row[1]) if row else (1, 0.0)
+            opened = False
+            if fails >= threshold:
+                opened = now >= until
+                until = now + cooldown
+            conn.execute(
+                "INSERT INTO circuits (key, fails, open_until) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET fails = excluded.fails, open_until = excluded.open_until",
+                (key, fails, until),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return opened
+
+
+class RedisBackend(CoordinationBackend):
+    """State in Redis (or any server speaking its protocol + EVAL); needs the `redis` package."""
+    name = "redis"
+
+    _RESERVE = """
+local v = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens = burst
+if v[1] then tokens = math.min(burst, tonumber(v[1]) + math.max(0, now - tonumber(v[2])) * rate) end
+tokens = tokens - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((burst - tokens) / rate) + 60)
+return tostring(tokens)
+"""
+    _FAIL = """
+local fails = redis.call('HINCRBY', KEYS[1], 'fails', 1)
+local now, threshold, cooldown = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local opened = 0
+if fails >= threshold then
+  local until_ = tonumber(redis.call('HGET', KEYS[1], 'open_until') or '0')
+  if now >= until_ then opened = 1 end
+  redis.call('HSET', KEYS[1], 'open_until', tostring(now + cooldown))
+end
+redis.call('EXPIRE', KEYS[1], math.ceil(cooldown) + 3600)
+return opened
+"""
+
+    def __init__(self, url: str, prefix: str = "mcp:coord:"):
+        try:
+            import redis  # type: ignore
+        except ImportError as e:
+            raise RuntimeError("COORD_BACKEND=redis requires the 'redis' package (pip install redis)") from e
+        self._r = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._reserve = self._r.register_script(self._RESERVE)
+        self._fail = self._r.register_script(self._FAIL)
+
+    def reserve(self, key, rate, burst):
+        tokens = float(self._reserve(keys=[self.prefix + "bucket:" + key], args=[rate, burst, time.time()]))
+        return -tokens / rate if tokens < 0 else 0.0
+
+    def open_until(self, key):
+        v = self._r.hget(self.prefix + "circuit:" + key, "open_until")
+        return float(v) if v else 0.0
+
+    def record(self, key, ok, threshold, cooldown):
+        k = self.prefix + "circuit:" + key
+        if ok:
+            if self._r.hget(k, "fails") not in (None, b"0"):
+                self._r.hset(k, "fails", 0)
+            return False
+        return bool(self._fail(keys=[k], args=[time.time(), threshold, cooldown]))
+
+
+_backend: Optional[CoordinationBackend] = None
+_backend_lock = threading.Lock()
+
+
+def _create() -> CoordinationBackend:
+    kind = cfg.coord_backend
+    if kind == "sqlite":
+        return SQLiteBackend(cfg.coord_sqlite_path)
+    if kind == "redis":
+        return RedisBackend(cfg.coord_redis_url, prefix=cfg.coord_redis_prefix)
+    if kind not in ("", "local"):
+        raise RuntimeError(f"unknown COORD_BACKEND: {kind!r} (local|sqlite|redis)")
+    return LocalBackend()
+
+
+def get_backend() -> CoordinationBackend:
+    """Process-wide backend from COORD_BACKEND (created on first Graph call)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create()
+    return _backend
+
+
+def set_backend(backend: Optional[CoordinationBackend]) -> None:
+    """Swap the backend (None → recreate from config on next use)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -1,15 +1,85 @@
 from __future__ import annotations
+import logging
+import threading
+import time
 from contextlib import contextmanager
-from typing import Iterator, Optional
-
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional
 
 from app.config import cfg
+from app.metrics import METRICS
+
+if TYPE_CHECKING:  # SQLAlchemy is imported lazily on first DB use (faster cold start)
+    from sqlalchemy.orm import Session
+
+logger = logging.getLogger("mcp.db")
 
 
 _engine = None
 _SessionLocal = None
+_engine_lock = threading.Lock()  # first use can race (request threads, background pollers)
+
+_POOL_CHECKOUT_MS = METRICS.histogram(
+    "mcp_db_pool_checkout_ms", "Time to get a DB connection from the pool (waiting for a free one or connecting)",
+    buckets=(0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000),
+)
+_POOL_TIMEOUTS = METRICS.counter("mcp_db_pool_timeouts_total", "Pool checkouts that gave up after DB_POOL_TIMEOUT")
+METRICS.gauge(
+    "mcp_db_pool_checked_out", "DB connections currently checked out",
+    fn=lambda: _engine.pool.checkedout() if _engine is not None and hasattr(_engine.pool, "checkedout") else 0,
+)
+
+
+def _timed_queue_pool():
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+    from sqlalchemy.pool import QueuePool
+
+    class TimedQueuePool(QueuePool):
+        """QueuePool that records checkout latency (pool exhaustion shows up here before it becomes timeouts)."""
+
+        def _do_get(self):
+            t0 = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except PoolTimeoutError:
+                _POOL_TIMEOUTS.inc()
+                raise
+            _POOL_CHECKOUT_MS.observe((time.perf_counter() - t0) * 1000)
+            return conn
+
+    return TimedQueuePool
+
+
+def _sqlite_on_connect(dbapi_conn, _record) -> None:
+    cur = dbapi_conn.cursor()
+    try:
+        if cfg.sqlite_wal:
+            cur.execute("PRAGMA journal_mode=WAL")  # persistent per file; cheap no-op once set
+            cur.execute("PRAGMA synchronous=NORMAL")  # WAL-safe: a crash can lose the last commits, never corrupt
+        cur.execute(f"PRAGMA busy_timeout={int(cfg.sqlite_busy_timeout_ms)}")
+    finally:
+        cur.close()
+
+
+def _engine_options(url) -> Dict[str, Any]:
+    """create_engine() arguments for DB_URL: pool sizing/pre-ping and statement caches per backend."""
+    opts: Dict[str, Any] = {"echo": cfg.db_echo, "future": True, "query_cache_size": cfg.db_query_cache_size}
+    sqlite = url.get_backend_name() == "sqlite"
+    if sqlite and (not url.database or url.database == ":memory:" or url.query.get("mode") == "memory"):
+        return opts  # one shared in-memory connection: nothing to size
+    opts.update(
+        poolclass=_timed_queue_pool(),
+        pool_size=cfg.db_pool_size,
+        max_overflow=cfg.db_max_overflow,
+        pool_timeout=cfg.db_pool_timeout,
+        pool_recycle=cfg.db_pool_recycle,
+        pool_pre_ping=cfg.db_pool_pre_ping if cfg.db_pool_pre_ping is not None else not sqlite,
+    )
+    if sqlite:
+        opts["connect_args"] = {"check_same_thread": False, "cached_statements": cfg.db_statement_cache}
+    elif url.get_driver_name() == "psycopg":
+        opts["connect_args"] = {"prepare_threshold": cfg.db_prepare_threshold}  # server-side prepared statements
+    return opts
 
 
 def get_engine():
@@ -17,16 +87,91 @@ def get_engine():
     if not cfg.db_url:
         return None
     if _engine is None:
-        _engine = create_engine(cfg.db_url, echo=cfg.db_echo, future=True)
-        _SessionLocal = sessionmaker(bind=_engine, autoflush=False, autocommit=False, future=True)
+        with _engine_lock:
+            if _engine is None:
+                from sqlalchemy import create_engine, event
+                from sqlalchemy.engine import make_url
+                from sqlalchemy.orm import sessionmaker
+                url = make_url(cfg.db_url)
+                engine = create_engine(url, **_engine_options(url))
+                if url.get_backend_name() == "sqlite":
+                    event.listen(engine, "connect", _sqlite_on_connect)
+                _SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+                event.listen(_SessionLocal, "after_flush", _mark_flushed)
+                if cfg.db_auto_create:
+                    # 스키마 자동 생성(개발 편의)은 첫 DB 사용 시점으로 지연. 운영은 Alembic 권장.
+                    try:
+                        from app.models import Base
+                        Base.metadata.create_all(engine)
+                    except Exception:
+                        logger.warning("DB auto-create failed", exc_info=True)
+                _engine = engine  # publish last: other threads must not see a half-initialized engine
     return _engine
 
 
+class _RequestScope:
+    __slots__ = ("session", "lock", "closed")
+
+    def __init__(self):
+        self.session: Optional[Session] = None
+        self.lock = threading.RLock()  # batch entries run tool calls on several threads
+        self.closed = False
+
+
+_request_scope: ContextVar[Optional[_RequestScope]] = ContextVar("db_request_scope", default=None)
+
+
+def _mark_flushed(session, _flush_context) -> None:
+    session.info["flushed"] = True
+
+
+@contextmanager
+def request_scope() -> Iterator[None]:
+    """Unit of work for one request: every get_session() inside shares one Session.
+
+    The session (one pooled connection, one transaction) is opened on first use and closed
+    on exit, so a request that never touches the DB costs nothing. Worker threads started
+    with the request's context (asyncio.to_thread) join the same scope.
+
+    Keep scopes short and synchronous (one worker thread, no awaits, no Graph calls inside):
+    the connection stays checked out until exit, and if the event loop ever waits on the pool
+    while the loop itself must release a connection, the worker deadlocks for DB_POOL_TIMEOUT.
+    """
+    if not cfg.db_url or _request_scope.get() is not None:
+        yield
+        return
+    scope = _RequestScope()
+    token = _request_scope.set(scope)
+    try:
+        yield
+    finally:
+        _request_scope.reset(token)
+        with scope.lock:
+            scope.closed = True
+            if scope.session is not None:
+                scope.session.close()  # ends the read transaction and returns the connection
+
+
 @contextmanager
 def get_session() -> Iterator[Session]:
     if not cfg.db_url:
         raise RuntimeError("DB_URL not configured")
     get_engine()
+    scope = _request_scope.get()
+    if scope is not None:
+        with scope.lock:
+            if not scope.closed:
+                if scope.session is None:
+                    scope.session = _SessionLocal()  # type: ignore
+                session = scope.session
+                try:
+                    yield session
+                    if session.new or session.dirty or session.deleted or session.info.pop("flushed", False):
+                        session.commit()  # writes still commit at the end of their block (before any publish)
+                except Exception:
+                    session.rollback()
+                    raise
+                return
     assert _SessionLocal is not None
     session: Session = _SessionLocal()  # type: ignore
     try:
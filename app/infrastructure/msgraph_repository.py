@@ -1,8 +1,10 @@
 from typing import Dict, Any, Optional
 from app.domain.repositories import TodoRepository, TokenProvider
 import app.adapter_graph_rest as rest
+from app.tracing import traced
 
 
+@traced("repository")
 class MsGraphTodoRepository(TodoRepository):
     def __init__(self, token_provider: TokenProvider):
         self.token_provider = token_provider
@@ -1,21 +1,52 @@
-from typing import Optional
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+from app import invalidation
+from app.config import cfg
+from app.context import timed
 from app.db import get_session
-from app.models import Token
+
+if TYPE_CHECKING:
+    from app.models import Token
+
+# Access token per provider identity → (token, valid_until). Token writes in any worker
+# (topic "token") clear it; entries never outlive the token's own expires_on.
+_TOKEN_CACHE: Dict[str, Tuple[str, float]] = {}
+_EXPIRY_SKEW_SEC = 60
+
+invalidation.subscribe("token", lambda _profile: _TOKEN_CACHE.clear(), key="token_provider.cache")
 
 
 class DBTokenProvider:
     def __init__(self, *, token_id: Optional[int] = None, profile: Optional[str] = None):
         self.token_id = token_id
         self.profile = profile
+        self._cache_key = f"id:{token_id}" if token_id is not None else f"p:{profile or ''}"
 
-    def _fetch(self) -> Optional[Token]:
+    def _fetch(self) -> Optional["Token"]:
+        from app.models import Token
         with get_session() as s:
             if self.token_id is not None:
-                return s.get(Token, self.token_id)
-            if self.profile:
-                return s.query(Token).filter(Token.profile == self.profile).first()
-            return None
+                t = s.get(Token, self.token_id)
+            elif self.profile:
+                t = s.query(Token).filter(Token.profile == self.profile).first()
+            else:
+                return None
+            if t is not None:
+                s.expunge(t)  # keep loaded attributes readable after commit (expire_on_commit)
+            return t
 
     def get_token(self) -> str:
-        t = self._fetch()
-        return (t.access_token or "") if t else ""
+        ttl = cfg.token_cache_ttl_sec
+        now = time.time()
+        hit = _TOKEN_CACHE.get(self._cache_key) if ttl > 0 else None
+        if hit is not None and hit[1] > now:
+            return hit[0]
+        with timed("token"):
+            t = self._fetch()
+        token = (t.access_token or "") if t else ""
+        if ttl > 0 and token:
+            until = now + ttl
+            if t.expires_on:
+                until = min(until, t.expires_on - _EXPIRY_SKEW_SEC)
+            _TOKEN_CACHE[self._cache_key] = (token, until)
+        return token
@@ -0,0 +1,159 @@
+ # invalidation.py (cross-worker cache invalidation bus)
+ # - Admin writes publish (topic, key) events: applied to this process immediately and appended to
+ #   the `cache_events` table (a change sequence shared by every worker using the same DB)
+ # - Each worker polls rows past its cursor (INVALIDATION_POLL_SEC; one indexed range query) and runs
+ #   the subscribers of each topic; events it published itself are skipped
+ # - Topics: rbac (roles), apikey (key = hashed principal), token (key = profile / "id:<n>"), tools (registry)
+ # - Rows older than INVALIDATION_RETENTION_SEC are pruned by the pollers
+
+import logging
+import os
+import secrets
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from app.config import cfg
+from app.db import get_engine, get_session
+from app.metrics import METRICS
+
+logger = logging.getLogger("mcp.invalidation")
+
+TOPICS = frozenset({"rbac", "apikey", "token", "tools"})
+
+_EVENTS = METRICS.counter(
+    "mcp_cache_invalidations_total", "Cache invalidation events applied", ["topic", "source"],
+    values={"topic": TOPICS, "source": frozenset({"local", "remote"})},
+)
+
+# Commits can land out of id order (concurrent writers): re-read this many ids behind the cursor
+_LOOKBACK = 64
+_BATCH = 500
+
+_subscribers: Dict[str, List[Callable[[str], None]]] = {}
+_keyed: Dict[Tuple[str, str], Callable[[str], None]] = {}  # (topic, key) → subscriber registered under it
+_sub_lock = threading.Lock()
+_boot = secrets.token_hex(4)
+_cursor: Optional[int] = None
+_seen: Set[int] = set()
+_thread: Optional[threading.Thread] = None
+_last_prune = 0.0
+
+
+def _origin() -> str:
+    # pid changes in forked workers; the boot nonce tells apart processes that reuse a pid
+    return f"{socket.gethostname()[:40]}:{os.getpid()}:{_boot}"
+
+
+def subscribe(topic: str, fn: Callable[[str], None], *, key: Optional[str] = None) -> Callable[[], None]:
+    """Run `fn(key)` whenever `topic` is invalidated (locally or by another worker).
+
+    A `key` makes registration idempotent: subscribing again under the same key (e.g. the module
+    was re-imported) replaces the previous callback instead of adding a second one.
+    Returns a function that unsubscribes `fn`.
+    """
+    with _sub_lock:
+        subs = _subscribers.setdefault(topic, [])
+        if key is not None:
+            old = _keyed.pop((topic, key), None)
+            if old is not None and old in subs:
+                subs.remove(old)
+            _keyed[(topic, key)] = fn
+        subs.append(fn)
+
+    def unsubscribe() -> None:
+        with _sub_lock:
+            if fn in _subscribers.get(topic, ()):
+                _subscribers[topic].remove(fn)
+            if key is not None and _keyed.get((topic, key)) is fn:
+                del _keyed[(topic, key)]
+
+    return unsubscribe
+
+
+def _apply(topic: str, key: str, source: str) -> None:
+    _EVENTS.inc(topic=topic, source=source)
+    for fn in list(_subscribers.get(topic, ())):
+        try:
+            fn(key)
+        except Exception:
+            logger.exception("invalidation subscriber failed (topic=%s)", topic)
+
+
+def publish(topic: str, key: str = "", *, apply_local: bool = True) -> None:
+    """Invalidate `topic` here and in every other worker. Best effort: a DB error is logged, not raised."""
+    if apply_local:
+        _apply(topic, key, "local")
+    if not get_engine():
+        return
+    from app.models import CacheEvent
+    try:
+        with get_session() as s:
+            s.add(CacheEvent(topic=topic, key=key or "", origin=_origin()))
+    except Exception:
+        logger.warning("invalidation publish failed (topic=%s); other workers stay stale until TTL", topic, exc_info=True)
+
+
+def poll() -> int:
+    """Apply events published by other processes since the last poll; returns how many were applied."""
+    global _cursor, _last_prune
+    from sqlalchemy import func
+    from app.models import CacheEvent
+
+    with get_session() as s:
+        if _cursor is None:
+            # start at the head: caches of a fresh process are empty, history is irrelevant
+            _cursor = s.query(func.max(CacheEvent.id)).scalar() or 0
+            _seen.update(i for (i,) in s.query(CacheEvent.id).filter(CacheEvent.id > _cursor - _LOOKBACK))
+            return 0
+        rows = (
+            s.query(CacheEvent.id, CacheEvent.topic, CacheEvent.key, CacheEvent.origin)
+            .filter(CacheEvent.id > _cursor - _LOOKBACK)
+            .order_by(CacheEvent.id)
+            .limit(_BATCH + _LOOKBACK)
+            .all()
+        )
+        now = time.time()
+        if now - _last_prune > 60:
+            _last_prune = now
+            cutoff = datetime.utcnow() - timedelta(seconds=cfg.invalidation_retention_sec)
+            s.query(CacheEvent).filter(CacheEvent.created_at < cutoff).delete(synchronize_session=False)
+
+    me = _origin()
+    applied = 0
+    for event_id, topic, key, origin in rows:
+        if event_id in _seen:
+            continue
+        _seen.add(event_id)
+        _cursor = max(_cursor, event_id)
+        if origin != me:
+            _apply(topic, key or "", "remote")
+            applied += 1
+    low = _cursor - _LOOKBACK
+    _seen.difference_update([i for i in _seen if i <= low])
+    return applied
+
+
+def start(interval_sec: Optional[float] = None) -> Optional[threading.Thread]:
+    """Start the poller thread (once per process; no-op without DB_URL or with interval 0).
+
+    The engine is created on the thread, so startup does not wait for the first DB connection.
+    """
+    global _thread
+    interval = cfg.invalidation_poll_sec if interval_sec is None else interval_sec
+    if interval <= 0 or not cfg.db_url or (_thread is not None and _thread.is_alive()):
+        return _thread
+
+    def _loop() -> None:
+        while True:
+            try:
+                poll()
+            except Exception:
+                logger.warning("invalidation poll failed", exc_info=True)
+            time.sleep(interval)
+
+    _thread = threading.Thread(target=_loop, name="cache-invalidation", daemon=True)
+    _thread.start()
+    return _thread
@@ -3,13 +3,21 @@
  # - All features are provided via a single JSON-RPC endpoint (/mcp) using tools/list, tools/call
  # - Service layer (TodoService) handles Graph API integration and business logic
 
+# Cold-start clock: stamped before any other import so startup metrics cover module import → ready
+import time
+_T_IMPORT0 = time.perf_counter()
+
 import os
 import json
 import logging
+import threading
+import weakref
+import contextvars
+import hashlib
+import uuid
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, FrozenSet, Optional
 import asyncio
-from collections import defaultdict
 
 from fastapi import FastAPI, Request, Header, HTTPException, Response
 from fastapi.responses import JSONResponse as FastAPIJSONResponse
@@ -17,36 +25,66 @@ from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field, ValidationError
 
-from app.tools import _list_tools, _call_tool
+from app.tools import (
+    _list_tools,
+    _call_tool,
+    _service,
+    cache_stats as tools_cache_stats,
+    allowed_tools_for_current_user,
+    catalog_for,
+    add_reload_listener,
+    reload_registry,
+    start_schema_watcher,
+)
 from app.apikeys import (
     generate_api_key,
     list_keys as apikey_list,
+    any_keys as apikey_any,
     delete_key as apikey_delete,
     resolve_key,
     list_users as apikey_users,
     update_key as apikey_update,
+    provided_key as _get_provided_key,
 )
+from app import invalidation
 from app import rbac
+from app import metrics_mp
+from app import tools as _tools_mod
 from app.tokens import list_tokens as token_list, upsert_token as token_upsert, get_token_by_profile
-from app.context import set_current_user_meta
+from app.context import (
+    set_current_user_meta,
+    get_current_user_meta,
+    set_current_service,
+    set_progress_reporter,
+    set_client_request_id,
+    start_timing,
+    get_timing,
+    timed,
+)
 from app.config import cfg
+from app.db import request_scope
+from app.metrics import METRICS
+from app.sessions import McpSession, SessionStore
+from app.sse import SseHub
+from app.tracing import span
 
 
  # Logging setup
 logger = logging.getLogger("mcp")
 logging.basicConfig(level=getattr(logging, cfg.log_level))
 
-# Optional Sentry setup (if installed and DSN provided)
-try:
-    if os.getenv("SENTRY_DSN"):
+# Optional Sentry setup (if installed and DSN provided).
+# Imported off the startup path in a background thread so it doesn't delay readiness.
+def _init_sentry() -> None:
+    try:
         import sentry_sdk  # type: ignore
         try:
             from sentry_sdk.integrations.fastapi import FastApiIntegration  # type: ignore
             sentry_sdk.init(dsn=os.getenv("SENTRY_DSN"), integrations=[FastApiIntegration()])
         except Exception:
             sentry_sdk.init(dsn=os.getenv("SENTRY_DSN"))
-except Exception:
-    pass
+    except Exception:
+        pass
 
 
  # MCP server meta/capabilities
@@ -54,7 +92,7 @@ MCP_JSONRPC_VERSION = "2.0"
 MCP_PROTOCOL_REV = cfg.protocol_revision  # Latest MCP revision
 
 CAPABILITIES = {
-    "capabilities": {"tools": {"listChanged": False}},
+    "capabilities": {"tools": {"listChanged": True}},
     "protocolRevision": MCP_PROTOCOL_REV,
     "server": {"name": cfg.server_name, "version": cfg.server_version},
 }
@@ -73,6 +111,13 @@ class JsonRpcRequest(BaseModel):
 def _jsonrpc_ok(id_val: Any, result: Dict[str, Any], *, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
     return JSONResponse({"jsonrpc": MCP_JSONRPC_VERSION, "id": id_val, "result": result}, headers=headers or {})
 
+def _jsonrpc_ok_bytes(id_val: Any, result_json: bytes) -> bytes:
+    """Serialize a success envelope around an already-serialized result (no re-encoding)."""
+    return b'{"jsonrpc":"2.0","id":%s,"result":%s}' % (json.dumps(id_val, ensure_ascii=False).encode("utf-8"), result_json)
+
+def _jsonrpc_ok_raw(id_val: Any, result_json: bytes, *, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=_jsonrpc_ok_bytes(id_val, result_json), media_type="application/json", headers=headers or {})
+
 def _jsonrpc_err(id_val: Any, code: int, message: str, *, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
     return JSONResponse({"jsonrpc": MCP_JSONRPC_VERSION, "id": id_val, "error": {"code": code, "message": message}}, headers=headers or {})
 
@@ -85,165 +130,213 @@ def _jsonrpc_err(id_val: Any, code: int, message: str, *, headers: Optional[Dict
 
 
 app = FastAPI(title=cfg.server_name, version=cfg.server_version)
-try:
-    # 개발 편의: DB_URL 미지정 시 SQLite 기본값으로 폴백
-    if not cfg.db_url:
-        os.environ["DB_URL"] = "sqlite:///./secrets/app.db"
-        from importlib import reload as _reload
-        from app import config as _cfgmod
-        _reload(_cfgmod)  # cfg 갱신
-    # 스키마 자동 생성(개발 편의). 운영은 Alembic 권장.
-    from app.models import Base
-    from app.db import ensure_schema
-    ensure_schema(Base)
-except Exception:
-    pass
+# 개발 편의: DB_URL 미지정 시 SQLite 기본값으로 폴백 (공유 cfg 객체를 직접 갱신).
+# 스키마 자동 생성(DB_AUTO_CREATE)은 app.db.get_engine()에서 첫 DB 사용 시 수행.
+if not cfg.db_url:
+    os.environ["DB_URL"] = "sqlite:///./secrets/app.db"
+    cfg.db_url = os.environ["DB_URL"]
+
+_startup_ms: Dict[str, float] = {}
+_event_loop: Optional[asyncio.AbstractEventLoop] = None
+_remove_reload_listener: Optional[Callable[[], None]] = None
+
+
+@app.on_event("startup")
+async def _on_startup() -> None:
+    global _event_loop, _remove_reload_listener
+    if os.getenv("SENTRY_DSN"):
+        threading.Thread(target=_init_sentry, name="sentry-init", daemon=True).start()
+    from app.tools import REGISTRY
+    # Registry hot reload → notifications/tools/list_changed on every SSE channel
+    loop = _event_loop = asyncio.get_running_loop()
+    if _remove_reload_listener is not None:
+        _remove_reload_listener()  # a previous lifespan's loop (missed shutdown)
+    _remove_reload_listener = add_reload_listener(lambda _reg: loop.call_soon_threadsafe(_broadcast_sse, _LIST_CHANGED_NOTIFICATION))
+    if cfg.tool_schema_watch_sec > 0:
+        start_schema_watcher(cfg.tool_schema_watch_sec)
+    invalidation.start()
+    metrics_mp.store()  # open this worker's metric files now: callback gauges publish before the first observation
+    _startup_ms["import_ms"] = round(_T_IMPORT_DONE_MS, 1)
+    _startup_ms["ready_ms"] = round((time.perf_counter() - _T_IMPORT0) * 1000, 1)
+    logger.info(json.dumps({"event": "startup", "registry": REGISTRY.source, "tools": len(REGISTRY.tools), **_startup_ms}))
+
+@app.on_event("shutdown")
+async def _on_shutdown() -> None:
+    global _event_loop, _remove_reload_listener
+    # The loop is about to close: drop the listener that posts to it
+    if _remove_reload_listener is not None:
+        _remove_reload_listener()
+        _remove_reload_listener = None
+    _event_loop = None
+
 @app.get("/mcp/manifest")
 def mcp_manifest(x_api_key: Optional[str] = Header(None), authorization: Optional[str] = Header(None), request: Request = None):
     """
     MCP 툴 선언 manifest를 JSON으로 반환 (Cursor 등에서 자동 임포트 가능)
+    Pre-serialized per effective tool set; honors If-None-Match with 304.
     """
     # 베스트 에포트로 키를 확인해 컨텍스트를 세팅(실패해도 전체 노출)
+    # (sync endpoint → runs on the threadpool; lookups share one short DB session)
     try:
-        require_api_key(request, x_api_key, authorization)
+        set_current_user_meta(_authorize_mcp(request, x_api_key, authorization))
     except HTTPException:
         pass
-    tools, _ = _list_tools(None)
-    return {"tools": tools}
+    cat = catalog_for(allowed_tools_for_current_user())
+    headers = {"ETag": cat.etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), cat.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cat.body, media_type="application/json", headers=headers)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses weak comparison (RFC 9110 13.1.2)
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+# SSE channels: one per caller identity (results are never fanned out to other keys)
+_sse_hub = SseHub(
+    buffer_size=max(1, cfg.sse_buffer_size),
+    ttl_sec=cfg.sse_channel_ttl_sec,
+    max_channels=max(1, cfg.sse_max_channels),
+)
+
+_LIST_CHANGED_NOTIFICATION = json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "method": "notifications/tools/list_changed"})
+
 
-# SSE client registry (simple fan-out)
-_sse_clients: set[asyncio.Queue[str]] = set()
+def _sse_channel_key(provided: Optional[str]) -> str:
+    # Raw API keys are not kept as dict keys; open dev mode shares one anonymous channel
+    if not provided:
+        return "anon"
+    return "key:" + hashlib.sha256(provided.encode("utf-8")).hexdigest()[:24]
 
-# Simple in-memory metrics (Prometheus exposition)
-_metrics = defaultdict(int)
-_metrics_sum = defaultdict(float)
-_metrics_count = defaultdict(int)
-_hist_buckets = defaultdict(int)
 
-def _mkey(name: str, labels: Dict[str, str]) -> tuple:
-    return (name, tuple(sorted(labels.items())))
+def _broadcast_sse(payload: str) -> None:
+    # Event-loop thread only; server-wide notifications go to every channel
+    _sse_hub.broadcast(payload)
+
+
+# MCP sessions: closing one also closes its SSE channel
+_sessions = SessionStore(
+    ttl_sec=cfg.session_ttl_sec,
+    max_sessions=max(1, cfg.session_max),
+    on_close=lambda sess: _sse_hub.drop(sess.channel),
+)
+
+
+def _publish_sse(channel: Optional[str], payload: Any) -> None:
+    # Event-loop thread only; no-op unless that caller has an SSE channel
+    if channel is None or _sse_hub.get(channel) is None:
+        return
+    try:
+        data = payload.decode("utf-8") if isinstance(payload, bytes) else json.dumps(payload)
+        _sse_hub.publish(channel, data)
+    except Exception:
+        pass
+
+# Metrics (Prometheus exposition) — typed families with bounded label values (see app.metrics)
+_RPC_METHODS = frozenset({"initialize", "tools/list", "tools/call"})
+_RPC_STATUSES = frozenset({"ok", "invalid_params", "forbidden", "type_error", "server_error", "not_found"})
+
+
+def _known_tool(v: str) -> bool:
+    # Tool names come from the client: only registered tools get their own series
+    return v == "" or v in _tools_mod.REGISTRY.by_name
+
+
+_REQUESTS = METRICS.counter(
+    "mcp_requests_total", "Total MCP requests", ("method", "tool", "status"),
+    values={"method": _RPC_METHODS, "tool": _known_tool, "status": _RPC_STATUSES},
+)
+_AUTH = METRICS.counter(
+    "mcp_auth_total", "Auth attempts", ("outcome", "kind"),
+    values={"outcome": frozenset({"success", "failure"}), "kind": frozenset({"", "master", "key", "open"})},
+)
+METRICS.gauge("mcp_sse_connections", "Current SSE connections", fn=lambda: _sse_hub.connections)
+METRICS.gauge("mcp_sse_channels", "Open SSE channels (incl. idle ones kept for resume)", fn=lambda: len(_sse_hub))
+METRICS.gauge("mcp_sessions", "Live MCP sessions (Mcp-Session-Id)", fn=lambda: len(_sessions))
+METRICS.summary(
+    "mcp_tool_duration_ms", "Tool call duration in milliseconds (summary)", ("tool",),
+    values={"tool": _known_tool},
+)
+METRICS.histogram(
+    "mcp_http_request_duration_ms", "HTTP request latency by endpoint/status/tool", ("endpoint", "status", "tool"),
+    values={"endpoint": _RPC_METHODS, "status": _RPC_STATUSES, "tool": _known_tool},
+)
+METRICS.histogram(
+    "mcp_tool_call_duration_ms", "Tool call latency by tool", ("tool",),
+    values={"tool": _known_tool},
+)
+
 
 def _inc(name: str, **labels: str) -> None:
-    _metrics[_mkey(name, labels)] += 1
+    METRICS.get(name).inc(**labels)
+
 
 def _observe(name: str, value: float, **labels: str) -> None:
-    key = _mkey(name, labels)
-    _metrics_sum[key] += float(value)
-    _metrics_count[key] += 1
+    METRICS.get(name).observe(value, **labels)
 
-# Histogram support (Prometheus exposition)
-_HIST_BUCKETS_MS = [5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
 
 def _observe_hist(name: str, value_ms: float, **labels: str) -> None:
-    v = float(value_ms)
-    # Update sum/count
-    _observe(name, v, **labels)
-    # Increment buckets (cumulative semantics)
-    for b in _HIST_BUCKETS_MS:
-        if v <= b:
-            key = (name, tuple(sorted(labels.items())), str(b))
-            _hist_buckets[key] += 1
-    # +Inf bucket
-    key_inf = (name, tuple(sorted(labels.items())), "+Inf")
-    _hist_buckets[key_inf] += 1
+    METRICS.get(name).observe(value_ms, **labels)
+
 
 def _render_metrics() -> str:
-    lines = []
-    # Counters
-    counters = {
-        "mcp_requests_total": "Total MCP requests",
-        "mcp_auth_total": "Auth attempts",
-    }
-    for metric, help_text in counters.items():
-        lines.append(f"# HELP {metric} {help_text}")
-        lines.append(f"# TYPE {metric} counter")
-        for (name, label_pairs), val in _metrics.items():
-            if name != metric:
-                continue
-            label_str = ",".join([f'{k}="{v}"' for k, v in label_pairs])
-            lines.append(f"{name}{{{label_str}}} {val}")
-
-    # Gauges
-    lines.append("# HELP mcp_sse_connections Current SSE connections")
-    lines.append("# TYPE mcp_sse_connections gauge")
-    lines.append(f"mcp_sse_connections {len(_sse_clients)}")
-
-    # Summaries (sum/count pairs)
-    lines.append("# HELP mcp_tool_duration_ms Tool call duration in milliseconds (summary)")
-    lines.append("# TYPE mcp_tool_duration_ms summary")
-    for (name, label_pairs), s in _metrics_sum.items():
-        if name != "mcp_tool_duration_ms":
-            continue
-        c = _metrics_count.get((name, label_pairs), 0)
-        label_str = ",".join([f'{k}="{v}"' for k, v in label_pairs])
-        lines.append(f"{name}_sum{{{label_str}}} {s}")
-        lines.append(f"{name}_count{{{label_str}}} {c}")
-
-    # Histograms
-    def render_hist(name: str, help_text: str):
-        lines.append(f"# HELP {name} {help_text}")
-        lines.append(f"# TYPE {name} histogram")
-        # Group by labels (excluding 'le')
-        groups = {}
-        for (mname, label_pairs, le), cnt in _hist_buckets.items():
-            if mname != name:
-                continue
-            groups.setdefault(tuple(label_pairs), []).append((le, cnt))
-        for label_pairs, items in groups.items():
-            # Ensure all buckets present
-            buckets = {le: cnt for le, cnt in items}
-            ordered = [(str(b), buckets.get(str(b), 0)) for b in _HIST_BUCKETS_MS] + [("+Inf", buckets.get("+Inf", 0))]
-            base_labels = dict(label_pairs)
-            for le, cnt in ordered:
-                lbl = dict(base_labels)
-                lbl["le"] = le
-                label_str = ",".join([f'{k}="{v}"' for k, v in sorted(lbl.items())])
-                lines.append(f"{name}_bucket{{{label_str}}} {cnt}")
-            # sum/count
-            s = _metrics_sum.get((name, label_pairs), 0.0)
-            c = _metrics_count.get((name, label_pairs), 0)
-            label_str = ",".join([f'{k}="{v}"' for k, v in label_pairs])
-            lines.append(f"{name}_sum{{{label_str}}} {s}")
-            lines.append(f"{name}_count{{{label_str}}} {c}")
-
-    render_hist("mcp_http_request_duration_ms", "HTTP request latency by endpoint/status/tool")
-    render_hist("mcp_tool_call_duration_ms", "Tool call latency by tool")
-    return "\n".join(lines) + "\n"
+    return METRICS.render()
 
 @app.get("/mcp")
 async def mcp_sse(request: Request, x_api_key: str = Header(None), authorization: str = Header(None)):
     """Optional SSE stream for clients that open a separate event channel.
-    We broadcast JSON-RPC responses as SSE data frames on this channel.
+    The caller receives its own JSON-RPC responses (plus server-wide notifications)
+    as SSE frames with ids; reconnect with Last-Event-ID to replay missed frames.
     """
     accept = request.headers.get("accept", "")
-    # Lightweight auth for GET (both SSE and non-SSE).
+    # Auth for GET (both SSE and non-SSE): session, master key, generated key, or open dev mode.
     # Accept credentials via X-API-Key header, Authorization: Bearer, or query param ?x-api-key=..
-    if cfg.api_key:
-        provided = _get_provided_key(request, x_api_key, authorization)
-        if not provided or provided != cfg.api_key:
-            raise HTTPException(status_code=401, detail="Invalid or missing API Key")
+    provided = _get_provided_key(request, x_api_key, authorization)
+    session = _session_for(request, provided)
+    if session is None:
+        # DB lookups off the event loop (see mcp_entry)
+        set_current_user_meta(await asyncio.to_thread(_authorize_mcp, request, x_api_key, authorization))
 
     if "text/event-stream" not in accept:
         # For non-SSE GET, return capabilities quickly
         return JSONResponse({"server": CAPABILITIES["server"], "protocolRevision": MCP_PROTOCOL_REV})
 
-    q: asyncio.Queue[str] = asyncio.Queue(maxsize=100)
-    _sse_clients.add(q)
+    try:
+        channel = _sse_hub.channel(session.channel if session else _sse_channel_key(provided))
+    except OverflowError:
+        raise HTTPException(status_code=503, detail="Too many SSE channels")
+    seq = channel.resume_seq(request.headers.get("last-event-id"))
+    wake = channel.subscribe()
 
     async def event_gen():
+        nonlocal seq
         try:
             # Initial hello
             yield f": keep-alive\n\n"
             while True:
+                # Replay/deliver everything after the last id sent (frames older than the
+                # ring buffer were dropped under backpressure and are not recoverable)
+                for n, data in channel.since(seq):
+                    seq = n
+                    yield f"id: {channel.event_id(n)}\ndata: {data}\n\n"
+                wake.clear()
+                if channel.since(seq):
+                    continue
+                if _sse_hub.get(channel.key) is not channel:
+                    return  # channel dropped (e.g. session terminated)
                 try:
-                    item = await asyncio.wait_for(q.get(), timeout=15.0)
-                    yield f"data: {item}\n\n"
+                    await asyncio.wait_for(wake.wait(), timeout=15.0)
                 except asyncio.TimeoutError:
                     # keep alive comment
                     yield f": ping\n\n"
-                    continue
         finally:
-            _sse_clients.discard(q)
+            channel.unsubscribe(wake)
 
     return StreamingResponse(event_gen(), media_type="text/event-stream")
 
@@ -251,7 +344,8 @@ async def mcp_sse(request: Request, x_api_key: str = Header(None), authorization
 app.add_middleware(
     CORSMiddleware,
     allow_origins=cfg.allow_origins,
-    allow_methods=["GET", "POST"],
+    allow_methods=["GET", "POST", "DELETE"],
+    expose_headers=["Mcp-Session-Id"],
     allow_headers=["*"],
     max_age=3600,
 )
@@ -259,74 +353,100 @@ app.add_middleware(
 # API Key 인증 미들웨어
 EXPECTED_API_KEY = cfg.api_key
 
-def _get_provided_key(request: Request, x_api_key: Optional[str], authorization: Optional[str]) -> Optional[str]:
-    # Priority: X-API-Key header -> Authorization(Bearer/Basic) -> Cookie -> query param (?x-api-key|?api_key|?apikey)
-    if x_api_key:
-        return x_api_key
-    if authorization:
-        lower = authorization.lower()
-        if lower.startswith("bearer "):
-            return authorization.split(" ", 1)[1].strip()
-        if lower.startswith("basic "):
-            # Accept Basic user:pass, we take pass as api key
-            import base64
-            try:
-                raw = authorization.split(" ", 1)[1].strip()
-                dec = base64.b64decode(raw).decode("utf-8", "ignore")
-                if ":" in dec:
-                    return dec.split(":", 1)[1]
-            except Exception:
-                pass
-    # Cookie lookup
-    try:
-        ck = request.cookies.get("x-api-key") or request.cookies.get("api_key") or request.cookies.get("apikey")
-        if ck:
-            return ck
-    except Exception:
-        pass
-    qp = request.query_params.get("x-api-key")
-    if qp:
-        return qp
-    qp = request.query_params.get("api_key") or request.query_params.get("apikey")
-    if qp:
-        return qp
-    return None
-
-def require_api_key(request: Request, x_api_key: Optional[str], authorization: Optional[str]):
+def _resolve_principal(request: Request, x_api_key: Optional[str], authorization: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Principal meta for the request's key ({"master": True}, key meta, or None in open mode); 401 otherwise."""
     provided = _get_provided_key(request, x_api_key, authorization)
     # Master key short-circuit
     if EXPECTED_API_KEY and provided == EXPECTED_API_KEY:
-        _inc("mcp_auth_total", outcome="success", kind="master")
-        set_current_user_meta({"master": True})
-        return
+        _AUTH.inc(outcome="success", kind="master")
+        return {"master": True}
     # Generated key path
     ok, meta = resolve_key(provided)
     if ok:
-        _inc("mcp_auth_total", outcome="success", kind="key")
-        set_current_user_meta(meta or None)
-        return
+        _AUTH.inc(outcome="success", kind="key")
+        return meta or None
     # If neither master nor generated keys are configured, allow open (dev mode)
-    has_any_keys = bool(EXPECTED_API_KEY) or bool(apikey_list())
+    has_any_keys = bool(EXPECTED_API_KEY) or apikey_any()
     if not has_any_keys:
-        _inc("mcp_auth_total", outcome="success", kind="open")
-        set_current_user_meta(None)
-        return
-    _inc("mcp_auth_total", outcome="failure")
+        _AUTH.inc(outcome="success", kind="open")
+        return None
+    _AUTH.inc(outcome="failure")
     raise HTTPException(status_code=401, detail="Invalid or missing API Key")
 
 
-def _allowed_tools_for_request(request: Request, x_api_key: Optional[str], authorization: Optional[str]) -> Optional[set[str]]:
-    provided = _get_provided_key(request, x_api_key, authorization)
-    # Master key → all tools
-    if EXPECTED_API_KEY and provided == EXPECTED_API_KEY:
+def require_api_key(request: Request, x_api_key: Optional[str], authorization: Optional[str]):
+    set_current_user_meta(_resolve_principal(request, x_api_key, authorization))
+
+
+def _authorize_mcp(request: Request, x_api_key: Optional[str], authorization: Optional[str]) -> Optional[Dict[str, Any]]:
+    """DB part of /mcp auth, run on a worker thread (never on the event loop).
+
+    Key lookup, open-mode check and a cold RBAC role load share one session, which is
+    closed (connection back in the pool) before this returns — tool calls never hold it.
+    """
+    with request_scope():
+        meta = _resolve_principal(request, x_api_key, authorization)
+        if not rbac.roles_cached():
+            set_current_user_meta(meta)  # this thread's context copy only
+            _allowed_tools_for_request(call=True)
+    return meta
+
+
+def _session_for(request: Request, provided: Optional[str]) -> Optional[McpSession]:
+    """Resolve Mcp-Session-Id (no DB lookups) and install its principal/service in the context.
+
+    Unknown, expired, or someone else's session id → 404 (client must re-initialize).
+    """
+    sid = request.headers.get("mcp-session-id")
+    if not sid:
+        set_current_service(None)
         return None
-    ok, meta = resolve_key(provided)
-    if not ok:
-        # No keys configured → open; else None means all, here return None only if no keys configured
-        has_any_keys = bool(EXPECTED_API_KEY) or bool(apikey_list())
-        return None if not has_any_keys else set()
-    names = set((meta or {}).get("allowed_tools", []) or [])
-    return names
+    session = _sessions.get(sid, _sse_channel_key(provided))
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    set_current_user_meta(session.meta)
+    set_current_service(session.service)
+    return session
+
+
+def _drop_principal_sessions(principal: str) -> None:
+    # Called from the threadpool (admin endpoints) or the invalidation poller; the session store lives on the event loop
+    if _event_loop is not None and _event_loop.is_running():
+        _event_loop.call_soon_threadsafe(_sessions.drop_principal, principal)
+    else:
+        _sessions.drop_principal(principal)
+
+
+def _close_key_sessions(key: str) -> None:
+    # Every worker drops that key's sessions (cached principal/service); only the hash leaves this process
+    invalidation.publish("apikey", _sse_channel_key(key))
+
+
+def _reload_tools_from_peer(key: str) -> None:
+    try:
+        reload_registry(force=key == "force")
+    except Exception:
+        logger.exception("tool registry reload requested by another worker failed")
+
+
+# Keyed: a re-import of this module replaces these instead of stacking a second copy
+invalidation.subscribe("apikey", _drop_principal_sessions, key="main.sessions")
+invalidation.subscribe("tools", _reload_tools_from_peer, key="main.tools")
+
+
+def _allowed_tools_for_request(call: bool = False) -> Optional[FrozenSet[str]]:
+    """Effective tool set for the principal resolved by require_api_key (None = all tools).
+
+    Shares the RBAC cache with tools/list so both paths agree on role grants; for
+    tools/call (`call=True`) a key without any grant is denied every tool.
+    """
+    meta = get_current_user_meta()
+    if not meta or meta.get("master"):
+        # Master key or open dev mode → all tools
+        return None
+    if call:
+        return rbac.effective_call_tools(meta.get("role"), meta.get("allowed_tools"))
+    return allowed_tools_for_current_user()
 
 
 @app.get("/health")
@@ -338,6 +458,7 @@ def health(request: Request, x_api_key: Optional[str] = Header(None), authorizat
         "protocolRevision": MCP_PROTOCOL_REV,
         "apiKeyRequired": bool(cfg.api_key),
         "tokenPresent": True,  # DB 기반으로 관리
+        "startup": _startup_ms,
     }
 
 @app.get("/mcp/capabilities")
@@ -348,32 +469,64 @@ def mcp_capabilities():
 
 
 
-@app.post("/mcp")
-async def mcp_entry(request: Request, x_api_key: str = Header(None), authorization: str = Header(None)):
-    # API Key 인증 (X-API-Key / Authorization: Bearer / query param)
-    require_api_key(request, x_api_key, authorization)
-    """
-    단일 JSON-RPC 엔드포인트 (SSE/HTTP 자동 분기)
-    """
-    accept = request.headers.get("accept", "")
+# ---------------------------------------------------------------------
+# JSON-RPC dispatch (shared by single requests, batches and STDIO)
+# ---------------------------------------------------------------------
+def _rpc_error(id_val: Any, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": MCP_JSONRPC_VERSION, "id": id_val, "error": {"code": code, "message": message}}
 
-    import time
-    t0 = time.time()
+
+def _rpc_encode(out: Any) -> bytes:
+    # Responses are either envelope dicts or pre-serialized bytes (tools/list fast path)
+    if isinstance(out, bytes):
+        return out
+    return json.dumps(out, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# Request phases in Server-Timing order (see app.context.timed/add_timing call sites)
+_TIMING_PHASES = ("auth", "token", "validate", "graph_wait", "graph_io", "project", "serialize")
+
+
+def _timing_summary(timing: Dict[str, float]) -> Dict[str, float]:
+    return {p: round(timing[p], 2) for p in _TIMING_PHASES if p in timing}
+
+
+def _server_timing(timing: Dict[str, float], total_ms: float) -> str:
+    parts = [f"{p};dur={timing[p]:.2f}" for p in _TIMING_PHASES if p in timing]
+    parts.append(f"total;dur={total_ms:.2f}")
+    return ", ".join(parts)
+
+
+def _with_timing_headers(resp: Response, timing: Dict[str, float], t_start: float) -> Response:
+    if cfg.server_timing:
+        resp.headers["Server-Timing"] = _server_timing(timing, (time.perf_counter() - t_start) * 1000)
+    return resp
+
+
+def _log_rpc(event: str, req_id: Any, method: str, corr: str, **fields) -> None:
     try:
-        payload = await request.json()
+        msg = {"event": event, "id": req_id, "method": method, "corr": corr}
+        msg.update(fields)
+        logger.info(json.dumps(msg, ensure_ascii=False))
     except Exception:
-        return _jsonrpc_err(None, -32700, "Parse error")
+        logger.info(f"{event} id={req_id} method={method} corr={corr} {fields}")
 
-    if isinstance(payload, list):
-        return _jsonrpc_err(None, -32600, "Batch not supported")
 
+def _prepare_rpc(payload: Any):
+    """Validate one JSON-RPC message.
+
+    Returns (req, method, params) to execute, a response envelope dict for
+    early errors/acks, or None for a notification (no response).
+    """
+    if not isinstance(payload, dict):
+        return _rpc_error(None, -32600, "Invalid Request")
     try:
         req = JsonRpcRequest.model_validate(payload)
     except ValidationError:
-        return _jsonrpc_err(None, -32600, "Invalid Request")
+        return _rpc_error(None, -32600, "Invalid Request")
 
     if req.jsonrpc != MCP_JSONRPC_VERSION:
-        return _jsonrpc_err(req.id, -32600, "Invalid jsonrpc version")
+        return _rpc_error(req.id, -32600, "Invalid jsonrpc version")
 
     method = req.method or ""
     params = req.params or {}
@@ -382,13 +535,12 @@ async def mcp_entry(request: Request, x_api_key: str = Header(None), authorizati
     # Common notifications include 'notifications/initialized'
     if req.id is None:
         logger.info(json.dumps({"event": "notification", "method": method}))
-        # Some clients warn on 204; return empty JSON 200 to be lenient
-        return FastAPIJSONResponse(content={})
+        return None
 
     # Some clients may send notifications with an id (non-standard).
     # For methods under notifications/*, return empty success to avoid warnings.
     if isinstance(method, str) and method.startswith("notifications/"):
-        return _jsonrpc_ok(req.id, {})
+        return {"jsonrpc": MCP_JSONRPC_VERSION, "id": req.id, "result": {}}
 
     # Compatibility shim: allow calling tool name directly as JSON-RPC method
     # e.g., method="todo.lists.get" with params={} → tools/call {name, arguments}
@@ -397,16 +549,237 @@ async def mcp_entry(request: Request, x_api_key: str = Header(None), authorizati
             method = "tools/call"
             params = {"name": req.method, "arguments": params}
         else:
-            return _jsonrpc_err(req.id, -32602, "Invalid params")
+            return _rpc_error(req.id, -32602, "Invalid params")
+    return req, method, params
+
+
+def _graph_client_request_id(correlation_id: str) -> str:
+    # Graph's client-request-id must be a GUID: reuse a GUID-shaped correlation id, else mint one per request
+    try:
+        return str(uuid.UUID(correlation_id))
+    except ValueError:
+        return str(uuid.uuid4())
+
+
+async def _execute_rpc(
+    req: JsonRpcRequest,
+    method: str,
+    params: Dict[str, Any],
+    correlation_id: str,
+    t0: float,
+    channel: Optional[str] = None,
+):
+    """Execute a prepared request; returns a response envelope (dict or pre-serialized bytes).
+
+    Results are also published to the caller's own SSE `channel`, if it has one.
+    """
+    crid = _graph_client_request_id(correlation_id)
+    set_client_request_id(crid)
+    with span("rpc." + method, corr=correlation_id, client_request_id=crid, tool=params.get("name") if method == "tools/call" else None):
+        return await _dispatch_rpc(req, method, params, correlation_id, t0, channel, crid)
+
+
+async def _dispatch_rpc(
+    req: JsonRpcRequest,
+    method: str,
+    params: Dict[str, Any],
+    correlation_id: str,
+    t0: float,
+    channel: Optional[str],
+    crid: str,
+):
+    # -------------------------
+    # initialize (capabilities, serverInfo, protocolRevision)
+    # -------------------------
+    if method == "initialize":
+        _log_rpc("rpc", req.id, method, correlation_id, stage="initialize")
+        _REQUESTS.inc(method="initialize", status="ok")
+        _observe_hist("mcp_http_request_duration_ms", int((time.time() - t0) * 1000), endpoint="initialize", status="ok", tool="")
+        resp = {
+            "capabilities": CAPABILITIES["capabilities"],
+            "server": CAPABILITIES["server"],
+            "protocolRevision": MCP_PROTOCOL_REV
+        }
+        out = {"jsonrpc": MCP_JSONRPC_VERSION, "id": req.id, "result": resp}
+        _publish_sse(channel, out)
+        return out
+
+    # -------------------------
+    # tools/list
+    # -------------------------
+    if method == "tools/list":
+        # Fast path: cached catalogue bytes for this principal's tool set (no dict copies/filters)
+        cat = catalog_for(_allowed_tools_for_request())
+        _log_rpc("rpc", req.id, method, correlation_id, stage="tools/list")
+        _REQUESTS.inc(method="tools/list", status="ok")
+        _observe_hist("mcp_http_request_duration_ms", int((time.time() - t0) * 1000), endpoint="tools/list", status="ok", tool="")
+        body = _jsonrpc_ok_bytes(req.id, cat.body)
+        _publish_sse(channel, body)
+        return body
+
+    # -------------------------
+    # tools/call
+    # -------------------------
+    if method == "tools/call":
+        name = params.get("name")
+        arguments = params.get("arguments", {})
+        if not name or not isinstance(arguments, dict):
+            _log_rpc("rpc.error", req.id, method, correlation_id, reason="invalid_params")
+            _REQUESTS.inc(method="tools/call", tool=name or "", status="invalid_params")
+            _observe_hist("mcp_http_request_duration_ms", int((time.time() - t0) * 1000), endpoint="tools/call", status="invalid_params", tool=name or "")
+            return _rpc_error(req.id, -32602, "Invalid params")
+        allowed = _allowed_tools_for_request(call=True)
+        if allowed is not None and name not in allowed:
+            _REQUESTS.inc(method="tools/call", tool=name, status="forbidden")
+            _observe_hist("mcp_http_request_duration_ms", int((time.time() - t0) * 1000), endpoint="tools/call", status="forbidden", tool=name)
+            return _rpc_error(req.id, -32601, "Tool not allowed for this API key")
+        try:
+            # Graph I/O is blocking: run off the event loop (context vars are copied)
+            result = await asyncio.to_thread(_call_tool, name, arguments)
+            timing = get_timing()
+            if timing is not None and (params.get("_meta") or {}).get("timing") and isinstance(result, dict):
+                # Opt-in per call: params._meta.timing = true → result._meta.timing (serialize excluded)
+                result = {**result, "_meta": {**(result.get("_meta") or {}), "timing": _timing_summary(timing)}}
+            dt = int((time.time() - t0) * 1000)
+            _log_rpc("rpc", req.id, method, correlation_id, stage="tools/call", tool=name, ms=dt, crid=crid)
+            _REQUESTS.inc(method="tools/call", tool=name, status="ok")
+            _observe("mcp_tool_duration_ms", dt, tool=name)
+            _observe_hist("mcp_tool_call_duration_ms", dt, tool=name)
+            _observe_hist("mcp_http_request_duration_ms", int((time.time() - t0) * 1000), endpoint="tools/call", status="ok", tool=name)
+            out = {"jsonrpc": MCP_JSONRPC_VERSION, "id": req.id, "result": result}
+            _publish_sse(channel, out)
+            return out
+        except TypeError as te:
+            _log_rpc("rpc.error", req.id, method, correlation_id, tool=name, reason="type_error", msg=str(te))
+            _REQUESTS.inc(method="tools/call", tool=name, status="type_error")
+            _observe_hist("mcp_http_request_duration_ms", int((time.time() - t0) * 1000), endpoint="tools/call", status="type_error", tool=name)
+            return _rpc_error(req.id, -32602, f"Invalid params: {str(te)}")
+        except Exception as e:
+            logger.exception("server error on tools/call")
+            _log_rpc("rpc.error", req.id, method, correlation_id, tool=name, reason="server_error", msg=str(e), crid=crid)
+            _REQUESTS.inc(method="tools/call", tool=name, status="server_error")
+            _observe_hist("mcp_http_request_duration_ms", int((time.time() - t0) * 1000), endpoint="tools/call", status="server_error", tool=name)
+            return _rpc_error(req.id, -32000, f"Server error: {str(e)}")
+
+    _log_rpc("rpc.error", req.id, method, correlation_id, reason="method_not_found")
+    _observe_hist("mcp_http_request_duration_ms", int((time.time() - t0) * 1000), endpoint=method, status="not_found", tool="")
+    return _rpc_error(req.id, -32601, "Method not found")
+
+
+# Per-key concurrency for batch entries (semaphores live only while a batch holds them)
+_batch_semaphores: "weakref.WeakValueDictionary[str, asyncio.Semaphore]" = weakref.WeakValueDictionary()
+
+
+async def _run_batch(
+    items: list,
+    *,
+    limit_key: str,
+    correlation_header: Optional[str],
+    t0: float,
+    channel: Optional[str] = None,
+) -> list:
+    """Execute a JSON-RPC batch: entries run concurrently (bounded per key), responses keep request order."""
+    sem = _batch_semaphores.get(limit_key)
+    if sem is None:
+        sem = asyncio.Semaphore(max(1, cfg.batch_max_concurrency))
+        _batch_semaphores[limit_key] = sem
+
+    async def one(item: Any):
+        prepared = _prepare_rpc(item)
+        if prepared is None or isinstance(prepared, dict):
+            return prepared
+        req, method, params = prepared
+        corr = correlation_header or str(req.id)
+        async with sem:
+            return await _execute_rpc(req, method, params, corr, t0, channel)
+
+    outs = await asyncio.gather(*(one(i) for i in items))
+    with timed("serialize"):
+        return [_rpc_encode(o) for o in outs if o is not None]
+
+
+async def _call_tool_with_progress(name: str, arguments: Dict[str, Any], progress_token: Any):
+    """Run _call_tool in a worker thread, yielding ("progress", params) as the tool reports
+    progress and finally ("result", result). Progress is only emitted with a progress token."""
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    ctx = contextvars.copy_context()
+    if progress_token is not None:
+        def on_progress(ev: Dict[str, Any]) -> None:
+            loop.call_soon_threadsafe(events.put_nowait, {"progressToken": progress_token, **ev})
+        ctx.run(set_progress_reporter, on_progress)
+    fut = loop.run_in_executor(None, ctx.run, _call_tool, name, arguments)
+    while not fut.done():
+        getter = asyncio.ensure_future(events.get())
+        done, _ = await asyncio.wait({fut, getter}, return_when=asyncio.FIRST_COMPLETED)
+        if getter in done:
+            yield "progress", getter.result()
+        else:
+            getter.cancel()
+    # Progress posted before completion is already queued (call_soon_threadsafe is FIFO)
+    while not events.empty():
+        yield "progress", events.get_nowait()
+    yield "result", fut.result()
+
+
+@app.post("/mcp")
+async def mcp_entry(request: Request, x_api_key: str = Header(None), authorization: str = Header(None)):
+    # 세션(Mcp-Session-Id)이 있으면 캐시된 principal/service 사용, 없으면
+    # API Key 인증 (X-API-Key / Authorization: Bearer / query param) — once per HTTP request (incl. batches)
+    t_start = time.perf_counter()
+    timing = start_timing()
+    with timed("auth"):
+        provided = _get_provided_key(request, x_api_key, authorization)
+        session = _session_for(request, provided)
+        # DB lookups run on a worker thread: the event loop must never wait on the pool, since
+        # it is what returns the connections (a loop blocked in checkout stalls the whole worker)
+        if session is None:
+            set_current_user_meta(await asyncio.to_thread(_authorize_mcp, request, x_api_key, authorization))
+        elif not rbac.roles_cached():
+            await asyncio.to_thread(_allowed_tools_for_request, True)
+    channel = session.channel if session else _sse_channel_key(provided)
+    """
+    단일 JSON-RPC 엔드포인트 (SSE/HTTP 자동 분기, JSON-RPC batch 지원)
+    """
+    accept = request.headers.get("accept", "")
+
+    t0 = time.time()
+    try:
+        payload = await request.json()
+    except Exception:
+        return _jsonrpc_err(None, -32700, "Parse error")
+
+    if isinstance(payload, list):
+        if not payload:
+            return _jsonrpc_err(None, -32600, "Invalid Request")
+        if len(payload) > cfg.batch_max_size:
+            return _jsonrpc_err(None, -32600, f"Batch too large (max {cfg.batch_max_size})")
+        corr_header = request.headers.get("x-correlation-id")
+        parts = await _run_batch(
+            payload,
+            limit_key=provided or "-",
+            correlation_header=corr_header,
+            t0=t0,
+            channel=channel,
+        )
+        headers = {"x-correlation-id": corr_header} if corr_header else {}
+        if not parts:
+            # Only notifications: nothing to return
+            return _with_timing_headers(Response(status_code=202, headers=headers), timing, t_start)
+        resp = Response(content=b"[" + b",".join(parts) + b"]", media_type="application/json", headers=headers)
+        return _with_timing_headers(resp, timing, t_start)
+
+    prepared = _prepare_rpc(payload)
+    if prepared is None:
+        # Some clients warn on 204; return empty JSON 200 to be lenient
+        return FastAPIJSONResponse(content={})
+    if isinstance(prepared, dict):
+        return JSONResponse(prepared)
+    req, method, params = prepared
     correlation_id = request.headers.get("x-correlation-id") or str(req.id) or "-"
 
     def log_event(event: str, **fields):
-        try:
-            msg = {"event": event, "id": req.id, "method": method, "corr": correlation_id}
-            msg.update(fields)
-            logger.info(json.dumps(msg, ensure_ascii=False))
-        except Exception:
-            logger.info(f"{event} id={req.id} method={method} corr={correlation_id} {fields}")
+        _log_rpc(event, req.id, method, correlation_id, **fields)
 
     # initialize/tools/list는 항상 JSON 응답
     # SSE는 tools/call에서만 허용 (Accept: text/event-stream)
@@ -414,7 +787,6 @@ async def mcp_entry(request: Request, x_api_key: str = Header(None), authorizati
 
     # SSE 스트리밍 응답 핸들러
     async def sse_stream():
-        import asyncio
         # SSE는 tools/call에서만 사용
         if method == "tools/call":
             name = params.get("name")
@@ -423,13 +795,26 @@ async def mcp_entry(request: Request, x_api_key: str = Header(None), authorizati
                 msg = json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "id": req.id, "error": {"code": -32602, "message": "Invalid params"}})
                 yield f"data: {msg}\n\n"
                 return
+            allowed = _allowed_tools_for_request(call=True)
+            if allowed is not None and name not in allowed:
+                _REQUESTS.inc(method="tools/call", tool=name, status="forbidden")
+                msg = json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "id": req.id, "error": {"code": -32601, "message": "Tool not allowed for this API key"}})
+                yield f"data: {msg}\n\n"
+                return
+            progress_token = (params.get("_meta") or {}).get("progressToken")
+            set_client_request_id(_graph_client_request_id(correlation_id))
             try:
-                # 진행 로그 예시: 툴 실행 시작
+                # 툴 실행 시작
                 log_event("tool.start", tool=name)
                 yield f"data: {json.dumps({'event': 'start', 'tool': name, 'corr': correlation_id})}\n\n"
-                # 실제 툴 실행 (비동기 sleep으로 진행 로그 시뮬레이션)
-                # 실서비스에서는 yield로 중간 로그/상태를 전송
-                result = _call_tool(name, arguments)
+                # 실제 툴 실행: 진행 이벤트(페이지/청크/아이템)를 notifications/progress로 즉시 전달
+                result = None
+                async for kind, value in _call_tool_with_progress(name, arguments, progress_token):
+                    if kind == "progress":
+                        note = {"jsonrpc": MCP_JSONRPC_VERSION, "method": "notifications/progress", "params": value}
+                        yield f"data: {json.dumps(note, ensure_ascii=False)}\n\n"
+                    else:
+                        result = value
                 # 툴 실행 완료
                 log_event("tool.finish", tool=name)
                 yield f"data: {json.dumps({'event': 'finish', 'tool': name, 'corr': correlation_id})}\n\n"
@@ -454,97 +839,30 @@ async def mcp_entry(request: Request, x_api_key: str = Header(None), authorizati
         return StreamingResponse(sse_stream(), media_type="text/event-stream")
 
     # 기존 HTTP 응답
-    # -------------------------
-    # initialize (capabilities, serverInfo, protocolRevision)
-    # -------------------------
-    if method == "initialize":
-        log_event("rpc", stage="initialize")
-        _inc("mcp_requests_total", method="initialize", status="ok")
-        _observe_hist("mcp_http_request_duration_ms", int((time.time() - t0) * 1000), endpoint="initialize", status="ok", tool="")
-        resp = {
-            "capabilities": CAPABILITIES["capabilities"],
-            "server": CAPABILITIES["server"],
-            "protocolRevision": MCP_PROTOCOL_REV
-        }
-        # broadcast to SSE listeners as well
-        try:
-            payload = json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "id": req.id, "result": resp})
-            for q in list(_sse_clients):
-                q.put_nowait(payload)
-        except Exception:
-            pass
-        return _jsonrpc_ok(req.id, resp, headers={"x-correlation-id": correlation_id})
-
-    # -------------------------
-    # tools/list
-    # -------------------------
-    if method == "tools/list":
-        cursor = params.get("cursor")
-        tools, next_cursor = _list_tools(cursor)
-        allowed = _allowed_tools_for_request(request, x_api_key, authorization)
-        if allowed is not None:
-            tools = [t for t in tools if t.get("name") in allowed]
-        result = {"tools": tools}
-        if next_cursor is not None:
-            result["nextCursor"] = next_cursor
-        log_event("rpc", stage="tools/list")
-        _inc("mcp_requests_total", method="tools/list", status="ok")
-        _observe_hist("mcp_http_request_duration_ms", int((time.time() - t0) * 1000), endpoint="tools/list", status="ok", tool="")
-        try:
-            payload = json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "id": req.id, "result": result})
-            for q in list(_sse_clients):
-                q.put_nowait(payload)
-        except Exception:
-            pass
-        return _jsonrpc_ok(req.id, result, headers={"x-correlation-id": correlation_id})
+    headers = {"x-correlation-id": correlation_id}
+    if method == "initialize" and session is None:
+        # New MCP session: later requests with Mcp-Session-Id skip key/service resolution
+        session = _sessions.create(_sse_channel_key(provided), get_current_user_meta(), _service())
+        headers["Mcp-Session-Id"] = session.id
+        channel = session.channel
+    out = await _execute_rpc(req, method, params, correlation_id, t0, channel)
+    with timed("serialize"):
+        if isinstance(out, bytes):
+            resp = Response(content=out, media_type="application/json", headers=headers)
+        else:
+            resp = JSONResponse(out, headers=headers)
+    return _with_timing_headers(resp, timing, t_start)
 
-    # -------------------------
-    # tools/call
-    # -------------------------
-    if method == "tools/call":
-        name = params.get("name")
-        arguments = params.get("arguments", {})
-        if not name or not isinstance(arguments, dict):
-            log_event("rpc.error", reason="invalid_params")
-            _inc("mcp_requests_total", method="tools/call", tool=name or "", status="invalid_params")
-            _observe_hist("mcp_http_request_duration_ms", int((time.time() - t0) * 1000), endpoint="tools/call", status="invalid_params", tool=name or "")
-            return _jsonrpc_err(req.id, -32602, "Invalid params", headers={"x-correlation-id": correlation_id})
-        allowed = _allowed_tools_for_request(request, x_api_key, authorization)
-        if allowed is not None and name not in allowed:
-            _inc("mcp_requests_total", method="tools/call", tool=name, status="forbidden")
-            _observe_hist("mcp_http_request_duration_ms", int((time.time() - t0) * 1000), endpoint="tools/call", status="forbidden", tool=name)
-            return _jsonrpc_err(req.id, -32601, "Tool not allowed for this API key", headers={"x-correlation-id": correlation_id})
-        try:
-            result = _call_tool(name, arguments)
-            dt = int((time.time() - t0) * 1000)
-            log_event("rpc", stage="tools/call", tool=name, ms=dt)
-            _inc("mcp_requests_total", method="tools/call", tool=name, status="ok")
-            _observe("mcp_tool_duration_ms", dt, tool=name)
-            _observe_hist("mcp_tool_call_duration_ms", dt, tool=name)
-            _observe_hist("mcp_http_request_duration_ms", int((time.time() - t0) * 1000), endpoint="tools/call", status="ok", tool=name)
-            # broadcast to SSE listeners as well
-            try:
-                payload = json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "id": req.id, "result": result})
-                for q in list(_sse_clients):
-                    q.put_nowait(payload)
-            except Exception:
-                pass
-            return _jsonrpc_ok(req.id, result, headers={"x-correlation-id": correlation_id})
-        except TypeError as te:
-            log_event("rpc.error", tool=name, reason="type_error", msg=str(te))
-            _inc("mcp_requests_total", method="tools/call", tool=name, status="type_error")
-            _observe_hist("mcp_http_request_duration_ms", int((time.time() - t0) * 1000), endpoint="tools/call", status="type_error", tool=name)
-            return _jsonrpc_err(req.id, -32602, f"Invalid params: {str(te)}", headers={"x-correlation-id": correlation_id})
-        except Exception as e:
-            logger.exception("server error on tools/call")
-            log_event("rpc.error", tool=name, reason="server_error", msg=str(e))
-            _inc("mcp_requests_total", method="tools/call", tool=name, status="server_error")
-            _observe_hist("mcp_http_request_duration_ms", int((time.time() - t0) * 1000), endpoint="tools/call", status="server_error", tool=name)
-            return _jsonrpc_err(req.id, -32000, f"Server error: {str(e)}", headers={"x-correlation-id": correlation_id})
 
-    log_event("rpc.error", reason="method_not_found")
-    _observe_hist("mcp_http_request_duration_ms", int((time.time() - t0) * 1000), endpoint=method, status="not_found", tool="")
-    return _jsonrpc_err(req.id, -32601, "Method not found", headers={"x-correlation-id": correlation_id})
+@app.delete("/mcp")
+async def mcp_session_delete(request: Request, x_api_key: str = Header(None), authorization: str = Header(None)):
+    """Terminate an MCP session (Mcp-Session-Id) and close its SSE channel."""
+    sid = request.headers.get("mcp-session-id")
+    if not sid:
+        raise HTTPException(status_code=400, detail="Missing Mcp-Session-Id")
+    session = _session_for(request, _get_provided_key(request, x_api_key, authorization))
+    _sessions.delete(session.id)
+    return Response(status_code=204)
 
 # ---------------------------------------------------------------------
 # Admin: API key management (master key only)
@@ -564,7 +882,7 @@ def _require_master(request: Request, x_api_key: Optional[str], authorization: O
     provided = _get_provided_key(request, x_api_key, authorization)
     # Dev-open mode: if no master and no generated keys exist, allow
     try:
-        has_any_keys = bool(EXPECTED_API_KEY) or bool(apikey_list())
+        has_any_keys = bool(EXPECTED_API_KEY) or apikey_any()
     except Exception:
         has_any_keys = bool(EXPECTED_API_KEY)
     if not has_any_keys:
@@ -602,6 +920,7 @@ def delete_api_key(key: str, request: Request, x_api_key: Optional[str] = Header
     ok = apikey_delete(key)
     if not ok:
         raise HTTPException(status_code=404, detail="key not found")
+    _close_key_sessions(key)
     return {"deleted": True}
 
 
@@ -631,6 +950,7 @@ def update_api_key(key: str, payload: UpdateKeyPayload, request: Request, x_api_
     meta = apikey_update(key, payload.model_dump())
     if not meta:
         raise HTTPException(status_code=404, detail="key not found")
+    _close_key_sessions(key)  # cached principal/service are stale
     return {"api_key": key, "meta": meta}
 
 
@@ -690,6 +1010,133 @@ def rbac_put(name: str, payload: RolePayload, request: Request, x_api_key: Optio
     return rbac.upsert_role(name, payload.tools)
 
 
+@app.post("/admin/tools/reload")
+def tools_reload(request: Request, force: bool = False, x_api_key: Optional[str] = Header(None), authorization: Optional[str] = Header(None)):
+    """Hot-reload tool schemas/executors/validators; notifies SSE clients if the registry changed."""
+    _require_master(request, x_api_key, authorization)
+    try:
+        changed, reg = reload_registry(force=force)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"reload failed: {e}")
+    if changed:
+        invalidation.publish("tools", "force" if force else "", apply_local=False)
+    return {"reloaded": changed, "tools": len(reg.tools), "etag": reg.catalog_for(None).etag}
+
+
+# ---------------------------------------------------------------------
+# Admin: diagnostics (master key only)
+# ---------------------------------------------------------------------
+@app.get("/admin/profile")
+async def admin_profile(
+    request: Request,
+    seconds: float = 5.0,
+    interval_ms: float = 10.0,
+    format: str = "collapsed",
+    x_api_key: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
+):
+    """Sample every thread of this worker for `seconds` (1ms–1s interval, max 60s).
+    format=collapsed (flamegraph text) | speedscope (JSON for speedscope.app)."""
+    await asyncio.to_thread(_require_master, request, x_api_key, authorization)  # may read the DB
+    if format not in ("collapsed", "speedscope"):
+        raise HTTPException(status_code=400, detail="format must be 'collapsed' or 'speedscope'")
+    from app import profiler  # loaded on first use only
+    seconds = min(max(seconds, 0.1), 60.0)
+    interval = min(max(interval_ms, 1.0), 1000.0) / 1000.0
+    try:
+        # The sampler sleeps in a worker thread, so the event loop keeps serving (and is sampled)
+        stacks, rounds = await asyncio.to_thread(profiler.sample, seconds, interval)
+    except profiler.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    headers = {"X-Profile-Samples": str(rounds)}
+    if format == "speedscope":
+        return JSONResponse(profiler.to_speedscope(stacks, interval, name=f"{cfg.server_name} pid {os.getpid()}"), headers=headers)
+    return Response(content=profiler.to_collapsed(stacks), media_type="text/plain", headers=headers)
+
+
+def _cache_sizes() -> Dict[str, Any]:
+    """Entry counts of the server's own caches/registries (event-loop thread)."""
+    from app import tracing
+    from app.container import get_todo_service_for
+    return {
+        "metrics_series": METRICS.series_by_family(),
+        "todo_services": get_todo_service_for.cache_info()._asdict(),
+        "sse": {"channels": len(_sse_hub), "connections": _sse_hub.connections, "buffered_frames": _sse_hub.buffered},
+        "sessions": len(_sessions),
+        "batch_semaphores": len(_batch_semaphores),
+        "rbac": rbac.cache_stats(),
+        "tools": tools_cache_stats(),
+        "trace_queue": tracing.queue_size(),
+    }
+
+
+@app.get("/admin/memory")
+async def admin_memory(
+    request: Request,
+    top: int = 0,
+    group_by: str = "lineno",
+    x_api_key: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
+):
+    """RSS, cache/registry sizes, tracemalloc status and (if tracing and top>0) top allocation sites."""
+    await asyncio.to_thread(_require_master, request, x_api_key, authorization)  # may read the DB
+    from app import memdiag
+    out: Dict[str, Any] = {"process": memdiag.process_memory(), "caches": _cache_sizes(), "tracemalloc": memdiag.status()}
+    if top > 0 and out["tracemalloc"]["tracing"]:
+        if group_by not in ("lineno", "filename", "traceback"):
+            raise HTTPException(status_code=400, detail="group_by must be lineno, filename or traceback")
+        out["top"] = await asyncio.to_thread(memdiag.top, min(top, 200), group_by)
+    return out
+
+
+@app.post("/admin/memory/tracemalloc")
+def admin_memory_tracemalloc(
+    request: Request,
+    action: str,
+    frames: int = 1,
+    x_api_key: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
+):
+    """action=start (frames = traceback depth) | stop (also drops saved snapshots)."""
+    _require_master(request, x_api_key, authorization)
+    from app import memdiag
+    if action == "start":
+        return memdiag.start(frames)
+    if action == "stop":
+        return memdiag.stop()
+    raise HTTPException(status_code=400, detail="action must be 'start' or 'stop'")
+
+
+@app.post("/admin/memory/snapshots")
+def admin_memory_snapshot(request: Request, name: str, x_api_key: Optional[str] = Header(None), authorization: Optional[str] = Header(None)):
+    _require_master(request, x_api_key, authorization)
+    from app import memdiag
+    try:
+        return memdiag.save_snapshot(name)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get("/admin/memory/diff")
+def admin_memory_diff(
+    request: Request,
+    base: str,
+    to: Optional[str] = None,
+    limit: int = 20,
+    x_api_key: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
+):
+    """Largest allocation growth from snapshot `base` to snapshot `to` (default: now)."""
+    _require_master(request, x_api_key, authorization)
+    from app import memdiag
+    try:
+        return {"base": base, "to": to or "now", "diff": memdiag.diff(base, to, min(max(limit, 1), 200))}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"snapshot not found: {e.args[0]}")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
 @app.delete("/admin/rbac/roles/{name}")
 def rbac_del(name: str, request: Request, x_api_key: Optional[str] = Header(None), authorization: Optional[str] = Header(None)):
     _require_master(request, x_api_key, authorization)
@@ -720,14 +1167,17 @@ def metrics():
     txt = _render_metrics()
     return Response(content=txt, media_type="text/plain; version=0.0.4")
 
+
+_T_IMPORT_DONE_MS = (time.perf_counter() - _T_IMPORT0) * 1000
+
 # ---------------------------------------------------------------------
 # STDIO MCP 모드: stdin에서 JSON-RPC 요청을 읽고 stdout으로 응답을 출력
 # ---------------------------------------------------------------------
-if __name__ == "__main__":
+async def _stdio_loop() -> None:
     import sys
     print("[MCP STDIO mode] Ready for JSON-RPC requests via stdin.", file=sys.stderr)
     while True:
-        line = sys.stdin.readline()
+        line = await asyncio.to_thread(sys.stdin.readline)
         if not line:
             break
         line = line.strip()
@@ -736,48 +1186,27 @@ if __name__ == "__main__":
         try:
             payload = json.loads(line)
         except Exception:
-            print(json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "id": None, "error": {"code": -32700, "message": "Parse error"}}))
+            print(json.dumps(_rpc_error(None, -32700, "Parse error")), flush=True)
             continue
+        t0 = time.time()
         if isinstance(payload, list):
-            print(json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "id": None, "error": {"code": -32600, "message": "Batch not supported"}}))
-            continue
-        try:
-            req = JsonRpcRequest.model_validate(payload)
-        except ValidationError:
-            print(json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "id": None, "error": {"code": -32600, "message": "Invalid Request"}}))
-            continue
-        if req.jsonrpc != MCP_JSONRPC_VERSION:
-            print(json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "id": req.id, "error": {"code": -32600, "message": "Invalid jsonrpc version"}}))
-            continue
-        method = req.method or ""
-        params = req.params or {}
-        if method == "initialize":
-            print(json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "id": req.id, "result": {
-                "capabilities": CAPABILITIES["capabilities"],
-                "server": CAPABILITIES["server"],
-                "protocolRevision": MCP_PROTOCOL_REV
-            }}))
+            if not payload:
+                print(json.dumps(_rpc_error(None, -32600, "Invalid Request")), flush=True)
+                continue
+            parts = await _run_batch(payload, limit_key="stdio", correlation_header=None, t0=t0)
+            if parts:
+                print((b"[" + b",".join(parts) + b"]").decode("utf-8"), flush=True)
             continue
-        if method == "tools/list":
-            tools, next_cursor = _list_tools(params.get("cursor"))
-            result = {"tools": tools}
-            if next_cursor is not None:
-                result["nextCursor"] = next_cursor
-            print(json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "id": req.id, "result": result}))
+        prepared = _prepare_rpc(payload)
+        if prepared is None:
             continue
-        if method == "tools/call":
-            name = params.get("name")
-            arguments = params.get("arguments", {})
-            if not name or not isinstance(arguments, dict):
-                print(json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "id": req.id, "error": {"code": -32602, "message": "Invalid params"}}))
-                continue
-            try:
-                result = _call_tool(name, arguments)
-                print(json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "id": req.id, "result": result}))
-            except TypeError as te:
-                print(json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "id": req.id, "error": {"code": -32602, "message": f"Invalid params: {str(te)}"}}))
-            except Exception as e:
-                logging.exception("server error on tools/call (STDIO)")
-                print(json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "id": req.id, "error": {"code": -32000, "message": f"Server error: {str(e)}"}}))
+        if isinstance(prepared, dict):
+            print(json.dumps(prepared), flush=True)
             continue
-        print(json.dumps({"jsonrpc": MCP_JSONRPC_VERSION, "id": req.id, "error": {"code": -32601, "message": "Method not found"}}))
+        req, method, params = prepared
+        out = await _execute_rpc(req, method, params, str(req.id), t0)
+        print(_rpc_encode(out).decode("utf-8"), flush=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(_stdio_loop())
@@ -0,0 +1,115 @@
+ # memdiag.py (memory diagnostics for /admin/memory)
+ # - tracemalloc start/stop, top allocation sites, named snapshots and diffs
+ # - Process RSS/peak (Linux /proc, falls back to resource.getrusage)
+ # - tracemalloc costs CPU/memory only while started; snapshots are bounded in number
+
+import sys
+import threading
+import tracemalloc
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+MAX_SNAPSHOTS = 8
+
+_lock = threading.Lock()
+_snapshots: "OrderedDict[str, tracemalloc.Snapshot]" = OrderedDict()
+
+# Allocations made by tracemalloc/import machinery are noise
+_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def process_memory() -> Dict[str, Optional[int]]:
+    rss = peak = None
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) * 1024
+    except OSError:
+        try:
+            import resource
+            ru = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            peak = ru if sys.platform == "darwin" else ru * 1024
+        except Exception:
+            pass
+    return {"rss_bytes": rss, "peak_rss_bytes": peak}
+
+
+def status() -> Dict[str, Any]:
+    out: Dict[str, Any] = {"tracing": tracemalloc.is_tracing(), "snapshots": list(_snapshots)}
+    if tracemalloc.is_tracing():
+        cur, peak = tracemalloc.get_traced_memory()
+        out.update(traced_bytes=cur, traced_peak_bytes=peak, frames=tracemalloc.get_traceback_limit())
+    return out
+
+
+def start(frames: int = 1) -> Dict[str, Any]:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(max(1, min(frames, 64)))
+    return status()
+
+
+def stop() -> Dict[str, Any]:
+    with _lock:
+        _snapshots.clear()  # snapshots are meaningless once tracing restarts
+    tracemalloc.stop()
+    return status()
+
+
+def _take() -> tracemalloc.Snapshot:
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not running (POST /admin/memory/tracemalloc?action=start)")
+    return tracemalloc.take_snapshot().filter_traces(_FILTERS)
+
+
+def _stat_dict(st) -> Dict[str, Any]:
+    frame = st.traceback[0]
+    d = {"site": f"{frame.filename}:{frame.lineno}", "size_bytes": st.size, "count": st.count}
+    if len(st.traceback) > 1:
+        d["traceback"] = [f"{f.filename}:{f.lineno}" for f in st.traceback]
+    return d
+
+
+def top(limit: int = 20, key_type: str = "lineno") -> List[Dict[str, Any]]:
+    stats = _take().statistics(key_type)
+    return [_stat_dict(s) for s in stats[:limit]]
+
+
+def save_snapshot(name: str) -> Dict[str, Any]:
+    snap = _take()
+    with _lock:
+        _snapshots.pop(name, None)
+        _snapshots[name] = snap
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    return {"name": name, "traced_bytes": sum(s.size for s in snap.statistics("filename")), "snapshots": list(_snapshots)}
+
+
+def diff(base: str, to: Optional[str] = None, limit: int = 20, key_type: str = "lineno") -> List[Dict[str, Any]]:
+    """Largest growth from snapshot `base` to snapshot `to` (or a fresh snapshot)."""
+    with _lock:
+        old = _snapshots.get(base)
+        new = _snapshots.get(to) if to else None
+    if old is None:
+        raise KeyError(base)
+    if to and new is None:
+        raise KeyError(to)
+    if new is None:
+        new = _take()
+    out = []
+    for st in new.compare_to(old, key_type)[:limit]:
+        frame = st.traceback[0]
+        out.append({
+            "site": f"{frame.filename}:{frame.lineno}",
+            "size_diff_bytes": st.size_diff,
+            "size_bytes": st.size,
+            "count_diff": st.count_diff,
+            "count": st.count,
+        })
+    return out
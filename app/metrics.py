@@ -0,0 +1,325 @@
+ # metrics.py (Prometheus metrics registry)
+ # - Typed families (counter/gauge/summary/histogram) with fixed label names
+ # - Series are created once per label set: escaped label strings are pre-rendered,
+ #   histogram buckets are a per-series array (one bisect per observation)
+ # - Cardinality guards: label values outside a family's allowlist fold into "other";
+ #   past `max_series` every new label set folds into one all-"other" series
+ # - Exposition is one pass over live series (no rescans, no per-scrape string building per label)
+ # - Multiprocess mode (METRICS_MULTIPROC_DIR): each process also mirrors its values into
+ #   mmap'd slot files; /metrics in any worker merges every process's files (see app.metrics_mp)
+
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from app.config import cfg
+from app import metrics_mp
+
+OTHER = "other"
+
+# Allowed values per label: a fixed set, a predicate (e.g. "is a registered tool"), or None = any
+LabelValues = Union[None, frozenset, Callable[[str], bool]]
+
+DEFAULT_BUCKETS_MS: Tuple[float, ...] = (5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class _Family:
+    type = ""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        *,
+        values: Optional[Dict[str, LabelValues]] = None,
+        max_series: Optional[int] = None,
+    ):
+        self.name = name
+        self.help = help_text
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._checks = [(i, (values or {}).get(n)) for i, n in enumerate(self.labelnames)]
+        self._checks = [(i, c) for i, c in self._checks if c is not None]
+        self.max_series = max_series if max_series is not None else cfg.metrics_max_series
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+        self.folded = 0  # observations whose label set was folded (cardinality pressure)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        vals = [str(labels.get(n, "")) for n in self.labelnames]
+        folded = 0
+        for i, check in self._checks:
+            v = vals[i]
+            ok = (v in check) if isinstance(check, frozenset) else check(v)
+            if not ok:
+                vals[i] = OTHER
+                folded += 1
+        if folded:
+            with self._lock:  # += is read-modify-write: concurrent folds would lose counts
+                self.folded += folded
+        return tuple(vals)
+
+    def _get(self, labels: Dict[str, str]) -> list:
+        key = self._key(labels) if labels or self.labelnames else ()
+        s = self._series.get(key)
+        if s is None:
+            with self._lock:
+                s = self._series.get(key)
+                if s is None:
+                    if len(self._series) >= self.max_series:
+                        self.folded += 1
+                        key = tuple(OTHER for _ in self.labelnames)
+                        s = self._series.get(key)
+                    if s is None:
+                        s = self._new_series(key)
+                        self._series[key] = s
+        return s
+
+    def _new_series(self, key: Tuple[str, ...]) -> list:
+        raise NotImplementedError
+
+    def _slot(self, key: Tuple[str, ...], part: str = "", *, live: bool = False) -> Optional[int]:
+        """mmap slot offset for one sample of a series (None when multiprocess mode is off).
+
+        Only reached when a series is created (first observation) or a callback gauge is refreshed,
+        so building families at import never opens this process's metric files.
+        """
+        mp = metrics_mp.store()
+        if mp is None:
+            return None
+        return mp.slot(metrics_mp.sample_key(self.name, part, key), live=live)
+
+    def rebind(self) -> None:
+        """Fresh, zeroed series with new slots (after fork: the child must not re-count the parent)."""
+        with self._lock:
+            self._series = {k: self._new_series(k) for k in self._series}
+
+    def series_count(self) -> int:
+        return len(self._series)
+
+    def render(self, out: List[str]) -> None:
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} {self.type}")
+        self._render_series(out)
+
+    def _render_series(self, out: List[str]) -> None:
+        raise NotImplementedError
+
+
+class Counter(_Family):
+    type = "counter"
+
+    # series: [prefix, value, mmap slot]
+    def _new_series(self, key):
+        return [self.name + _label_str(self.labelnames, key) + " ", 0, self._slot(key)]
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        s = self._get(labels)
+        with self._lock:
+            s[1] += amount
+            if s[2] is not None:
+                metrics_mp.write(s[2], s[1])
+
+    def _render_series(self, out):
+        for prefix, v, _slot in list(self._series.values()):
+            out.append(prefix + _fmt_num(v))
+
+
+class Gauge(_Family):
+    """Gauge whose value is read at scrape time (`fn`), or set explicitly."""
+    type = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), *, fn: Optional[Callable[[], float]] = None, **kw):
+        super().__init__(name, help_text, labelnames, **kw)
+        self.fn = fn
+        self._fn_slot: Optional[int] = None  # allocated by the first refresh()
+
+    def _new_series(self, key):
+        return [self.name + _label_str(self.labelnames, key) + " ", 0, self._slot(key, live=True)]
+
+    def rebind(self) -> None:
+        super().rebind()
+        self._fn_slot = None
+
+    def refresh(self) -> None:
+        """Publish the callback's current value to this process's live file (multiprocess mode)."""
+        if self.fn is None:
+            return
+        if self._fn_slot is None:
+            self._fn_slot = self._slot((), live=True)
+            if self._fn_slot is None:
+                return
+        metrics_mp.write(self._fn_slot, float(self.fn()), live=True)
+
+    def set(self, value: float, **labels: str) -> None:
+        s = self._get(labels)
+        with self._lock:  # keep the in-memory value and the mmap slot in the same order across threads
+            s[1] = value
+            if s[2] is not None:
+                metrics_mp.write(s[2], value, live=True)
+
+    def _render_series(self, out):
+        if self.fn is not None:
+            out.append(f"{self.name} {_fmt_num(self.fn())}")
+            return
+        for prefix, v, _slot in list(self._series.values()):
+            out.append(prefix + _fmt_num(v))
+
+
+class Summary(_Family):
+    type = "summary"
+
+    # series: [sum_prefix, count_prefix, sum, count, sum slot, count slot]
+    def _new_series(self, key):
+        lbl = _label_str(self.labelnames, key)
+        return [f"{self.name}_sum{lbl} ", f"{self.name}_count{lbl} ", 0.0, 0, self._slot(key, "sum"), self._slot(key, "count")]
+
+    def observe(self, value: float, **labels: str) -> None:
+        s = self._get(labels)
+        with self._lock:
+            s[2] += value
+            s[3] += 1
+            if s[4] is not None:
+                metrics_mp.write(s[4], s[2])
+                metrics_mp.write(s[5], s[3])
+
+    def _render_series(self, out):
+        for sp, cp, total, count, _s, _c in list(self._series.values()):
+            out.append(sp + _fmt_num(total))
+            out.append(cp + str(count))
+
+
+class Histogram(_Family):
+    type = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), *, buckets: Iterable[float] = DEFAULT_BUCKETS_MS, **kw):
+        super().__init__(name, help_text, labelnames, **kw)
+        self.buckets: Tuple[float, ...] = tuple(sorted(float(b) for b in buckets))
+        self._les = [_fmt_num(b) for b in self.buckets] + ["+Inf"]
+
+    # series: [bucket_prefixes, counts (non-cumulative, last = +Inf overflow), sum_prefix, count_prefix, [sum],
+    #          bucket slots | None, sum slot]
+    def _new_series(self, key):
+        prefixes = [f"{self.name}_bucket" + _label_str(self.labelnames, key, f'le="{le}"') + " " for le in self._les]
+        lbl = _label_str(self.labelnames, key)
+        sum_slot = self._slot(key, "sum")
+        slots = [self._slot(key, "le=" + le) for le in self._les] if sum_slot is not None else None
+        return [prefixes, [0] * len(self._les), f"{self.name}_sum{lbl} ", f"{self.name}_count{lbl} ", [0.0], slots, sum_slot]
+
+    def observe(self, value: float, **labels: str) -> None:
+        v = float(value)
+        s = self._get(labels)
+        i = bisect_left(self.buckets, v)  # first bucket with v <= le (len(buckets) → +Inf)
+        with self._lock:
+            s[1][i] += 1
+            s[4][0] += v
+            if s[5] is not None:
+                metrics_mp.write(s[5][i], s[1][i])
+                metrics_mp.write(s[6], s[4][0])
+
+    def _render_series(self, out):
+        for prefixes, counts, sp, cp, total, _b, _s in list(self._series.values()):
+            acc = 0
+            for prefix, c in zip(prefixes, list(counts)):
+                acc += c
+                out.append(prefix + str(acc))
+            out.append(sp + _fmt_num(total[0]))
+            out.append(cp + str(acc))
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._families: Dict[str, _Family] = {}
+
+    def register(self, family: _Family) -> _Family:
+        existing = self._families.get(family.name)
+        if existing is not None:
+            return existing  # idempotent (module reloads)
+        self._families[family.name] = family
+        return family
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = (), **kw) -> Counter:
+        return self.register(Counter(name, help_text, labelnames, **kw))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = (), **kw) -> Gauge:
+        return self.register(Gauge(name, help_text, labelnames, **kw))  # type: ignore[return-value]
+
+    def summary(self, name: str, help_text: str, labelnames: Sequence[str] = (), **kw) -> Summary:
+        return self.register(Summary(name, help_text, labelnames, **kw))  # type: ignore[return-value]
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (), **kw) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, **kw))  # type: ignore[return-value]
+
+    def get(self, name: str) -> _Family:
+        return self._families[name]
+
+    def families(self) -> List[_Family]:
+        return list(self._families.values())
+
+    def series_count(self) -> int:
+        return sum(f.series_count() for f in self._families.values())
+
+    def series_by_family(self) -> Dict[str, int]:
+        return {name: f.series_count() for name, f in self._families.items()}
+
+    def render(self) -> str:
+        if metrics_mp.enabled():
+            return self.render_merged()
+        out: List[str] = []
+        for fam in list(self._families.values()):
+            fam.render(out)
+        return "\n".join(out) + "\n"
+
+    def refresh_gauges(self) -> None:
+        for fam in list(self._families.values()):
+            if isinstance(fam, Gauge):
+                fam.refresh()
+
+    def rebind(self) -> None:
+        for fam in list(self._families.values()):
+            fam.rebind()
+
+    def render_merged(self) -> str:
+        """Exposition merged over every worker's files (multiprocess mode)."""
+        self.refresh_gauges()
+        merged = metrics_mp.store().collect()
+        out: List[str] = []
+        for fam in list(self._families.values()):
+            out.append(f"# HELP {fam.name} {fam.help}")
+            out.append(f"# TYPE {fam.name} {fam.type}")
+            for values, parts in sorted(merged.get(fam.name, {}).items()):
+                lbl = _label_str(fam.labelnames, values)
+                if isinstance(fam, Histogram):
+                    acc = 0.0
+                    for le in fam._les:
+                        acc += parts.get("le=" + le, 0.0)
+                        le_label = 'le="%s"' % le
+                        out.append(f"{fam.name}_bucket{_label_str(fam.labelnames, values, le_label)} {_fmt_num(acc)}")
+                    out.append(f"{fam.name}_sum{lbl} {_fmt_num(parts.get('sum', 0.0))}")
+                    out.append(f"{fam.name}_count{lbl} {_fmt_num(acc)}")
+                elif isinstance(fam, Summary):
+                    out.append(f"{fam.name}_sum{lbl} {_fmt_num(parts.get('sum', 0.0))}")
+                    out.append(f"{fam.name}_count{lbl} {_fmt_num(parts.get('count', 0.0))}")
+                else:
+                    out.append(f"{fam.name}{lbl} {_fmt_num(parts.get('', 0.0))}")
+        return "\n".join(out) + "\n"
+
+
+METRICS = MetricsRegistry()
+metrics_mp.on_fork(METRICS.rebind)
+metrics_mp.on_refresh(METRICS.refresh_gauges)
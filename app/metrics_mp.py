@@ -0,0 +1,304 @@
+ # metrics_mp.py (multiprocess metrics storage; METRICS_MULTIPROC_DIR)
+ # - Each worker owns counter_<pid>.db (counters, summaries, histogram buckets: absolute per-process totals)
+ #   and gauge_<pid>.db (current values, only meaningful while the process is alive)
+ # - File layout: 8-byte header (u32 bytes used) + entries `u32 keylen | key utf-8 | pad to 8 | f64`;
+ #   a sample's slot offset never moves, so the hot path is one struct.pack_into on a shared mmap
+ # - collect() (any worker's /metrics): files of dead pids are folded into counter_archive.json under
+ #   an flock and removed, so merged counters never go backwards when a worker dies or is recycled
+ # - Fork-safe: the child gets its own files and zeroed series (os.register_at_fork)
+ # - Lazy: the store (files + refresher thread) is opened on first use, not when metric families are built
+
+import atexit
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.config import cfg
+
+_HEADER = 8
+_INITIAL_SIZE = 64 * 1024
+_ARCHIVE = "counter_archive.json"
+_REFRESH_SEC = 5.0
+
+# family → label values → part ("" | "sum" | "count" | "le=<le>") → value
+Merged = Dict[str, Dict[Tuple[str, ...], Dict[str, float]]]
+
+
+def sample_key(family: str, part: str, labelvalues: Tuple[str, ...]) -> str:
+    return json.dumps([family, part, list(labelvalues)], separators=(",", ":"))
+
+
+def _entries(buf, used: int) -> Iterator[Tuple[str, int]]:
+    """(key, value offset) for every entry in a mapped/read file."""
+    pos = _HEADER
+    used = min(used, len(buf))
+    while pos + 4 <= used:
+        klen = struct.unpack_from("I", buf, pos)[0]
+        voff = pos + 4 + klen
+        voff += -voff % 8
+        if voff + 8 > used:
+            break
+        yield bytes(buf[pos + 4:pos + 4 + klen]).decode("utf-8"), voff
+        pos = voff + 8
+
+
+def _read_file(path: str) -> Iterator[Tuple[str, float]]:
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return
+    if len(data) < _HEADER:
+        return
+    used = struct.unpack_from("I", data, 0)[0]
+    for key, voff in _entries(data, used):
+        yield key, struct.unpack_from("d", data, voff)[0]
+
+
+class _MmapFile:
+    """Append-only key → f64 slots in one mmap'd file (written by its owning process only)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._f = open(path, "a+b")
+        size = os.fstat(self._f.fileno()).st_size
+        if size < _HEADER:
+            size = _INITIAL_SIZE
+            self._f.truncate(size)
+        self._m = mmap.mmap(self._f.fileno(), size)
+        self._used = struct.unpack_from("I", self._m, 0)[0] or _HEADER
+        struct.pack_into("I", self._m, 0, self._used)
+        self.positions: Dict[str, int] = dict(_entries(self._m, self._used))
+
+    def slot(self, key: str) -> int:
+        off = self.positions.get(key)
+        if off is not None:
+            return off
+        with self._lock:
+            off = self.positions.get(key)
+            if off is not None:
+                return off
+            raw = key.encode("utf-8")
+            voff = self._used + 4 + len(raw)
+            voff += -voff % 8
+            end = voff + 8
+            if end > len(self._m):
+                self._grow(end)
+            struct.pack_into("I", self._m, self._used, len(raw))
+            self._m[self._used + 4:self._used + 4 + len(raw)] = raw
+            struct.pack_into("d", self._m, voff, 0.0)
+            self._used = end
+            struct.pack_into("I", self._m, 0, end)  # publish after the entry is complete
+            self.positions[key] = voff
+            return voff
+
+    def _grow(self, needed: int) -> None:
+        size = len(self._m)
+        while size < needed:
+            size *= 2
+        self._m.close()
+        self._f.truncate(size)
+        self._m = mmap.mmap(self._f.fileno(), size)
+
+    def write(self, off: int, value: float) -> None:
+        with self._lock:
+            struct.pack_into("d", self._m, off, value)
+
+    def close(self) -> None:
+        with self._lock:
+            self._m.close()
+            self._f.close()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _file_pid(name: str, prefix: str) -> Optional[int]:
+    if not (name.startswith(prefix) and name.endswith(".db")):
+        return None
+    try:
+        return int(name[len(prefix):-3])
+    except ValueError:
+        return None
+
+
+class MultiProcessStore:
+    def __init__(self, directory: str):
+        self.dir = directory
+        self.pid = os.getpid()
+        os.makedirs(directory, exist_ok=True)
+        with self._flock():
+            # files already named after our pid belong to an earlier process (PID reuse / crash)
+            self._archive_pid(self.pid)
+        self._counter = _MmapFile(self._path("counter", self.pid))
+        self._gauge = _MmapFile(self._path("gauge", self.pid))
+
+    def _path(self, kind: str, pid: int) -> str:
+        return os.path.join(self.dir, f"{kind}_{pid}.db")
+
+    @contextmanager
+    def _flock(self):
+        with open(os.path.join(self.dir, ".lock"), "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def slot(self, key: str, *, live: bool = False) -> int:
+        return (self._gauge if live else self._counter).slot(key)
+
+    def write(self, off: int, value: float, *, live: bool = False) -> None:
+        (self._gauge if live else self._counter).write(off, value)
+
+    def _load_archive(self) -> Dict[str, float]:
+        try:
+            with open(os.path.join(self.dir, _ARCHIVE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _archive_pid(self, pid: int) -> None:
+        """Fold a finished process's counters into the archive and drop its files (caller holds the flock)."""
+        counter = self._path("counter", pid)
+        if os.path.exists(counter):
+            archive = self._load_archive()
+            for key, value in _read_file(counter):
+                archive[key] = archive.get(key, 0.0) + value
+            tmp = os.path.join(self.dir, f".{_ARCHIVE}.{os.getpid()}")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(archive, f)
+            os.replace(tmp, os.path.join(self.dir, _ARCHIVE))
+            os.unlink(counter)
+        try:
+            os.unlink(self._path("gauge", pid))
+        except FileNotFoundError:
+            pass
+
+    def collect(self) -> Merged:
+        merged: Merged = {}
+
+        def add(key: str, value: float) -> None:
+            family, part, labels = json.loads(key)
+            parts = merged.setdefault(family, {}).setdefault(tuple(labels), {})
+            parts[part] = parts.get(part, 0.0) + value
+
+        with self._flock():
+            names = os.listdir(self.dir)
+            for name in names:
+                for prefix in ("counter_", "gauge_"):
+                    pid = _file_pid(name, prefix)
+                    if pid is not None and pid != self.pid and not _pid_alive(pid):
+                        self._archive_pid(pid)
+            for key, value in self._load_archive().items():
+                add(key, value)
+            for name in os.listdir(self.dir):
+                if _file_pid(name, "counter_") is not None or _file_pid(name, "gauge_") is not None:
+                    for key, value in _read_file(os.path.join(self.dir, name)):
+                        add(key, value)
+        return merged
+
+    def close(self) -> None:
+        """Process exit: hand our counters to the archive now instead of at the next scrape."""
+        self._counter.close()
+        self._gauge.close()
+        with self._flock():
+            self._archive_pid(self.pid)
+
+
+_store: Optional[MultiProcessStore] = None
+_store_checked = False
+_store_lock = threading.Lock()
+_fork_hooks: List[Callable[[], None]] = []
+_refresh_hooks: List[Callable[[], None]] = []
+
+
+def enabled() -> bool:
+    """Multiprocess mode configured (does not open any file)."""
+    return bool(cfg.metrics_multiproc_dir)
+
+
+def store() -> Optional[MultiProcessStore]:
+    """This process's store, or None when METRICS_MULTIPROC_DIR is unset (single-process mode).
+
+    Created on first use (first observation, a scrape, or the server's startup hook), never at import:
+    a process that only imports the app (CLI, benchmarks, a preloading master) leaves no files behind.
+    """
+    global _store, _store_checked
+    if not _store_checked:
+        with _store_lock:
+            if not _store_checked:
+                if cfg.metrics_multiproc_dir:
+                    _store = MultiProcessStore(cfg.metrics_multiproc_dir)
+                    _start_refresher()
+                _store_checked = True
+    return _store
+
+
+def write(off: int, value: float, *, live: bool = False) -> None:
+    s = _store
+    if s is not None:
+        s.write(off, value, live=live)
+
+
+def on_fork(fn: Callable[[], None]) -> None:
+    """Run in a forked child after it got its own store (rebuild series against the new files)."""
+    _fork_hooks.append(fn)
+
+
+def on_refresh(fn: Callable[[], None]) -> None:
+    """Run every few seconds in each worker (publish callback gauges for other workers' scrapes)."""
+    _refresh_hooks.append(fn)
+
+
+def _refresh_loop() -> None:
+    while True:
+        time.sleep(_REFRESH_SEC)
+        for fn in list(_refresh_hooks):
+            try:
+                fn()
+            except Exception:
+                pass
+
+
+def _start_refresher() -> None:
+    threading.Thread(target=_refresh_loop, name="metrics-mp-refresh", daemon=True).start()
+
+
+def _after_fork_in_child() -> None:
+    global _store, _store_lock
+    if _store is None:
+        return
+    _store_lock = threading.Lock()
+    _store = MultiProcessStore(_store.dir)  # parent's maps are left alone: it still owns those files
+    _start_refresher()
+    for fn in list(_fork_hooks):
+        fn()
+
+
+def _at_exit() -> None:
+    s = _store
+    if s is not None and s.pid == os.getpid():
+        try:
+            s.close()
+        except Exception:
+            pass
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+atexit.register(_at_exit)
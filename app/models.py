@@ -50,3 +50,13 @@ class Token(Base):
     scopes: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class CacheEvent(Base):
+    """Change sequence for cross-worker cache invalidation (app.invalidation)."""
+    __tablename__ = "cache_events"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    topic: Mapped[str] = mapped_column(String(40))
+    key: Mapped[Optional[str]] = mapped_column(String(200), nullable=True)
+    origin: Mapped[Optional[str]] = mapped_column(String(80), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
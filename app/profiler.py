@@ -0,0 +1,104 @@
+ # profiler.py (on-demand sampling profiler for GET /admin/profile)
+ # - Polls sys._current_frames() from a helper thread: every thread (event loop, executor
+ #   workers, background pollers) is sampled without instrumenting any code
+ # - Output: collapsed stacks ("thread;outer;...;inner count", flamegraph.pl / speedscope import)
+ #   or speedscope JSON (one sampled profile per thread)
+ # - Nothing runs unless a profile is requested; one profile at a time
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+_busy = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _frame_label(code) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample(seconds: float, interval: float = 0.01) -> Tuple[Counter, int]:
+    """Sample all threads for `seconds`; returns (Counter of (thread, frames root→leaf), sample rounds)."""
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    try:
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        labels: Dict[Any, str] = {}  # code object → label (codes are stable; format each once)
+        rounds = 0
+        deadline = time.perf_counter() + seconds
+        while True:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                frames: List[str] = []
+                f = frame
+                while f is not None:
+                    code = f.f_code
+                    lbl = labels.get(code)
+                    if lbl is None:
+                        lbl = labels[code] = _frame_label(code)
+                    frames.append(lbl)
+                    f = f.f_back
+                frames.reverse()
+                stacks[(names.get(ident, f"thread-{ident}"), tuple(frames))] += 1
+            rounds += 1
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            time.sleep(min(interval, deadline - now))
+        return stacks, rounds
+    finally:
+        _busy.release()
+
+
+def to_collapsed(stacks: Counter) -> str:
+    lines = [";".join((thread.replace(";", "_"),) + frames) + f" {n}" for (thread, frames), n in stacks.most_common()]
+    return "\n".join(lines) + "\n"
+
+
+def to_speedscope(stacks: Counter, interval: float, name: str = "mcp-server") -> Dict[str, Any]:
+    frame_index: Dict[str, int] = {}
+    frames: List[Dict[str, Any]] = []
+    per_thread: Dict[str, Tuple[List[List[int]], List[float]]] = {}
+    for (thread, stack), n in stacks.items():
+        ids = []
+        for lbl in stack:
+            i = frame_index.get(lbl)
+            if i is None:
+                i = frame_index[lbl] = len(frames)
+                fn, _, loc = lbl.partition(" (")
+                file, _, line = loc.rstrip(")").rpartition(":")
+                frames.append({"name": fn, "file": file, "line": int(line) if line.isdigit() else None})
+            ids.append(i)
+        samples, weights = per_thread.setdefault(thread, ([], []))
+        samples.append(ids)
+        weights.append(n * interval * 1000)
+    profiles = [
+        {
+            "type": "sampled",
+            "name": thread,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }
+        for thread, (samples, weights) in sorted(per_thread.items())
+    ]
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "activeProfileIndex": 0,
+        "exporter": "mcp-ms-todo-server",
+        "shared": {"frames": frames},
+        "profiles": profiles,
+    }
@@ -1,8 +1,58 @@
 import json
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, FrozenSet, List, Optional, Tuple
 
+from app import invalidation
 from app.db import get_engine, get_session
-from app.models import Role
+
+
+def _models():
+    # Role model, imported lazily like the engine itself (see app.db)
+    from app import models
+    return models
+
+
+# In-memory role cache (role -> frozenset of tools). Invalidated on role writes in any worker (topic "rbac").
+_roles_cache: Optional[Dict[str, FrozenSet[str]]] = None
+# Effective allowed-tool set per (role, key allowed_tools); None means "all tools".
+_effective_cache: Dict[Tuple[str, Tuple[str, ...]], Optional[FrozenSet[str]]] = {}
+_cache_gen = 0
+_cache_lock = threading.Lock()
+
+
+def invalidate_cache() -> None:
+    """Drop cached roles and derived per-principal tool sets."""
+    global _roles_cache, _cache_gen
+    with _cache_lock:
+        _roles_cache = None
+        _effective_cache.clear()
+        _cache_gen += 1
+
+
+invalidation.subscribe("rbac", lambda _name: invalidate_cache(), key="rbac.cache")
+
+
+def roles_cached() -> bool:
+    """True when role lookups are served from memory (the next permission check reads no DB)."""
+    return _roles_cache is not None
+
+
+def cache_stats() -> Dict[str, int]:
+    return {"roles": len(_roles_cache or {}), "effective_sets": len(_effective_cache)}
+
+
+def _cached_roles() -> Dict[str, FrozenSet[str]]:
+    global _roles_cache
+    roles = _roles_cache
+    if roles is not None:
+        return roles
+    gen = _cache_gen
+    loaded = {name: frozenset(tools) for name, tools in _load_roles().items()}
+    with _cache_lock:
+        # Don't publish a snapshot that raced with an invalidation
+        if _roles_cache is None and gen == _cache_gen:
+            _roles_cache = loaded
+    return loaded
 
 
 def _load_roles() -> Dict[str, List[str]]:
@@ -10,7 +60,7 @@ def _load_roles() -> Dict[str, List[str]]:
         raise RuntimeError("DB_URL must be configured for RBAC roles store")
     out: Dict[str, List[str]] = {}
     with get_session() as s:
-        for r in s.query(Role).all():
+        for r in s.query(_models().Role).all():
             tools = list((r.tools or {}).get("items", [])) if isinstance(r.tools, dict) else []
             out[r.name] = tools
     return out
@@ -20,16 +70,17 @@ def _save_roles(roles: Dict[str, List[str]]):
     if not get_engine():
         raise RuntimeError("DB_URL must be configured for RBAC roles store")
     with get_session() as s:
-        existing = {r.name: r for r in s.query(Role).all()}
+        existing = {r.name: r for r in s.query(_models().Role).all()}
         for name, tools in roles.items():
             rec = existing.pop(name, None)
             payload = {"items": tools}
             if rec:
                 rec.tools = payload
             else:
-                s.add(Role(name=name, tools=payload))
+                s.add(_models().Role(name=name, tools=payload))
         for rec in existing.values():
             s.delete(rec)
+    invalidation.publish("rbac")
 
 
 def list_roles() -> Dict[str, List[str]]:
@@ -44,12 +95,13 @@ def upsert_role(name: str, tools: List[str]) -> Dict[str, List[str]]:
     if not get_engine():
         raise RuntimeError("DB_URL must be configured for RBAC roles store")
     with get_session() as s:
-        rec = s.get(Role, name)
+        rec = s.get(_models().Role, name)
         payload = {"items": tools}
         if rec:
             rec.tools = payload
         else:
-            s.add(Role(name=name, tools=payload))
+            s.add(_models().Role(name=name, tools=payload))
+    invalidation.publish("rbac", name)
     return _load_roles()
 
 
@@ -57,11 +109,12 @@ def delete_role(name: str) -> bool:
     if not get_engine():
         raise RuntimeError("DB_URL must be configured for RBAC roles store")
     with get_session() as s:
-        rec = s.get(Role, name)
+        rec = s.get(_models().Role, name)
         if not rec:
             return False
         s.delete(rec)
-        return True
+    invalidation.publish("rbac", name)
+    return True
 
 
 def resolve_allowed_tools_for_role(role: str) -> Optional[List[str]]:
@@ -70,5 +123,44 @@ def resolve_allowed_tools_for_role(role: str) -> Optional[List[str]]:
     if role == "default":
         # default = 모든 툴 허용 → None 반환하여 필터 미적용 신호
         return None
-    roles = _load_roles()
-    return roles.get(role)
+    tools = _cached_roles().get(role)
+    return sorted(tools) if tools is not None else None
+
+
+def effective_allowed_tools(role: Optional[str], allowed_tools: Optional[List[str]]) -> Optional[FrozenSet[str]]:
+    """Effective tool set for a principal (None = all tools).
+
+    Role tools take precedence; the key's own allowed_tools apply only when the
+    role is unset, "default", or unknown/empty. Memoized per (role, allowed_tools).
+    """
+    role = (role or "").strip()
+    key_tools = tuple(allowed_tools) if isinstance(allowed_tools, list) else ()
+    cache_key = (role, key_tools)
+    try:
+        return _effective_cache[cache_key]
+    except KeyError:
+        pass
+    gen = _cache_gen
+    names: Optional[FrozenSet[str]] = None
+    if role and role != "default":
+        role_tools = _cached_roles().get(role)
+        if role_tools:
+            names = role_tools
+    if names is None and key_tools:
+        names = frozenset(key_tools)
+    with _cache_lock:
+        if gen == _cache_gen:
+            _effective_cache[cache_key] = names
+    return names
+
+
+def effective_call_tools(role: Optional[str], allowed_tools: Optional[List[str]]) -> Optional[FrozenSet[str]]:
+    """tools/call permission set: effective_allowed_tools, but deny-by-default.
+
+    A generated key with no role grant and an empty allowed_tools may call no tool
+    (tools/list still shows it every tool); only the "default" role grants all.
+    """
+    names = effective_allowed_tools(role, allowed_tools)
+    if names is None and (role or "").strip() != "default":
+        return frozenset()
+    return names
@@ -0,0 +1,311 @@
+ # registry.py (tool registry)
+ # - Loads tool schemas from TOOL_SCHEMA_DIR or a precompiled bundle
+ # - ToolRegistry: immutable snapshot (definitions, executors, validators, pre-serialized catalogues)
+ #   Snapshots are swapped atomically on reload (see app.tools.reload_registry)
+ # - Build step: python -m app.registry build  → one JSON bundle with schema-checked
+ #   definitions and the full manifest bytes/ETag, so startup skips glob/parse/check
+
+import os
+import sys
+import json
+import glob
+import hashlib
+import importlib
+import logging
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Any, Callable, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from app.config import cfg
+
+logger = logging.getLogger("mcp.registry")
+
+BUNDLE_FORMAT = 1
+
+
+def default_bundle_path() -> str:
+    return os.getenv("TOOL_REGISTRY_BUNDLE") or os.path.join(os.path.dirname(__file__), "registry.bundle.json")
+
+
+# 외부 JSON 스키마 로딩 (파일명 순서 고정 → 복제본 간 ETag 일치)
+def load_tool_defs(schema_dir: str) -> List[Dict[str, Any]]:
+    tool_defs = []
+    for path in sorted(glob.glob(os.path.join(schema_dir, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+            tool_defs.append(data)
+    return tool_defs
+
+
+def source_fingerprint(schema_dir: str) -> str:
+    """Cheap staleness key for a schema dir (names/sizes/mtimes; no file reads)."""
+    entries = []
+    try:
+        with os.scandir(schema_dir) as it:
+            for e in it:
+                if e.name.endswith(".json") and e.is_file():
+                    st = e.stat()
+                    entries.append(f"{e.name}:{st.st_size}:{st.st_mtime_ns}")
+    except FileNotFoundError:
+        pass
+    return hashlib.sha256("\n".join(sorted(entries)).encode("utf-8")).hexdigest()
+
+
+# -----------------------------
+# Validation (jsonschema is imported on first use)
+# -----------------------------
+# ISO 8601 date-time as accepted by Graph dateTimeTimeZone (offset optional; tz passed separately)
+_DATE_TIME_RE = re.compile(
+    r"^(\d{4})-(\d{2})-(\d{2})[Tt](\d{2}):(\d{2})(?::(\d{2})(?:\.\d+)?)?(?:[Zz]|[+-](\d{2}):(\d{2}))?$"
+)
+_format_checker = None
+
+
+def _is_date_time(instance: Any) -> bool:
+    if not isinstance(instance, str):
+        return True
+    m = _DATE_TIME_RE.match(instance)
+    if not m:
+        return False
+    y, mo, d, h, mi, sec, oh, om = m.groups()
+    try:
+        datetime(int(y), int(mo), int(d), int(h), int(mi), int(sec or 0))
+    except ValueError:
+        return False
+    return oh is None or (int(oh) <= 23 and int(om) <= 59)
+
+
+def _get_format_checker():
+    global _format_checker
+    if _format_checker is None:
+        from jsonschema import FormatChecker
+        fc = FormatChecker()
+        fc.checks("date-time")(_is_date_time)
+        _format_checker = fc
+    return _format_checker
+
+
+def compile_validator(schema: Dict[str, Any], *, checked: bool = False):
+    """Build a reusable validator (with format checks). Skips the meta-schema check if `checked`."""
+    from jsonschema.validators import validator_for
+    cls = validator_for(schema)
+    if not checked:
+        cls.check_schema(schema)
+    return cls(schema, format_checker=_get_format_checker())
+
+
+def first_error(validator, params: Dict[str, Any]) -> Optional[str]:
+    from jsonschema.exceptions import best_match
+    err = best_match(validator.iter_errors(params))
+    return str(err) if err is not None else None
+
+
+# -----------------------------
+# Catalogue (tools/list, manifest)
+# -----------------------------
+class ToolCatalog(NamedTuple):
+    """Pre-built tools/list payload for one effective tool set (shared; do not mutate)."""
+    tools: List[Dict[str, Any]]
+    body: bytes  # serialized {"tools": [...]}
+    etag: str  # strong ETag over body
+
+
+def _public_tool(t: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": t["name"],
+        "description": t.get("description", ""),
+        "inputSchema": t.get("inputSchema", {}),
+    }
+
+
+def _dump_json(obj: Any) -> bytes:
+    # Same encoding as fastapi JSONResponse
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _etag(body: bytes) -> str:
+    return '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+
+_CATALOG_MAX = 256
+
+Executor = Callable[[Dict[str, Any]], Any]
+
+
+# x-exec module → (mtime_ns, size) of its source when it was last (re)loaded
+_exec_module_stamps: Dict[str, Tuple[int, int]] = {}
+_exec_module_lock = threading.Lock()
+
+
+def _module_stamp(mod: Any) -> Optional[Tuple[int, int]]:
+    path = getattr(mod, "__file__", None)
+    try:
+        st = os.stat(path) if path else None
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size) if st else None
+
+
+def _import_executor(ref: str, *, reload: bool = False) -> Executor:
+    """Resolve an "x-exec": "package.module:function" reference from a tool schema.
+
+    With reload=True the module is re-executed only if its own source file changed since it
+    was loaded (schema edits alone never re-run a module's import side effects).
+    """
+    mod_name, _, attr = ref.partition(":")
+    if not mod_name or not attr:
+        raise ValueError(f"invalid x-exec reference: {ref!r} (expected 'module:function')")
+    mod = importlib.import_module(mod_name)
+    with _exec_module_lock:
+        stamp = _module_stamp(mod)
+        seen = _exec_module_stamps.setdefault(mod_name, stamp)
+        if reload and stamp is not None and stamp != seen:
+            mod = importlib.reload(mod)
+            _exec_module_stamps[mod_name] = stamp
+    fn = getattr(mod, attr)
+    if not callable(fn):
+        raise ValueError(f"x-exec target is not callable: {ref!r}")
+    return fn
+
+
+class ToolRegistry:
+    """Immutable snapshot of tool definitions with lazily compiled validators
+    and per-permission-set catalogues."""
+
+    def __init__(
+        self,
+        tools: List[Dict[str, Any]],
+        *,
+        checked: bool = False,
+        source: str = "schemas",
+        manifest: Optional[Tuple[bytes, str]] = None,
+        fingerprint: str = "",
+        executors: Optional[Dict[str, Executor]] = None,
+        reload_modules: bool = False,
+    ):
+        for t in tools:
+            t.setdefault("inputSchema", {})
+        self.tools = tools
+        self.by_name: Dict[str, Dict[str, Any]] = {t["name"]: t for t in tools}
+        self.source = source
+        self.fingerprint = fingerprint
+        # Executors: built-in map by name, or "x-exec": "module:function" in the schema file
+        self.executors: Dict[str, Executor] = {}
+        for t in tools:
+            ref = t.get("x-exec")
+            if ref:
+                self.executors[t["name"]] = _import_executor(ref, reload=reload_modules)
+            elif executors and t["name"] in executors:
+                self.executors[t["name"]] = executors[t["name"]]
+        self._checked = checked
+        self._public = [_public_tool(t) for t in tools]
+        self._validators: Dict[str, Any] = {}
+        self._catalogs: Dict[Optional[FrozenSet[str]], ToolCatalog] = {}
+        self._lock = threading.Lock()
+        if manifest is not None:
+            body, etag = manifest
+            self._catalogs[None] = ToolCatalog(tools=self._public, body=body, etag=etag)
+        if not checked:
+            # Unchecked schemas: compile (and meta-check) everything now so bad files fail fast
+            for t in tools:
+                self.validator(t["name"])
+
+    def validator(self, name: str):
+        v = self._validators.get(name)
+        if v is None:
+            v = compile_validator(self.by_name[name]["inputSchema"], checked=self._checked)
+            self._validators[name] = v
+        return v
+
+    def stats(self) -> Dict[str, int]:
+        return {"tools": len(self.tools), "validators": len(self._validators), "catalogs": len(self._catalogs)}
+
+    def catalog_for(self, allowed: Optional[FrozenSet[str]]) -> ToolCatalog:
+        """Return the cached catalogue (dicts + serialized bytes + ETag) for an effective tool set."""
+        cat = self._catalogs.get(allowed)
+        if cat is not None:
+            return cat
+        tools = self._public if allowed is None else [t for t in self._public if t["name"] in allowed]
+        body = _dump_json({"tools": tools})
+        cat = ToolCatalog(tools=tools, body=body, etag=_etag(body))
+        with self._lock:
+            if len(self._catalogs) >= _CATALOG_MAX:
+                self._catalogs.clear()
+            self._catalogs[allowed] = cat
+        return cat
+
+
+# -----------------------------
+# Bundle build/load
+# -----------------------------
+def build_bundle(schema_dir: str, out_path: str) -> Dict[str, Any]:
+    """Parse and schema-check every tool file, then write one bundle artifact."""
+    tools = load_tool_defs(schema_dir)
+    for t in tools:
+        t.setdefault("inputSchema", {})
+        compile_validator(t["inputSchema"])  # meta-schema check at build time
+    body = _dump_json({"tools": [_public_tool(t) for t in tools]})
+    bundle = {
+        "format": BUNDLE_FORMAT,
+        "fingerprint": source_fingerprint(schema_dir),
+        "tools": tools,
+        "manifest": body.decode("utf-8"),
+        "etag": _etag(body),
+    }
+    tmp = out_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(bundle, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, out_path)
+    return bundle
+
+
+def _load_bundle(schema_dir: str, path: str, **kwargs: Any) -> Optional[ToolRegistry]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            bundle = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("ignoring unreadable tool bundle %s: %s", path, e)
+        return None
+    fp = source_fingerprint(schema_dir)
+    if bundle.get("format") != BUNDLE_FORMAT or bundle.get("fingerprint") != fp:
+        logger.info("tool bundle %s is stale; loading schemas from %s", path, schema_dir)
+        return None
+    manifest = (bundle["manifest"].encode("utf-8"), bundle["etag"])
+    return ToolRegistry(bundle["tools"], checked=True, source="bundle", manifest=manifest, fingerprint=fp, **kwargs)
+
+
+def load_registry(
+    schema_dir: Optional[str] = None,
+    *,
+    bundle_path: Optional[str] = None,
+    executors: Optional[Dict[str, Executor]] = None,
+    reload_modules: bool = False,
+) -> ToolRegistry:
+    """Prefer a fresh precompiled bundle; fall back to parsing the schema dir."""
+    schema_dir = schema_dir or cfg.tool_schema_dir
+    kwargs = {"executors": executors, "reload_modules": reload_modules}
+    reg = _load_bundle(schema_dir, bundle_path or default_bundle_path(), **kwargs)
+    if reg is not None:
+        return reg
+    fp = source_fingerprint(schema_dir)  # taken before parsing so concurrent edits trigger another reload
+    return ToolRegistry(load_tool_defs(schema_dir), fingerprint=fp, **kwargs)
+
+
+def main(argv: List[str]) -> int:
+    import argparse
+    p = argparse.ArgumentParser(prog="python -m app.registry", description="Tool registry bundle")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="Compile tool schemas into one registry bundle")
+    b.add_argument("--schema-dir", default=cfg.tool_schema_dir)
+    b.add_argument("--out", default=default_bundle_path())
+    args = p.parse_args(argv)
+    bundle = build_bundle(args.schema_dir, args.out)
+    print(f"wrote {args.out}: {len(bundle['tools'])} tools, etag {bundle['etag']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,90 @@
+ # sessions.py (MCP Streamable HTTP sessions)
+ # - Mcp-Session-Id issued at initialize; later requests carrying it skip key resolution
+ # - Per session: principal (API key meta), resolved TodoService, SSE channel name
+ # - Sessions are bound to the credential that created them (hashed), never usable with another key
+ # - Idle eviction (LRU order, amortized sweep) and a hard cap; event-loop thread only
+
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+class McpSession:
+    __slots__ = ("id", "principal", "meta", "service", "created", "last_seen")
+
+    def __init__(self, sid: str, principal: str, meta: Optional[Dict[str, Any]], service: Any):
+        self.id = sid
+        self.principal = principal  # hashed credential (same value as the per-key SSE channel)
+        self.meta = meta
+        self.service = service
+        self.created = self.last_seen = time.monotonic()
+
+    @property
+    def channel(self) -> str:
+        return "sess:" + self.id
+
+
+class SessionStore:
+    def __init__(self, *, ttl_sec: float, max_sessions: int, on_close: Optional[Callable[[McpSession], None]] = None):
+        self.ttl_sec = ttl_sec
+        self.max_sessions = max_sessions
+        self.on_close = on_close
+        self._sessions: "OrderedDict[str, McpSession]" = OrderedDict()  # least recently used first
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self, principal: str, meta: Optional[Dict[str, Any]], service: Any) -> McpSession:
+        self._evict_idle()
+        while len(self._sessions) >= self.max_sessions:
+            self._close(next(iter(self._sessions)))
+        sess = McpSession(secrets.token_urlsafe(24), principal, meta, service)
+        self._sessions[sess.id] = sess
+        return sess
+
+    def get(self, sid: str, principal: str) -> Optional[McpSession]:
+        """Live session for `sid` if it belongs to `principal` (refreshes its idle timer)."""
+        sess = self._sessions.get(sid)
+        if sess is None:
+            return None
+        now = time.monotonic()
+        if now - sess.last_seen > self.ttl_sec:
+            self._close(sid)
+            return None
+        if not secrets.compare_digest(sess.principal, principal):
+            return None
+        sess.last_seen = now
+        self._sessions.move_to_end(sid)
+        return sess
+
+    def delete(self, sid: str) -> bool:
+        if sid not in self._sessions:
+            return False
+        self._close(sid)
+        return True
+
+    def drop_principal(self, principal: str) -> int:
+        """Close every session of one credential (key deleted/updated)."""
+        sids: List[str] = [s.id for s in self._sessions.values() if s.principal == principal]
+        for sid in sids:
+            self._close(sid)
+        return len(sids)
+
+    def clear(self) -> None:
+        for sid in list(self._sessions):
+            self._close(sid)
+
+    def _evict_idle(self) -> None:
+        # LRU order: stop at the first session that is still fresh
+        cutoff = time.monotonic() - self.ttl_sec
+        while self._sessions:
+            sess = next(iter(self._sessions.values()))
+            if sess.last_seen > cutoff:
+                break
+            self._close(sess.id)
+
+    def _close(self, sid: str) -> None:
+        sess = self._sessions.pop(sid, None)
+        if sess is not None and self.on_close is not None:
+            self.on_close(sess)
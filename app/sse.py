@@ -0,0 +1,130 @@
+ # sse.py (SSE channels for GET /mcp)
+ # - One channel per subscriber identity (API key now; session later), never shared across tenants
+ # - Bounded ring buffer per channel with drop-oldest backpressure (publishers never block/fail)
+ # - Event ids "<epoch>-<seq>" so reconnects resume from Last-Event-ID
+ # - Event-loop thread only (use loop.call_soon_threadsafe from worker threads)
+
+import asyncio
+import itertools
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+
+class SseChannel:
+    """Per-identity event channel with a bounded replay buffer."""
+
+    def __init__(self, key: str, maxlen: int):
+        self.key = key
+        self.epoch = uuid.uuid4().hex[:8]  # distinguishes ids across channel restarts
+        self._seq = itertools.count(1)
+        self._buf: Deque[Tuple[int, str]] = deque(maxlen=maxlen)
+        self._wakeups: Set[asyncio.Event] = set()
+        self.dropped = 0
+        self.last_active = time.monotonic()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._wakeups)
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def publish(self, data: str) -> str:
+        seq = next(self._seq)
+        if len(self._buf) == self._buf.maxlen:
+            self.dropped += 1  # drop-oldest: slow/offline subscribers lose the oldest frames
+        self._buf.append((seq, data))
+        self.last_active = time.monotonic()
+        for ev in self._wakeups:
+            ev.set()
+        return self.event_id(seq)
+
+    def resume_seq(self, last_event_id: Optional[str]) -> int:
+        """Sequence to resume after. New subscribers start at the head (no replay);
+        ids from another epoch (channel was recreated) replay the whole buffer."""
+        if last_event_id is None:
+            return self._buf[-1][0] if self._buf else 0
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return 0
+        return int(seq)
+
+    def since(self, seq: int) -> List[Tuple[int, str]]:
+        if not self._buf or self._buf[-1][0] <= seq:
+            return []
+        return [item for item in self._buf if item[0] > seq]
+
+    def subscribe(self) -> asyncio.Event:
+        ev = asyncio.Event()
+        self._wakeups.add(ev)
+        self.last_active = time.monotonic()
+        return ev
+
+    def unsubscribe(self, ev: asyncio.Event) -> None:
+        self._wakeups.discard(ev)
+        self.last_active = time.monotonic()
+
+
+class SseHub:
+    """Channel registry. Idle channels (no subscribers for `ttl_sec`) are evicted lazily."""
+
+    def __init__(self, *, buffer_size: int, ttl_sec: float, max_channels: int):
+        self.buffer_size = buffer_size
+        self.ttl_sec = ttl_sec
+        self.max_channels = max_channels
+        self._channels: Dict[str, SseChannel] = {}
+        self._last_sweep = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    @property
+    def connections(self) -> int:
+        return sum(ch.subscribers for ch in self._channels.values())
+
+    @property
+    def buffered(self) -> int:
+        return sum(len(ch._buf) for ch in self._channels.values())
+
+    def get(self, key: str) -> Optional[SseChannel]:
+        return self._channels.get(key)
+
+    def channel(self, key: str) -> SseChannel:
+        ch = self._channels.get(key)
+        if ch is None:
+            self._sweep(force=len(self._channels) >= self.max_channels)
+            if len(self._channels) >= self.max_channels:
+                raise OverflowError("too many SSE channels")
+            ch = self._channels[key] = SseChannel(key, self.buffer_size)
+        return ch
+
+    def publish(self, key: Optional[str], data: str) -> None:
+        """Publish to one identity's channel; no-op if nobody has ever subscribed."""
+        if key is None:
+            return
+        ch = self._channels.get(key)
+        if ch is not None:
+            ch.publish(data)
+        self._sweep()
+
+    def broadcast(self, data: str) -> None:
+        """Server-wide notifications (e.g. tools/list_changed) go to every channel."""
+        for ch in list(self._channels.values()):
+            ch.publish(data)
+
+    def drop(self, key: str) -> None:
+        ch = self._channels.pop(key, None)
+        if ch is not None:
+            for ev in list(ch._wakeups):
+                ev.set()
+
+    def _sweep(self, *, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_sweep < min(self.ttl_sec, 30.0):
+            return
+        self._last_sweep = now
+        for key, ch in list(self._channels.items()):
+            if ch.subscribers == 0 and now - ch.last_active > self.ttl_sec:
+                del self._channels[key]
@@ -1,12 +1,21 @@
-from typing import Dict, Any, Optional
+from typing import TYPE_CHECKING, Dict, Any, Optional
+from app import invalidation
 from app.db import get_session
-from app.models import Token
+
+if TYPE_CHECKING:
+    from app.models import Token
+
+
+def _models():
+    """app.models, imported on first DB use (keeps SQLAlchemy off the import path)."""
+    from app import models
+    return models
 
 
 def list_tokens() -> Dict[str, Any]:
     out: Dict[str, Any] = {}
     with get_session() as s:
-        for t in s.query(Token).all():
+        for t in s.query(_models().Token).all():
             out[str(t.id)] = {
                 "profile": t.profile or "",
                 "tenant_id": t.tenant_id or "",
@@ -27,11 +36,11 @@ def upsert_token(*, profile: Optional[str], token_data: Dict[str, Any], tenant_i
     token_type = token_data.get("token_type")
     scope = token_data.get("scope")
     with get_session() as s:
-        rec: Optional[Token] = None
+        rec: Optional["Token"] = None
         if profile:
-            rec = s.query(Token).filter(Token.profile == profile).first()
+            rec = s.query(_models().Token).filter_by(profile=profile).first()
         if not rec:
-            rec = Token(profile=profile)
+            rec = _models().Token(profile=profile)
             s.add(rec)
         rec.access_token = access_token
         rec.refresh_token = refresh_token
@@ -50,15 +59,17 @@ def upsert_token(*, profile: Optional[str], token_data: Dict[str, Any], tenant_i
         if scopes is not None:
             rec.scopes = scopes
         s.flush()
-        return {
+        res = {
             "id": rec.id,
             "profile": rec.profile,
         }
+    invalidation.publish("token", profile or f"id:{res['id']}")
+    return res
 
 
 def get_token_by_profile(profile: str) -> Optional[Dict[str, Any]]:
     with get_session() as s:
-        t = s.query(Token).filter(Token.profile == profile).first()
+        t = s.query(_models().Token).filter_by(profile=profile).first()
         if not t:
             return None
         return {
@@ -2,22 +2,40 @@
  # tools.py (2025 MCP structure)
  # - MCP tool meta/executor definition
  # - ToolDef: name, description, inputSchema, exec
- # - validate_params_by_schema: tool parameter validation
- # - _list_tools: returns tool list
+ # - validate_params_by_schema: tool parameter validation (validators compiled once, see app.registry)
+ # - _list_tools / catalog_for: returns tool list (pre-serialized per effective tool set)
  # - _call_tool: executes tool and returns result
+ # - reload_registry / start_schema_watcher: hot reload of schemas, executors and validators
 
 
-import os
 import json
-from typing import Dict, Any, Callable, Optional, List, Tuple
+import inspect
+import logging
+import threading
+import time
+from typing import Dict, Any, Callable, FrozenSet, Optional, List, Tuple
 from app.container import get_todo_service_for
 from app.config import cfg
-from app.context import get_current_user_meta
+from app.context import get_current_service, get_current_user_meta, report_progress, timed
+from app.tracing import span
 from app import rbac
-import glob
-from jsonschema import validate, ValidationError
+from app.registry import (  # noqa: F401
+    ToolCatalog,
+    ToolRegistry,
+    compile_validator,
+    first_error,
+    load_registry,
+    load_tool_defs,
+    source_fingerprint,
+)
+
+logger = logging.getLogger("mcp.tools")
+
 
 def _service():
+    svc = get_current_service()
+    if svc is not None:
+        return svc  # cached on the MCP session
     meta = get_current_user_meta() or {}
     # DB 기반: token_id 또는 token_profile (프로필명)만 지원
     token_id = meta.get("token_id") if isinstance(meta.get("token_id"), int) else None
@@ -60,67 +78,139 @@ TOOL_EXEC_MAP: Dict[str, Callable[[Dict[str, Any]], Any]] = {
     "todo.sync.walk_delta_tasks": lambda p: _service().walk_delta_tasks(p["list_id"], delta_link=p.get("delta_link")),
 }
 
-# 외부 JSON 스키마 로딩
-def load_tool_defs(schema_dir: str) -> List[Dict[str, Any]]:
-    tool_defs = []
-    for path in glob.glob(os.path.join(schema_dir, "*.json")):
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            tool_defs.append(data)
-    return tool_defs
+# 툴 레지스트리 (번들 우선, 없으면 스키마 디렉터리 파싱)
+# Readers take one reference to REGISTRY per call; reload swaps the whole snapshot atomically.
+REGISTRY: ToolRegistry = load_registry(cfg.tool_schema_dir, executors=TOOL_EXEC_MAP)
+TOOLS: List[Dict[str, Any]] = REGISTRY.tools
+TOOLS_BY_NAME: Dict[str, Dict[str, Any]] = REGISTRY.by_name
+
+_reload_lock = threading.Lock()
+_reload_listeners: List[Callable[[ToolRegistry], None]] = []
+
+
+def add_reload_listener(fn: Callable[[ToolRegistry], None]) -> Callable[[], None]:
+    """Register a callback invoked (from the reloading thread) after a registry swap.
+
+    Returns a function that removes it again (call it when the owner, e.g. an event loop, goes away).
+    """
+    _reload_listeners.append(fn)
+
+    def remove() -> None:
+        try:
+            _reload_listeners.remove(fn)
+        except ValueError:
+            pass
+
+    return remove
+
+
+def reload_registry(*, force: bool = False) -> Tuple[bool, ToolRegistry]:
+    """Rebuild the registry from TOOL_SCHEMA_DIR and swap it in if the schemas changed.
+
+    In-flight calls keep using the snapshot they started with. Raises (and keeps the
+    current registry) if a schema or x-exec reference is invalid.
+    """
+    global REGISTRY, TOOLS, TOOLS_BY_NAME
+    with _reload_lock:
+        current = REGISTRY
+        if not force and source_fingerprint(cfg.tool_schema_dir) == current.fingerprint:
+            return False, current
+        new = load_registry(cfg.tool_schema_dir, executors=TOOL_EXEC_MAP, reload_modules=True)
+        REGISTRY, TOOLS, TOOLS_BY_NAME = new, new.tools, new.by_name
+    logger.info(json.dumps({"event": "registry.reload", "tools": len(new.tools), "source": new.source}))
+    for fn in list(_reload_listeners):
+        try:
+            fn(new)
+        except Exception:
+            logger.exception("registry reload listener failed")
+    return True, new
+
+
+_watcher: Optional[threading.Thread] = None
+
+
+def start_schema_watcher(interval_sec: float) -> threading.Thread:
+    """Poll TOOL_SCHEMA_DIR (names/sizes/mtimes) and hot-reload on change (one watcher per process)."""
+    global _watcher
+    if _watcher is not None and _watcher.is_alive():
+        return _watcher
+
+    def _loop() -> None:
+        while True:
+            time.sleep(interval_sec)
+            try:
+                reload_registry()
+            except Exception:
+                logger.exception("tool schema reload failed; keeping current registry")
+
+    _watcher = threading.Thread(target=_loop, name="tool-schema-watcher", daemon=True)
+    _watcher.start()
+    return _watcher
+
+# Compiled validators for ad-hoc schemas, keyed by schema identity
+_SCHEMA_VALIDATORS: Dict[int, Tuple[Dict[str, Any], Any]] = {}
 
-TOOLS: List[Dict[str, Any]] = load_tool_defs(cfg.tool_schema_dir)
-TOOLS_BY_NAME: Dict[str, Dict[str, Any]] = {t["name"]: t for t in TOOLS}
 
 def validate_params_by_schema(params: Dict[str, Any], schema: Dict[str, Any]) -> Optional[str]:
-    try:
-        validate(instance=params, schema=schema)
-        return None
-    except ValidationError as e:
-        return str(e)
+    entry = _SCHEMA_VALIDATORS.get(id(schema))
+    if entry is None or entry[0] is not schema:
+        if len(_SCHEMA_VALIDATORS) >= 256:
+            _SCHEMA_VALIDATORS.clear()
+        entry = (schema, compile_validator(schema))
+        _SCHEMA_VALIDATORS[id(schema)] = entry
+    return first_error(entry[1], params)
 
 
-def _list_tools(cursor: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
-    """Return tool list (tools/list)"""
-    tool_defs: List[Dict[str, Any]] = []
-    for t in TOOLS:
-        tool_defs.append({
-            "name": t["name"],
-            "description": t.get("description", ""),
-            "inputSchema": t.get("inputSchema", {})
-        })
-    # Centralized filtering by current user's allowed_tools (if any)
+def catalog_for(allowed: Optional[FrozenSet[str]]) -> ToolCatalog:
+    """Cached tools/list catalogue (dicts + bytes + ETag) for an effective tool set."""
+    return REGISTRY.catalog_for(allowed)
+
+
+def cache_stats() -> Dict[str, Any]:
+    return {"registry": REGISTRY.stats(), "schema_validators": len(_SCHEMA_VALIDATORS)}
+
+
+def allowed_tools_for_current_user() -> Optional[FrozenSet[str]]:
+    """Effective allowed tool names for the current principal (None = all)."""
     meta = get_current_user_meta() or {}
-    # RBAC role 우선 적용(default는 전체 허용)
-    role = (meta.get("role") or "").strip()
-    allowed = None
-    if role:
-        allowed = rbac.resolve_allowed_tools_for_role(role)
-    # 키에 개별 allowed_tools가 있으면 교차/대체
-    if isinstance(allowed, list) and allowed:
-        names = set(allowed)
-        tool_defs = [td for td in tool_defs if td.get("name") in names]
-    else:
-        key_tools = meta.get("allowed_tools")
-        if isinstance(key_tools, list) and key_tools:
-            names = set(key_tools)
-            tool_defs = [td for td in tool_defs if td.get("name") in names]
-    return tool_defs, None
+    # RBAC role 우선 적용(default는 전체 허용), 없으면 키 개별 allowed_tools
+    return rbac.effective_allowed_tools(meta.get("role"), meta.get("allowed_tools"))
+
+
+def _list_tools(cursor: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Return tool list (tools/list), filtered by the current user's effective tool set.
+    The returned list is the shared cached catalogue; callers must not mutate it."""
+    return catalog_for(allowed_tools_for_current_user()).tools, None
+
+
+def _drain_progress(gen) -> Any:
+    """Generator executors yield progress dicts ({"progress", "total"?, "message"?}) and return the result."""
+    while True:
+        try:
+            ev = next(gen)
+        except StopIteration as stop:
+            return stop.value
+        if isinstance(ev, dict) and "progress" in ev:
+            report_progress(ev["progress"], total=ev.get("total"), message=ev.get("message"))
 
 
 def _call_tool(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
     """Execute tool and return result (tools/call)"""
-    if name not in TOOLS_BY_NAME:
+    reg = REGISTRY
+    if name not in reg.by_name:
         raise ValueError("Unknown tool")
-    tool = TOOLS_BY_NAME[name]
-    err = validate_params_by_schema(arguments or {}, tool.get("inputSchema", {}))
+    with timed("validate"):
+        err = first_error(reg.validator(name), arguments or {})
     if err:
         raise TypeError(err)
     try:
-        exec_fn = TOOL_EXEC_MAP.get(name)
+        exec_fn = reg.executors.get(name)
         if not exec_fn:
             raise ValueError("No exec function mapped for tool")
-        raw = exec_fn(arguments or {})
+        with span("tool.execute", tool=name):
+            raw = exec_fn(arguments or {})
+            if inspect.isgenerator(raw):
+                raw = _drain_progress(raw)
         if isinstance(raw, dict) and "content" in raw and "isError" in raw:
             return raw
         if isinstance(raw, (dict, list)):
@@ -0,0 +1,194 @@
+ # tracing.py (lightweight spans)
+ # - span(name, **attrs): context-managed spans linked through a context variable
+ #   (propagates into asyncio.to_thread / run_in_executor via the copied context)
+ # - traced(kind): class decorator adding a span per public method (service/repository layers)
+ # - Exporters (TRACE_EXPORT): "jsonl" → TRACE_JSONL_PATH, "otlp" → OTLP/HTTP JSON at TRACE_OTLP_ENDPOINT
+ #   Spans are queued and written by one background thread; a full queue drops spans, never blocks
+ # - Disabled (default): span() yields None and traced() returns the class unchanged
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.config import cfg
+
+logger = logging.getLogger("mcp.tracing")
+
+ENABLED = cfg.trace_export in ("jsonl", "otlp")
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attrs", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attrs: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attrs = attrs
+        self.error: Optional[str] = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attrs[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attrs": self.attrs,
+            "error": self.error,
+        }
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+    if not ENABLED:
+        yield None
+        return
+    parent = _current.get()
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_id = os.urandom(16).hex(), None
+    sp = Span(name, trace_id, parent_id, attrs)
+    token = _current.set(sp)
+    try:
+        yield sp
+    except BaseException as e:
+        sp.error = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        _current.reset(token)
+        sp.end_ns = time.time_ns()
+        _exporter().submit(sp)
+
+
+def traced(kind: str):
+    """Class decorator: one span "<kind>.<method>" per public method call (no-op when disabled)."""
+    def wrap(cls):
+        if not ENABLED:
+            return cls
+        for attr, fn in list(vars(cls).items()):
+            if attr.startswith("_") or not callable(fn):
+                continue
+
+            def make(fn=fn, name=f"{kind}.{attr}"):
+                @functools.wraps(fn)
+                def inner(*args, **kwargs):
+                    with span(name):
+                        return fn(*args, **kwargs)
+                return inner
+            setattr(cls, attr, make())
+        return cls
+    return wrap
+
+
+# -----------------------------
+# Export
+# -----------------------------
+def _otlp_value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def _otlp_payload(spans: List[Span]) -> Dict[str, Any]:
+    out = []
+    for s in spans:
+        item = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attrs.items() if v is not None],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            item["parentSpanId"] = s.parent_id
+        out.append(item)
+    resource = {"attributes": [{"key": "service.name", "value": {"stringValue": cfg.server_name}}]}
+    return {"resourceSpans": [{"resource": resource, "scopeSpans": [{"scope": {"name": "mcp-ms-todo"}, "spans": out}]}]}
+
+
+class _Exporter:
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.q: "queue.Queue[Span]" = queue.Queue(maxsize=10000)
+        self.dropped = 0
+        self._client = None
+        threading.Thread(target=self._run, name="trace-export", daemon=True).start()
+
+    def submit(self, sp: Span) -> None:
+        try:
+            self.q.put_nowait(sp)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.q.get()]
+            deadline = time.monotonic() + 1.0
+            while len(batch) < 512:
+                try:
+                    batch.append(self.q.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                logger.warning("trace export failed (%d spans dropped): %s", len(batch), e)
+
+    def _write(self, batch: List[Span]) -> None:
+        if self.mode == "jsonl":
+            with open(cfg.trace_jsonl_path, "a", encoding="utf-8") as f:
+                for s in batch:
+                    f.write(json.dumps(s.to_dict(), ensure_ascii=False, default=str) + "\n")
+            return
+        if self._client is None:
+            import httpx
+            self._client = httpx.Client(timeout=5.0)
+        self._client.post(cfg.trace_otlp_endpoint, json=_otlp_payload(batch))
+
+
+_exporter_inst: Optional[_Exporter] = None
+_exporter_lock = threading.Lock()
+
+
+def queue_size() -> int:
+    return _exporter_inst.q.qsize() if _exporter_inst is not None else 0
+
+
+def _exporter() -> _Exporter:
+    global _exporter_inst
+    if _exporter_inst is None:
+        with _exporter_lock:
+            if _exporter_inst is None:
+                _exporter_inst = _Exporter(cfg.trace_export)
+    return _exporter_inst
@@ -1,7 +1,9 @@
 from typing import Dict, Any, Optional
 from app.domain.repositories import TodoRepository
+from app.tracing import traced
 
 
+@traced("service")
 class TodoService:
     def __init__(self, repo: TodoRepository):
         self.repo = repo
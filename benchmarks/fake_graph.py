@@ -0,0 +1,460 @@
+"""
+Offline Microsoft Graph (To Do) stand-in for deterministic benchmarks and load tests.
+
+Implements the subset app.adapter_graph_rest uses, under /v1.0:
+  /me/todo/lists                       GET (paged), POST
+  /me/todo/lists/{id}                  GET, PATCH, DELETE (If-Match)
+  /me/todo/lists/{id}/tasks            GET ($top/$select/$filter status eq|ne, @odata.nextLink), POST
+  /me/todo/lists/{id}/tasks/{id}       GET, PATCH (If-Match), DELETE (If-Match)
+  /me/todo/lists/delta, /me/todo/lists/{id}/tasks/delta   (@odata.nextLink / @odata.deltaLink, @removed)
+  /$batch                              up to 20 sub-requests
+Entities carry @odata.etag (W/"<version>"); a stale If-Match gets 412.
+Responses carry request-id and echo client-request-id.
+
+Fault injection (constructor/CLI, or POST /_fake/config at runtime):
+  latency_ms (+ jitter_ms), throttle_every (every Nth request → 429), throttle_rate (seeded random 429s),
+  retry_after (seconds in Retry-After on 429s; omit with -1)
+Control: GET /_fake/stats, POST /_fake/reset, POST /_fake/seed?lists=N&tasks=M
+
+Usage:
+  in-process:  with FakeGraph(lists=2, tasks=300) as g:  os.environ["GRAPH_BASE_URL"] = g.base_url
+  subprocess:  proc, base_url = spawn(latency_ms=20)
+  CLI:         python -m benchmarks.fake_graph --port 8089 --tasks 500 --latency-ms 20 --throttle-every 50
+               GRAPH_BASE_URL=http://127.0.0.1:8089/v1.0 make dev-serve
+"""
+import argparse
+import json
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+PREFIX = "/v1.0"
+BATCH_MAX = 20
+
+Result = Tuple[int, Dict[str, str], Any]  # status, headers, JSON body (None → no body)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def _error(status: int, code: str, message: str, headers: Optional[Dict[str, str]] = None) -> Result:
+    return status, headers or {}, {"error": {"code": code, "message": message}}
+
+
+class _State:
+    """In-memory To Do store with a change sequence for delta queries."""
+
+    def __init__(self, page_size: int):
+        self.page_size = page_size
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.seq = 0
+        self.lists: Dict[str, Dict[str, Any]] = {}  # id → list entity (with "_tasks", "_seq")
+        self.removed_lists: Dict[str, int] = {}  # id → seq of deletion
+        self.stats: Dict[str, int] = {"requests": 0, "throttled": 0, "batch_subrequests": 0}
+
+    def _bump(self, ent: Dict[str, Any]) -> None:
+        self.seq += 1
+        ent["_seq"] = self.seq
+        ent["_ver"] = ent.get("_ver", 0) + 1
+        ent["@odata.etag"] = f'W/"{ent["_ver"]}"'
+        ent["lastModifiedDateTime"] = _now()
+
+    def add_list(self, name: str) -> Dict[str, Any]:
+        lid = "L" + uuid.uuid4().hex[:20]
+        ent = {"id": lid, "displayName": name, "isOwner": True, "wellknownListName": "none", "_tasks": {}, "_removed": {}}
+        self._bump(ent)
+        self.lists[lid] = ent
+        return ent
+
+    def add_task(self, lst: Dict[str, Any], body: Dict[str, Any]) -> Dict[str, Any]:
+        tid = "T" + uuid.uuid4().hex[:20]
+        ent = {
+            "id": tid,
+            "title": body.get("title", ""),
+            "status": body.get("status", "notStarted"),
+            "importance": body.get("importance", "normal"),
+            "body": body.get("body") or {"content": "", "contentType": "text"},
+            "createdDateTime": _now(),
+        }
+        for k in ("dueDateTime", "reminderDateTime", "completedDateTime", "categories"):
+            if k in body:
+                ent[k] = body[k]
+        self._bump(ent)
+        lst["_tasks"][tid] = ent
+        return ent
+
+    def seed(self, lists: int, tasks: int) -> None:
+        rnd = random.Random(42)
+        statuses = ["notStarted", "notStarted", "inProgress", "completed"]
+        for i in range(lists):
+            lst = self.add_list(f"List {i + 1}")
+            for j in range(tasks):
+                due = {"dateTime": f"2025-12-{1 + j % 28:02d}T09:00:00.0000000", "timeZone": "UTC"}
+                self.add_task(lst, {
+                    "title": f"Task {i + 1}-{j + 1}",
+                    "status": rnd.choice(statuses),
+                    "importance": rnd.choice(["low", "normal", "high"]),
+                    "dueDateTime": due,
+                })
+
+
+def _public(ent: Dict[str, Any], select: Optional[List[str]] = None) -> Dict[str, Any]:
+    out = {k: v for k, v in ent.items() if not k.startswith("_")}
+    if select:
+        keep = set(select) | {"id", "@odata.etag"}
+        out = {k: v for k, v in out.items() if k in keep}
+    return out
+
+
+def _match_filter(ent: Dict[str, Any], expr: Optional[str]) -> bool:
+    # Supports "<field> eq|ne '<value>'" (enough for status filters)
+    if not expr:
+        return True
+    parts = expr.split(" ", 2)
+    if len(parts) != 3 or parts[1] not in ("eq", "ne"):
+        return True
+    field, op, val = parts[0], parts[1], parts[2].strip("'")
+    same = str(ent.get(field)) == val
+    return same if op == "eq" else not same
+
+
+class FakeGraph:
+    def __init__(
+        self,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        lists: int = 0,
+        tasks: int = 0,
+        page_size: int = 100,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        throttle_every: int = 0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 1.0,
+        seed: int = 1,
+    ):
+        self.state = _State(page_size)
+        self.config: Dict[str, Any] = {
+            "latency_ms": latency_ms,
+            "jitter_ms": jitter_ms,
+            "throttle_every": throttle_every,
+            "throttle_rate": throttle_rate,
+            "retry_after": retry_after,
+        }
+        self._rnd = random.Random(seed)
+        if lists:
+            self.state.seed(lists, tasks)
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like Graph
+            disable_nagle_algorithm = True  # headers and body are separate writes (avoid delayed-ACK stalls)
+
+            def log_message(self, *args):  # quiet
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                status, headers, body = fake.handle(self.command, self.path, dict(self.headers.items()), raw)
+                data = b"" if body is None else json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                if data:
+                    self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                if data:
+                    self.wfile.write(data)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = do_PUT = _handle
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}{PREFIX}"
+
+    def start(self) -> "FakeGraph":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-graph", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeGraph":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # -----------------------------
+    # Request handling
+    # -----------------------------
+    def handle(self, method: str, target: str, headers: Dict[str, str], raw: bytes) -> Result:
+        parts = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        path = parts.path
+        if path.startswith("/_fake/"):
+            return self._control(method, path, query, raw)
+
+        hdrs = {k.lower(): v for k, v in headers.items()}
+        out_headers = {"request-id": str(uuid.uuid4())}
+        if "client-request-id" in hdrs:
+            out_headers["client-request-id"] = hdrs["client-request-id"]
+
+        with self.state.lock:
+            self.state.stats["requests"] += 1
+            n = self.state.stats["requests"]
+        cfg = self.config
+        delay = cfg["latency_ms"] + (self._rnd.uniform(0, cfg["jitter_ms"]) if cfg["jitter_ms"] else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        if (cfg["throttle_every"] and n % int(cfg["throttle_every"]) == 0) or (
+            cfg["throttle_rate"] and self._rnd.random() < cfg["throttle_rate"]
+        ):
+            with self.state.lock:
+                self.state.stats["throttled"] += 1
+            if cfg["retry_after"] is not None and cfg["retry_after"] >= 0:
+                out_headers["Retry-After"] = str(int(cfg["retry_after"]) if float(cfg["retry_after"]).is_integer() else cfg["retry_after"])
+            return _error(429, "TooManyRequests", "Too many requests (injected)", out_headers)
+
+        if not hdrs.get("authorization", "").lower().startswith("bearer ") or len(hdrs["authorization"]) <= 7:
+            return _error(401, "InvalidAuthenticationToken", "Access token is empty.", out_headers)
+        if not path.startswith(PREFIX):
+            return _error(404, "ResourceNotFound", "Unsupported API version", out_headers)
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            return _error(400, "BadRequest", "Invalid JSON", out_headers)
+
+        rel = path[len(PREFIX):]
+        if rel == "/$batch" and method == "POST":
+            status, h, res = self._batch(body, hdrs)
+        else:
+            with self.state.lock:
+                status, h, res = self._route(method, rel, query, body, hdrs)
+        out_headers.update(h)
+        return status, out_headers, res
+
+    def _batch(self, body: Dict[str, Any], hdrs: Dict[str, str]) -> Result:
+        reqs = body.get("requests") if isinstance(body, dict) else None
+        if not isinstance(reqs, list) or not reqs:
+            return _error(400, "BadRequest", "requests array required")
+        if len(reqs) > BATCH_MAX:
+            return _error(400, "BadRequest", f"Batch request limit is {BATCH_MAX}")
+        responses = []
+        for r in reqs:
+            sub_headers = {**hdrs, **{k.lower(): v for k, v in (r.get("headers") or {}).items()}}
+            url = urlsplit(r.get("url", ""))
+            q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            with self.state.lock:
+                self.state.stats["batch_subrequests"] += 1
+                status, h, res = self._route(r.get("method", "GET").upper(), url.path, q, r.get("body") or {}, sub_headers)
+            item = {"id": r.get("id"), "status": status, "headers": h}
+            if res is not None:
+                item["body"] = res
+            responses.append(item)
+        return 200, {}, {"responses": responses}
+
+    def _route(self, method: str, rel: str, query: Dict[str, str], body: Dict[str, Any], hdrs: Dict[str, str]) -> Result:
+        segs = [s for s in rel.split("/") if s]
+        if len(segs) >= 2 and segs[0] == "users":
+            segs = ["me"] + segs[2:]  # /users/{id}/todo/... behaves like /me/todo/...
+        if segs[:3] != ["me", "todo", "lists"]:
+            return _error(404, "ResourceNotFound", f"Resource not found: {rel}")
+        segs = segs[3:]
+        st = self.state
+        if not segs:
+            if method == "GET":
+                return self._page(self._list_base(), list(st.lists.values()), query)
+            if method == "POST":
+                if not body.get("displayName"):
+                    return _error(400, "BadRequest", "displayName required")
+                return 201, {}, _public(st.add_list(body["displayName"]))
+            return _error(405, "MethodNotAllowed", method)
+        if segs[0] in ("delta", "delta()") and len(segs) == 1 and method == "GET":
+            return self._delta(self._list_base() + "/delta", st.lists, st.removed_lists, query)
+
+        lst = st.lists.get(segs[0])
+        if lst is None:
+            return _error(404, "ResourceNotFound", "The specified object was not found in the store.")
+        if len(segs) == 1:
+            return self._entity(method, lst, body, hdrs, on_delete=lambda: self._delete_list(lst))
+        if segs[1] != "tasks":
+            return _error(404, "ResourceNotFound", f"Resource not found: {rel}")
+        tasks = lst["_tasks"]
+        base = f"{self._list_base()}/{lst['id']}/tasks"
+        if len(segs) == 2:
+            if method == "GET":
+                items = [t for t in tasks.values() if _match_filter(t, query.get("$filter"))]
+                return self._page(base, items, query)
+            if method == "POST":
+                if not body.get("title"):
+                    return _error(400, "BadRequest", "title required")
+                return 201, {}, _public(st.add_task(lst, body))
+            return _error(405, "MethodNotAllowed", method)
+        if segs[2] in ("delta", "delta()") and len(segs) == 3 and method == "GET":
+            return self._delta(base + "/delta", tasks, lst["_removed"], query)
+        task = tasks.get(segs[2])
+        if task is None or len(segs) > 3:
+            return _error(404, "ResourceNotFound", "The specified object was not found in the store.")
+        return self._entity(method, task, body, hdrs, select=query.get("$select"), on_delete=lambda: self._delete_task(lst, task))
+
+    def _list_base(self) -> str:
+        return f"{self.base_url}/me/todo/lists"
+
+    def _entity(self, method: str, ent: Dict[str, Any], body: Dict[str, Any], hdrs: Dict[str, str], *, select: Optional[str] = None, on_delete=None) -> Result:
+        if method == "GET":
+            return 200, {"ETag": ent["@odata.etag"]}, _public(ent, select.split(",") if select else None)
+        if_match = hdrs.get("if-match")
+        if if_match and if_match not in ("*", ent["@odata.etag"]):
+            return _error(412, "PreconditionFailed", "The ETag does not match the current version.")
+        if method == "PATCH":
+            for k, v in (body or {}).items():
+                if not k.startswith("_") and k not in ("id", "@odata.etag"):
+                    ent[k] = v
+            self.state._bump(ent)
+            return 200, {"ETag": ent["@odata.etag"]}, _public(ent)
+        if method == "DELETE":
+            on_delete()
+            return 204, {}, None
+        return _error(405, "MethodNotAllowed", method)
+
+    def _delete_list(self, lst: Dict[str, Any]) -> None:
+        st = self.state
+        st.lists.pop(lst["id"], None)
+        st.seq += 1
+        st.removed_lists[lst["id"]] = st.seq
+
+    def _delete_task(self, lst: Dict[str, Any], task: Dict[str, Any]) -> None:
+        st = self.state
+        lst["_tasks"].pop(task["id"], None)
+        st.seq += 1
+        lst["_removed"][task["id"]] = st.seq
+
+    def _page(self, base: str, items: List[Dict[str, Any]], query: Dict[str, str]) -> Result:
+        top = int(query.get("$top") or self.state.page_size)
+        skip = int(query.get("$skiptoken") or 0)
+        select = query.get("$select")
+        fields = select.split(",") if select else None
+        page = [_public(x, fields) for x in items[skip:skip + top]]
+        out: Dict[str, Any] = {"@odata.context": base, "value": page}
+        if skip + top < len(items):
+            nq = {k: v for k, v in query.items() if k != "$skiptoken"}
+            nq["$skiptoken"] = str(skip + top)
+            out["@odata.nextLink"] = f"{base}?{urlencode(nq)}"
+        return 200, {}, out
+
+    def _delta(self, base: str, ents: Dict[str, Dict[str, Any]], removed: Dict[str, int], query: Dict[str, str]) -> Result:
+        since = int(query.get("$deltatoken") or 0)
+        skip = int(query.get("$skiptoken") or 0)
+        changes: List[Tuple[int, Dict[str, Any]]] = [(e["_seq"], _public(e)) for e in ents.values() if e["_seq"] > since]
+        changes += [(s, {"id": i, "@removed": {"reason": "deleted"}}) for i, s in removed.items() if s > since]
+        changes.sort(key=lambda c: c[0])
+        page_size = self.state.page_size
+        page = [c[1] for c in changes[skip:skip + page_size]]
+        out: Dict[str, Any] = {"@odata.context": base, "value": page}
+        if skip + page_size < len(changes):
+            out["@odata.nextLink"] = f"{base}?{urlencode({'$deltatoken': since, '$skiptoken': skip + page_size})}"
+        else:
+            out["@odata.deltaLink"] = f"{base}?{urlencode({'$deltatoken': self.state.seq})}"
+        return 200, {}, out
+
+    def _control(self, method: str, path: str, query: Dict[str, str], raw: bytes) -> Result:
+        if path == "/_fake/stats":
+            with self.state.lock:
+                tasks = sum(len(l["_tasks"]) for l in self.state.lists.values())
+                return 200, {}, {**self.state.stats, "lists": len(self.state.lists), "tasks": tasks, "config": self.config}
+        if path == "/_fake/config" and method == "POST":
+            updates = json.loads(raw or b"{}")
+            unknown = set(updates) - set(self.config)
+            if unknown:
+                return _error(400, "BadRequest", f"unknown keys: {sorted(unknown)}")
+            self.config.update(updates)
+            return 200, {}, self.config
+        if path == "/_fake/reset" and method == "POST":
+            with self.state.lock:
+                self.state.reset()
+            return 200, {}, {"reset": True}
+        if path == "/_fake/seed" and method == "POST":
+            with self.state.lock:
+                self.state.seed(int(query.get("lists", 1)), int(query.get("tasks", 100)))
+                return 200, {}, {"lists": len(self.state.lists)}
+        return _error(404, "ResourceNotFound", path)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn(**options: Any) -> Tuple[subprocess.Popen, str]:
+    """Start the fake in a subprocess (CLI flags from keyword options); returns (process, base_url)."""
+    port = options.pop("port", None) or _free_port()
+    cmd = [sys.executable, "-m", "benchmarks.fake_graph", "--port", str(port)]
+    for k, v in options.items():
+        cmd += [f"--{k.replace('_', '-')}", str(v)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc, f"http://127.0.0.1:{port}{PREFIX}"
+        except OSError:
+            if proc.poll() is not None:
+                raise RuntimeError(f"fake graph exited with {proc.returncode}")
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("fake graph did not start")
+
+
+def main(argv: List[str]) -> int:
+    p = argparse.ArgumentParser(prog="python -m benchmarks.fake_graph", description="Offline Graph To Do stand-in")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8089)
+    p.add_argument("--lists", type=int, default=2)
+    p.add_argument("--tasks", type=int, default=200, help="tasks per seeded list")
+    p.add_argument("--page-size", type=int, default=100)
+    p.add_argument("--latency-ms", type=float, default=0.0)
+    p.add_argument("--jitter-ms", type=float, default=0.0)
+    p.add_argument("--throttle-every", type=int, default=0, help="every Nth request gets 429 (0 = off)")
+    p.add_argument("--throttle-rate", type=float, default=0.0, help="probability of a 429 (seeded)")
+    p.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds on 429 (-1 = omit header)")
+    p.add_argument("--seed", type=int, default=1)
+    a = p.parse_args(argv)
+    g = FakeGraph(
+        host=a.host, port=a.port, lists=a.lists, tasks=a.tasks, page_size=a.page_size,
+        latency_ms=a.latency_ms, jitter_ms=a.jitter_ms, throttle_every=a.throttle_every,
+        throttle_rate=a.throttle_rate, retry_after=a.retry_after, seed=a.seed,
+    )
+    print(f"fake graph listening: GRAPH_BASE_URL={g.base_url}", flush=True)
+    try:
+        g.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,609 @@
+"""
+End-to-end load benchmark for POST /mcp: the ASGI app in-process (httpx ASGITransport),
+backed by the offline Graph stand-in (benchmarks.fake_graph) and a throwaway SQLite DB.
+
+Each virtual client owns one API key (keys are spread over --profiles token profiles) and
+issues a weighted mix of initialize / tools/list / tools/call. Reports throughput,
+p50/p95/p99 latency (overall and per operation), Graph calls per tool call, and RSS.
+
+Usage:
+  python -m benchmarks.load                                  # 20 clients, 10s
+  python -m benchmarks.load --clients 50 --keys 50 --profiles 10 --duration 30 --latency-ms 20
+  python -m benchmarks.load --out benchmarks/results/load.json            # save results
+  python -m benchmarks.load --baseline benchmarks/results/load.json       # compare; exit 1 on regression
+  DB_POOL_SIZE=2 DB_MAX_OVERFLOW=0 python -m benchmarks.load --clients 40 --latency-ms 200 --max-errors 0
+                                                             # more in-flight requests than DB connections
+
+Soak mode (--soak): runs for --duration seconds (hours in CI/nightly) while SSE clients connect
+and disconnect, API keys are rotated through the admin API, profile tokens are rotated and the
+fake Graph (own process) injects 429s. Every --sample-every seconds it records RSS, open fds,
+threads, metric series, sessions/SSE channels and window latency percentiles; the run fails
+(exit 1) if any of those keeps growing across the settled run.
+  python -m benchmarks.load --soak --duration 7200 --sample-every 60 --out soak.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import statistics
+import tempfile
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+# (operation, weight). Operations other than initialize/tools/list are tools/call tool names.
+MIX: List[Tuple[str, int]] = [
+    ("initialize", 5),
+    ("tools/list", 20),
+    ("todo.lists.get", 15),
+    ("todo.tasks.lite_list", 20),
+    ("todo.tasks.get", 10),
+    ("todo.tasks.lite_all", 5),
+    ("todo.sync.delta_tasks", 5),
+    ("todo.tasks.create", 10),
+    ("todo.tasks.patch", 10),
+]
+
+# Relative tolerance before a metric counts as a regression (--threshold scales latency/throughput)
+_GRAPH_CALLS_TOLERANCE = 0.05
+_RSS_TOLERANCE = 0.25
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list (q in 0..100)."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(q / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def _latency_stats(samples: List[float]) -> Dict[str, float]:
+    s = sorted(samples)
+    return {
+        "count": len(s),
+        "mean_ms": round(sum(s) / len(s), 3) if s else 0.0,
+        "p50_ms": round(percentile(s, 50), 3),
+        "p95_ms": round(percentile(s, 95), 3),
+        "p99_ms": round(percentile(s, 99), 3),
+        "max_ms": round(s[-1], 3) if s else 0.0,
+    }
+
+
+def _setup_env(args: argparse.Namespace, graph_base_url: str, db_path: str) -> None:
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    os.environ["GRAPH_BASE_URL"] = graph_base_url
+    os.environ["DB_URL"] = f"sqlite:///{db_path}"
+    os.environ["DB_AUTO_CREATE"] = "true"
+    os.environ.setdefault("API_KEY", "bench-master-key")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("TOOL_SCHEMA_DIR", os.path.join(root, "app", "tools"))
+    # The client-side Graph limiter (default 5/s) would otherwise be the only thing measured
+    os.environ.setdefault("RATE_PER_SEC", str(args.rate_per_sec))
+    os.environ.setdefault("RATE_BURST", str(max(1, int(args.rate_per_sec))))
+    os.environ.setdefault("HTTP_BACKOFF_INITIAL", "0.05")
+
+
+def _seed_principals(n_keys: int, n_profiles: int) -> List[str]:
+    from app.models import Base
+    from app.db import ensure_schema
+    from app.tokens import upsert_token
+    from app.apikeys import generate_api_key
+
+    ensure_schema(Base)
+    far = int(time.time()) + 30 * 24 * 3600
+    for p in range(n_profiles):
+        upsert_token(profile=f"bench{p}", token_data={"access_token": f"fake-token-{p}", "expires_on": far, "token_type": "Bearer"})
+    return [
+        generate_api_key("default", name=f"bench-{i}", token_profile=f"bench{i % n_profiles}")[0]
+        for i in range(n_keys)
+    ]
+
+
+class _Client:
+    """One virtual MCP client: an API key, optionally an Mcp-Session-Id, and a seeded op stream."""
+
+    def __init__(self, http, key: str, rnd: random.Random, read_list: str, write_list: str, task_ids: List[str], use_session: bool):
+        self.http = http
+        self.key = key
+        self.rnd = rnd
+        self.read_list = read_list
+        self.write_list = write_list
+        self.task_ids = task_ids
+        self.use_session = use_session
+        self.session_id: Optional[str] = None
+        self._ops = [op for op, _ in MIX]
+        self._weights = [w for _, w in MIX]
+        self._id = 0
+
+    def _params(self, op: str) -> Tuple[str, Dict[str, Any]]:
+        if op in ("initialize", "tools/list"):
+            return op, {}
+        rl = self.read_list
+        args: Dict[str, Any] = {
+            "todo.lists.get": {},
+            "todo.tasks.lite_list": {"list_id": rl, "top": 20},
+            "todo.tasks.get": {"list_id": rl, "top": 50},
+            "todo.tasks.lite_all": {"list_id": rl, "page_size": 100},
+            "todo.sync.delta_tasks": {"list_id": rl},
+            "todo.tasks.create": {"list_id": self.write_list, "title": f"bench {self.rnd.random():.6f}"},
+            "todo.tasks.patch": {"list_id": rl, "task_id": self.rnd.choice(self.task_ids), "mode": self.rnd.choice(["complete", "reopen"])},
+        }[op]
+        return "tools/call", {"name": op, "arguments": args}
+
+    async def step_initialize(self) -> None:
+        r = await self.http.post("/mcp", json={"jsonrpc": "2.0", "id": 0, "method": "initialize"}, headers={"x-api-key": self.key})
+        if self.use_session:
+            self.session_id = r.headers.get("mcp-session-id")
+
+    async def step(self) -> Tuple[str, float, bool]:
+        op = self.rnd.choices(self._ops, self._weights)[0]
+        method, params = self._params(op)
+        self._id += 1
+        headers = {"x-api-key": self.key}
+        if self.session_id and method != "initialize":
+            headers["mcp-session-id"] = self.session_id
+        t0 = time.perf_counter()
+        r = await self.http.post("/mcp", json={"jsonrpc": "2.0", "id": self._id, "method": method, "params": params}, headers=headers)
+        ms = (time.perf_counter() - t0) * 1000
+        ok = r.status_code == 200
+        if ok:
+            body = r.json()
+            ok = "error" not in body and not (body.get("result") or {}).get("isError", False)
+        if method == "initialize" and self.use_session and r.headers.get("mcp-session-id"):
+            self.session_id = r.headers["mcp-session-id"]
+        return op, ms, ok
+
+
+async def _drive(app, specs: List[Dict[str, Any]], args: argparse.Namespace, fake) -> Dict[str, Any]:
+    import httpx
+
+    samples: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    issued = 0
+
+    async def loop(c: _Client, until: float, record: bool) -> None:
+        nonlocal issued
+        while time.perf_counter() < until:
+            if record:
+                if args.requests and issued >= args.requests:
+                    return
+                issued += 1
+            op, ms, ok = await c.step()
+            if record:
+                samples[op].append(ms)
+                if not ok:
+                    errors[op] += 1
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            clients = [_Client(http, **spec) for spec in specs]
+            for c in clients:
+                await c.step_initialize()
+            if args.warmup > 0:
+                until = time.perf_counter() + args.warmup
+                await asyncio.gather(*(loop(c, until, False) for c in clients))
+            before = dict(fake.state.stats)  # Graph counters cover the measured window only
+            t0 = time.perf_counter()
+            await asyncio.gather(*(loop(c, t0 + args.duration, True) for c in clients))
+            wall = time.perf_counter() - t0
+            after = dict(fake.state.stats)
+    graph = {k: after[k] - before[k] for k in ("requests", "throttled", "batch_subrequests")}
+    return {"samples": samples, "errors": errors, "wall_sec": wall, "graph": graph}
+
+
+def _client_specs(args: argparse.Namespace, keys: List[str], read_list: str, write_list: str, task_ids: List[str]) -> List[Dict[str, Any]]:
+    rnd = random.Random(args.seed)
+    return [
+        {
+            "key": keys[i % len(keys)],
+            "rnd": random.Random(rnd.random()),
+            "read_list": read_list,
+            "write_list": write_list,
+            "task_ids": task_ids,
+            "use_session": rnd.random() < args.session_ratio,
+        }
+        for i in range(args.clients)
+    ]
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+    from benchmarks.fake_graph import FakeGraph
+
+    fake = FakeGraph(
+        lists=3, tasks=args.tasks, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        throttle_every=args.throttle_every, retry_after=args.retry_after, seed=args.seed,
+    ).start()
+    tmp = tempfile.TemporaryDirectory(prefix="mcp-load-")
+    try:
+        _setup_env(args, fake.base_url, os.path.join(tmp.name, "bench.db"))
+        from app.memdiag import process_memory
+
+        rss0 = process_memory()["rss_bytes"]
+        from app.main import app
+
+        keys = _seed_principals(args.keys, args.profiles)
+        lists = list(fake.state.lists.values())
+        read_list, write_list = lists[0]["id"], lists[-1]["id"]
+        task_ids = list(lists[0]["_tasks"])
+        specs = _client_specs(args, keys, read_list, write_list, task_ids)
+        rss_ready = process_memory()["rss_bytes"]
+
+        out = asyncio.run(_drive(app, specs, args, fake))
+        mem = process_memory()
+    finally:
+        fake.stop()
+        tmp.cleanup()
+
+    samples, errors, wall = out["samples"], out["errors"], out["wall_sec"]
+    all_ms = [ms for v in samples.values() for ms in v]
+    tool_calls = sum(len(v) for op, v in samples.items() if op not in ("initialize", "tools/list"))
+    g = out["graph"]
+    mb = 1024 * 1024
+    return {
+        "benchmark": "load",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+        "requests": len(all_ms),
+        "errors": sum(errors.values()),
+        "wall_sec": round(wall, 3),
+        "throughput_rps": round(len(all_ms) / wall, 2) if wall else 0.0,
+        "latency": _latency_stats(all_ms),
+        "ops": {op: {**_latency_stats(v), "errors": errors.get(op, 0)} for op, v in sorted(samples.items())},
+        "graph": {
+            "calls": g["requests"],
+            "throttled": g["throttled"],
+            "batch_subrequests": g["batch_subrequests"],
+            "calls_per_tool_call": round(g["requests"] / tool_calls, 3) if tool_calls else 0.0,
+        },
+        "memory": {
+            "rss_start_mb": round((rss0 or 0) / mb, 1),
+            "rss_ready_mb": round((rss_ready or 0) / mb, 1),
+            "rss_end_mb": round((mem["rss_bytes"] or 0) / mb, 1),
+            "rss_peak_mb": round((mem["peak_rss_bytes"] or 0) / mb, 1),
+            "rss_growth_mb": round(((mem["rss_bytes"] or 0) - (rss_ready or 0)) / mb, 1),
+        },
+    }
+
+
+# -----------------------------
+# Soak mode (--soak): long run with churn, resources sampled over time
+# -----------------------------
+# (sample field, relative growth, absolute growth) that counts as a leak/drift when the
+# medians of the three thirds of the settled run are strictly increasing and exceed both
+SOAK_CHECKS: List[Tuple[str, float, float]] = [
+    ("rss_mb", 0.10, 8.0),
+    ("fds", 0.10, 5),
+    ("threads", 0.10, 3),
+    ("series", 0.05, 10),
+    ("p95_ms", 0.50, 5.0),
+    ("p99_ms", 0.50, 10.0),
+]
+
+
+def _open_fds() -> Optional[int]:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+async def _sse_visit(app, key: str, hold_sec: float) -> int:
+    """Open GET /mcp as an SSE stream (raw ASGI), hold it, then disconnect; returns frames received."""
+    started = False
+    gone = asyncio.Event()
+    frames = 0
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal started
+        if not started:
+            started = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await gone.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal frames
+        if message["type"] == "http.response.body" and message.get("body"):
+            frames += 1
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/mcp", "raw_path": b"/mcp", "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench"), (b"accept", b"text/event-stream"), (b"x-api-key", key.encode())],
+        "client": ("127.0.0.1", 40000), "server": ("bench", 80),
+    }
+    task = asyncio.create_task(app(scope, receive, send))
+    await asyncio.sleep(hold_sec)
+    gone.set()
+    try:
+        await asyncio.wait_for(task, timeout=5)
+    except asyncio.TimeoutError:
+        task.cancel()
+    return frames
+
+
+def trend(values: List[float], rel: float, abs_min: float) -> Optional[str]:
+    """'a -> b -> c' if the medians of the three thirds grow strictly and by more than rel/abs_min."""
+    n = len(values) // 3
+    if n < 2:
+        return None
+    a, b, c = (statistics.median(values[i * n:(i + 1) * n]) for i in range(3))
+    if a < b < c and c - a >= abs_min and c > a * (1 + rel):
+        return f"{a:g} -> {b:g} -> {c:g}"
+    return None
+
+
+def soak_verdict(samples: List[Dict[str, Any]], settle: float) -> List[str]:
+    settled = samples[int(len(samples) * settle):]
+    problems = []
+    for field, rel, abs_min in SOAK_CHECKS:
+        values = [s[field] for s in settled if s.get(field) is not None]
+        grew = trend(values, rel, abs_min)
+        if grew:
+            problems.append(f"{field} keeps growing: {grew}")
+    return problems
+
+
+async def _soak_drive(app, specs: List[Dict[str, Any]], args: argparse.Namespace, key_profiles: Dict[str, str]) -> Dict[str, Any]:
+    import httpx
+    from app.main import _sessions, _sse_hub
+    from app.memdiag import process_memory
+    from app.metrics import METRICS
+
+    master = {"x-api-key": os.environ["API_KEY"]}
+    window: Dict[str, Any] = {"lat": [], "errors": 0}
+    counters = {"sse_visits": 0, "sse_frames": 0, "keys_rotated": 0, "tokens_rotated": 0, "churn_errors": 0}
+    samples: List[Dict[str, Any]] = []
+    stop = asyncio.Event()
+    pending: set = set()  # in-flight SSE visits
+    rnd = random.Random(args.seed + 1)
+
+    async def every(period: float, fn) -> None:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=period)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await fn()
+            except Exception:
+                counters["churn_errors"] += 1
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+            clients = [_Client(http, **spec) for spec in specs]
+            for c in clients:
+                await c.step_initialize()
+
+            async def traffic(c: _Client) -> None:
+                while not stop.is_set():
+                    op, ms, ok = await c.step()
+                    window["lat"].append(ms)
+                    if not ok:
+                        window["errors"] += 1
+
+            async def sse_churn() -> None:
+                # fire-and-forget: several streams overlap, each held 0.5–5s
+                async def visit() -> None:
+                    counters["sse_frames"] += await _sse_visit(app, rnd.choice(clients).key, rnd.uniform(0.5, 5.0))
+                counters["sse_visits"] += 1
+                pending.add(asyncio.create_task(visit()))
+                pending.difference_update({t for t in pending if t.done()})
+
+            async def key_churn() -> None:
+                old = rnd.choice(clients).key
+                r = await http.post("/admin/api-keys", json={"template": "default", "token_profile": key_profiles[old],
+                                                             "name": f"soak-{counters['keys_rotated']}"}, headers=master)
+                new = r.json()["api_key"]
+                key_profiles[new] = key_profiles[old]
+                for c in clients:
+                    if c.key == old:
+                        c.key, c.session_id = new, None
+                await http.delete(f"/admin/api-keys/{old}", headers=master)  # drops the old key's sessions
+                for c in clients:
+                    if c.key == new:
+                        await c.step_initialize()
+                counters["keys_rotated"] += 1
+
+            async def token_rotation() -> None:
+                profile = f"bench{rnd.randrange(args.profiles)}"
+                far = int(time.time()) + 30 * 24 * 3600
+                await http.post("/admin/tokens", json={"profile": profile, "token": {
+                    "access_token": f"fake-token-{profile}-{counters['tokens_rotated']}", "expires_on": far}}, headers=master)
+                counters["tokens_rotated"] += 1
+
+            t_start = time.perf_counter()
+            last = [t_start]
+
+            async def sample() -> None:
+                lat, errors = window["lat"], window["errors"]
+                window["lat"], window["errors"] = [], 0
+                now = time.perf_counter()
+                st = _latency_stats(lat)
+                rss = process_memory()["rss_bytes"]
+                row = {
+                    "t_sec": round(now - t_start, 1),
+                    "requests": len(lat),
+                    "rps": round(len(lat) / (now - last[0]), 1),
+                    "errors": errors,
+                    "p50_ms": st["p50_ms"], "p95_ms": st["p95_ms"], "p99_ms": st["p99_ms"],
+                    "rss_mb": round(rss / (1024 * 1024), 1) if rss else None,
+                    "fds": _open_fds(),
+                    "threads": threading.active_count(),
+                    "series": METRICS.series_count(),
+                    "sessions": len(_sessions),
+                    "sse_channels": len(_sse_hub),
+                    "sse_connections": _sse_hub.connections,
+                }
+                last[0] = now
+                samples.append(row)
+                print(" ".join(f"{k}={v}" for k, v in row.items()), flush=True)
+
+            tasks = [asyncio.create_task(traffic(c)) for c in clients]
+            tasks += [
+                asyncio.create_task(every(args.sse_every, sse_churn)),
+                asyncio.create_task(every(args.key_churn_sec, key_churn)),
+                asyncio.create_task(every(args.token_rotate_sec, token_rotation)),
+                asyncio.create_task(every(args.sample_every, sample)),
+            ]
+            await asyncio.sleep(args.duration)
+            stop.set()
+            await asyncio.gather(*tasks)
+            await asyncio.gather(*pending, return_exceptions=True)
+    return {"samples": samples, "churn": counters}
+
+
+def soak(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+    from benchmarks.fake_graph import spawn
+
+    # Separate process, so its growing task store does not show up in the server's RSS
+    proc, base_url = spawn(lists=3, tasks=args.tasks, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                           throttle_every=args.throttle_every, retry_after=args.retry_after, seed=args.seed)
+    tmp = tempfile.TemporaryDirectory(prefix="mcp-soak-")
+    try:
+        # Short TTLs so sessions/SSE channels reach steady state well within the run
+        os.environ.setdefault("SESSION_TTL_SEC", "60")
+        os.environ.setdefault("SSE_CHANNEL_TTL_SEC", "30")
+        _setup_env(args, base_url, os.path.join(tmp.name, "soak.db"))
+        from app.main import app
+
+        keys = _seed_principals(args.keys, args.profiles)
+        key_profiles = {k: f"bench{i % args.profiles}" for i, k in enumerate(keys)}
+        auth = {"Authorization": "Bearer soak"}
+        lists = httpx.get(f"{base_url}/me/todo/lists", headers=auth).json()["value"]
+        read_list, write_list = lists[0]["id"], lists[-1]["id"]
+        tasks = httpx.get(f"{base_url}/me/todo/lists/{read_list}/tasks", params={"$top": "1000", "$select": "id"}, headers=auth).json()
+        specs = _client_specs(args, keys, read_list, write_list, [t["id"] for t in tasks["value"]])
+        out = asyncio.run(_soak_drive(app, specs, args, key_profiles))
+        graph = httpx.get(base_url.replace("/v1.0", "/_fake/stats")).json()
+    finally:
+        proc.terminate()
+        proc.wait()
+        tmp.cleanup()
+    problems = soak_verdict(out["samples"], args.settle)
+    return {
+        "benchmark": "soak",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+        "churn": out["churn"],
+        "graph": {"calls": graph["requests"], "throttled": graph["throttled"]},
+        "samples": out["samples"],
+        "problems": problems,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Human-readable regressions of `current` vs `baseline` (empty list = none)."""
+    problems: List[str] = []
+
+    def worse(name: str, cur: float, base: float, tol: float, higher_is_better: bool = False) -> None:
+        if not base:
+            return
+        change = (cur - base) / base
+        if (higher_is_better and change < -tol) or (not higher_is_better and change > tol):
+            problems.append(f"{name}: {base} -> {cur} ({change:+.1%}, tolerance {tol:.0%})")
+
+    worse("throughput_rps", current["throughput_rps"], baseline["throughput_rps"], threshold, higher_is_better=True)
+    for q in ("p50_ms", "p95_ms", "p99_ms"):
+        worse(f"latency.{q}", current["latency"][q], baseline["latency"][q], threshold)
+    worse("graph.calls_per_tool_call", current["graph"]["calls_per_tool_call"], baseline["graph"]["calls_per_tool_call"], _GRAPH_CALLS_TOLERANCE)
+    worse("memory.rss_peak_mb", current["memory"]["rss_peak_mb"], baseline["memory"]["rss_peak_mb"], _RSS_TOLERANCE)
+    if current["errors"] > baseline.get("errors", 0):
+        problems.append(f"errors: {baseline.get('errors', 0)} -> {current['errors']}")
+    return problems
+
+
+def _print_report(res: Dict[str, Any]) -> None:
+    lat, g, m = res["latency"], res["graph"], res["memory"]
+    print(f"requests {res['requests']}  errors {res['errors']}  wall {res['wall_sec']}s  throughput {res['throughput_rps']} req/s")
+    print(f"latency  p50 {lat['p50_ms']} ms  p95 {lat['p95_ms']} ms  p99 {lat['p99_ms']} ms  max {lat['max_ms']} ms")
+    for op, st in res["ops"].items():
+        print(f"  {op:<24} n={st['count']:<6} p50 {st['p50_ms']:>8.2f}  p95 {st['p95_ms']:>8.2f}  p99 {st['p99_ms']:>8.2f}  err {st['errors']}")
+    print(f"graph    calls {g['calls']}  per tool call {g['calls_per_tool_call']}  throttled {g['throttled']}")
+    print(f"memory   rss ready {m['rss_ready_mb']} MB  end {m['rss_end_mb']} MB  peak {m['rss_peak_mb']} MB  growth {m['rss_growth_mb']} MB")
+
+
+def _write(path: Optional[str], res: Dict[str, Any]) -> None:
+    if not path:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(res, f, indent=2, sort_keys=True)
+    print(f"# results written to {path}", file=sys.stderr)
+
+
+def main(argv: List[str]) -> int:
+    p = argparse.ArgumentParser(prog="python -m benchmarks.load")
+    p.add_argument("--clients", type=int, default=20, help="concurrent virtual clients")
+    p.add_argument("--keys", type=int, default=20, help="distinct API keys (clients share keys round-robin)")
+    p.add_argument("--profiles", type=int, default=5, help="distinct token profiles (keys spread round-robin)")
+    p.add_argument("--session-ratio", type=float, default=0.5, help="fraction of clients that reuse Mcp-Session-Id")
+    p.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    p.add_argument("--requests", type=int, default=0, help="stop after N measured requests (0 = duration only)")
+    p.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before the run")
+    p.add_argument("--tasks", type=int, default=300, help="tasks per seeded list in the fake Graph")
+    p.add_argument("--latency-ms", type=float, default=0.0, help="fake Graph latency")
+    p.add_argument("--jitter-ms", type=float, default=0.0)
+    p.add_argument("--throttle-every", type=int, default=None, help="fake Graph answers every Nth request with 429 (default 0, soak 50)")
+    p.add_argument("--retry-after", type=float, default=0.0)
+    p.add_argument("--rate-per-sec", type=float, default=10000.0, help="RATE_PER_SEC for the Graph client limiter")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--out", help="write JSON results to this path")
+    p.add_argument("--baseline", help="compare against a previous JSON result; exit 1 on regression")
+    p.add_argument("--threshold", type=float, default=0.15, help="relative tolerance for throughput/latency")
+    p.add_argument("--max-errors", type=int, default=None, help="exit 1 if the run has more errors than this")
+    soak_opts = p.add_argument_group("soak mode")
+    soak_opts.add_argument("--soak", action="store_true", help="long run with churn; fail on steady resource/latency growth")
+    soak_opts.add_argument("--sample-every", type=float, default=30.0, help="seconds between resource/latency samples")
+    soak_opts.add_argument("--sse-every", type=float, default=1.0, help="seconds between new SSE connections (held 0.5-5s)")
+    soak_opts.add_argument("--key-churn-sec", type=float, default=10.0, help="rotate one API key via the admin API")
+    soak_opts.add_argument("--token-rotate-sec", type=float, default=15.0, help="rotate one profile's access token")
+    soak_opts.add_argument("--settle", type=float, default=0.2, help="fraction of samples ignored as warm-up")
+    args = p.parse_args(argv)
+    if args.throttle_every is None:
+        args.throttle_every = 50 if args.soak else 0
+
+    if args.soak:
+        res = soak(args)
+        print(f"churn {res['churn']}  graph {res['graph']}  samples {len(res['samples'])}")
+        _write(args.out, res)
+        if res["problems"]:
+            print("SOAK FAIL:")
+            for line in res["problems"]:
+                print(f"  {line}")
+            return 1
+        print("soak ok: no steady growth")
+        return 0
+
+    res = run(args)
+    _print_report(res)
+    _write(args.out, res)
+    if args.max_errors is not None and res["errors"] > args.max_errors:
+        print(f"FAIL: {res['errors']} errors (max {args.max_errors})")
+        return 1
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        problems = compare(res, base, args.threshold)
+        if problems:
+            print("REGRESSIONS vs baseline:")
+            for line in problems:
+                print(f"  {line}")
+            return 1
+        print("no regressions vs baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,226 @@
+"""
+Hot-path microbenchmarks (in-process, no network, no DB).
+Usage:
+  python -m benchmarks.micro                       # run all cases
+  python -m benchmarks.micro validate              # run cases whose name contains 'validate'
+  python -m benchmarks.micro --save                # write benchmarks/micro_baseline.json
+  python -m benchmarks.micro --compare             # compare with the saved baseline; exit 1 on regression
+
+Runner: each case is warmed up, then timed `--repeat` times with an auto-ranged loop
+(GC disabled by timeit, process pinned to one CPU where supported). The median is reported;
+the fastest run (least scheduler noise) is what baselines store and compare. Baselines are
+only comparable on the same machine and Python.
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import platform
+import statistics
+from typing import Any, Callable, Dict, List, Tuple
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("TOOL_SCHEMA_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app", "tools")))
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "micro_baseline.json")
+
+
+def bench(fn: Callable[[], object], *, repeat: int = 7, min_time: float = 0.2) -> Dict[str, float]:
+    """Median/min ns per call over `repeat` timed runs of an auto-ranged loop."""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    runs = [t / number * 1e9 for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "median_ns": statistics.median(runs),
+        "min_ns": min(runs),
+        "stdev_pct": statistics.pstdev(runs) / statistics.mean(runs) * 100,
+        "loops": number,
+    }
+
+
+def _graph_task(i: int) -> Dict[str, Any]:
+    # Shape of a real Graph todoTask (full representation, as returned without $select)
+    return {
+        "@odata.etag": f'W/"vVi0cU3{i}"',
+        "importance": "normal",
+        "isReminderOn": True,
+        "status": "notStarted",
+        "title": f"Prepare meeting notes {i}",
+        "createdDateTime": "2025-11-20T01:02:03.1234567Z",
+        "lastModifiedDateTime": "2025-11-21T04:05:06.7654321Z",
+        "hasAttachments": False,
+        "categories": [],
+        "id": f"AAMkAGI2TG93AAA{i:06d}",
+        "body": {"content": "", "contentType": "text"},
+        "dueDateTime": {"dateTime": "2025-12-01T00:00:00.0000000", "timeZone": "UTC"},
+        "reminderDateTime": {"dateTime": "2025-11-30T23:00:00.0000000", "timeZone": "UTC"},
+    }
+
+
+def _request(headers: Dict[str, str], query: str = ""):
+    from starlette.requests import Request
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/mcp",
+        "query_string": query.encode(),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    }
+    return Request(scope)
+
+
+def _populate_metrics() -> None:
+    """Fill the global registry to roughly production cardinality (every tool × status, Graph routes)."""
+    import app.adapter_graph_rest  # noqa: F401  (registers graph_* families)
+    from app.main import _inc, _observe, _observe_hist
+    from app.metrics import METRICS
+    from app.tools import REGISTRY
+
+    for tool in REGISTRY.by_name:
+        for status in ("ok", "invalid_params", "forbidden", "type_error", "server_error"):
+            _inc("mcp_requests_total", method="tools/call", tool=tool, status=status)
+            _observe_hist("mcp_http_request_duration_ms", 42, endpoint="tools/call", status=status, tool=tool)
+        _observe("mcp_tool_duration_ms", 42, tool=tool)
+        _observe_hist("mcp_tool_call_duration_ms", 42, tool=tool)
+    for endpoint in ("initialize", "tools/list"):
+        _inc("mcp_requests_total", method=endpoint, tool="", status="ok")
+        _observe_hist("mcp_http_request_duration_ms", 3, endpoint=endpoint, status="ok", tool="")
+    routes = ["/me/todo/lists", "/me/todo/lists/{id}", "/me/todo/lists/{id}/tasks", "/me/todo/lists/{id}/tasks/{id}",
+              "/me/todo/lists/delta", "/me/todo/lists/{id}/tasks/delta", "/$batch"]
+    for route in routes:
+        for method in ("GET", "POST", "PATCH", "DELETE"):
+            METRICS.get("graph_request_duration_ms").observe(80, route=route, method=method)
+            for status in ("200", "201", "204", "404", "429", "503"):
+                METRICS.get("graph_responses_total").inc(route=route, method=method, status=status)
+        METRICS.get("graph_response_bytes").observe(4096, route=route)
+
+
+def _cases() -> List[Tuple[str, Callable[[], object]]]:
+    import jsonschema
+    from app.adapter_graph_rest import _project_task
+    from app.main import JsonRpcRequest, _get_provided_key, _observe_hist, _render_metrics
+    from app.tools import REGISTRY, TOOLS_BY_NAME, _call_tool, validate_params_by_schema
+
+    patch_schema = TOOLS_BY_NAME["todo.tasks.patch"]["inputSchema"]
+    create_schema = TOOLS_BY_NAME["todo.tasks.create"]["inputSchema"]
+    patch_args = {"list_id": "L1", "task_id": "T1", "mode": "snooze", "remind_at_iso": "2025-12-01T09:00:00", "tz": "UTC"}
+    create_args = {"list_id": "L1", "title": "Prepare meeting", "due": "2025-12-01T09:00:00", "importance": "high"}
+
+    task = _graph_task(1)
+    page = [_graph_task(i) for i in range(100)]
+
+    req_header = _request({"x-api-key": "k" * 32})
+    req_bearer = _request({"authorization": "Bearer " + "k" * 32})
+    req_query = _request({"cookie": "session=abc"}, "api_key=" + "k" * 32)
+
+    rpc_call = {"jsonrpc": "2.0", "id": 7, "method": "tools/call",
+                "params": {"name": "todo.tasks.create", "arguments": create_args}}
+    rpc_list = {"jsonrpc": "2.0", "id": 8, "method": "tools/list"}
+
+    _populate_metrics()
+
+    # _call_tool around a canned executor: measures validation + result wrapping, not Graph
+    tool = "todo.lists.get"
+    canned: Dict[str, Any] = {"value": [{"id": f"L{i}", "displayName": f"List {i}"} for i in range(10)]}
+    prepared = {"content": [{"type": "text", "text": "ok"}], "isError": False}
+    results = {"dict": canned, "str": "task completed", "prepared": prepared}
+    current = ["dict"]
+    REGISTRY.executors[tool] = lambda p: results[current[0]]  # benchmark process only
+
+    def call_tool(kind: str) -> Callable[[], object]:
+        def run() -> object:
+            current[0] = kind
+            return _call_tool(tool, {})
+        return run
+
+    return [
+        ("project_task.one", lambda: _project_task(task)),
+        ("project_task.page100", lambda: [_project_task(t) for t in page]),
+        ("validate.patch.compiled", lambda: validate_params_by_schema(patch_args, patch_schema)),
+        ("validate.patch.legacy", lambda: jsonschema.validate(patch_args, patch_schema)),
+        ("validate.create.compiled", lambda: validate_params_by_schema(create_args, create_schema)),
+        ("validate.create.legacy", lambda: jsonschema.validate(create_args, create_schema)),
+        ("provided_key.header", lambda: _get_provided_key(req_header, "k" * 32, None)),
+        ("provided_key.bearer", lambda: _get_provided_key(req_bearer, None, req_bearer.headers.get("authorization"))),
+        ("provided_key.query", lambda: _get_provided_key(req_query, None, None)),
+        ("jsonrpc.validate.call", lambda: JsonRpcRequest.model_validate(rpc_call)),
+        ("jsonrpc.validate.list", lambda: JsonRpcRequest.model_validate(rpc_list)),
+        ("metrics.observe_hist", lambda: _observe_hist("mcp_http_request_duration_ms", 42, endpoint="tools/call", status="ok", tool=tool)),
+        ("metrics.render", _render_metrics),
+        ("call_tool.wrap_dict", call_tool("dict")),
+        ("call_tool.wrap_str", call_tool("str")),
+        ("call_tool.passthrough", call_tool("prepared")),
+    ]
+
+
+def _pin_cpu() -> None:
+    try:
+        os.sched_setaffinity(0, {sorted(os.sched_getaffinity(0))[0]})
+    except (AttributeError, OSError):
+        pass
+
+
+def compare(current: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """Cases slower than baseline by more than `threshold` (relative, on the fastest run)."""
+    return [
+        f"{name}: {baseline[name] / 1000:.2f} -> {ns / 1000:.2f} us/op ({ns / baseline[name] - 1:+.1%})"
+        for name, ns in current.items()
+        if name in baseline and ns > baseline[name] * (1 + threshold)
+    ]
+
+
+def main(argv: List[str]) -> int:
+    p = argparse.ArgumentParser(prog="python -m benchmarks.micro")
+    p.add_argument("filter", nargs="?", default="", help="only cases whose name contains this substring")
+    p.add_argument("--repeat", type=int, default=7)
+    p.add_argument("--min-time", type=float, default=0.2, help="seconds per timed run")
+    p.add_argument("--save", nargs="?", const=BASELINE_PATH, help=f"write per-case fastest ns/op as baseline (default {os.path.relpath(BASELINE_PATH)})")
+    p.add_argument("--compare", nargs="?", const=BASELINE_PATH, help="compare against a baseline; exit 1 on regression")
+    p.add_argument("--threshold", type=float, default=0.15, help="relative slowdown that counts as a regression")
+    args = p.parse_args(argv)
+
+    _pin_cpu()
+    baseline: Dict[str, float] = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["cases"]
+    t0 = time.perf_counter()
+    fastest: Dict[str, float] = {}
+    for name, fn in _cases():
+        if args.filter and args.filter not in name:
+            continue
+        fn()  # warm caches (compiled validators, metric series, pydantic core)
+        r = bench(fn, repeat=args.repeat, min_time=args.min_time)
+        fastest[name] = r["min_ns"]
+        vs = f"  [{r['min_ns'] / baseline[name] - 1:+6.1%} vs baseline]" if name in baseline else ""
+        print(f"{name:<36} {r['median_ns'] / 1000:>10.2f} us/op  (min {r['min_ns'] / 1000:.2f} us, ±{r['stdev_pct']:.1f}%, loops {r['loops']}){vs}")
+    print(f"# done in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "cases": {k: round(v, 1) for k, v in fastest.items()},  # min ns/op
+            }, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"# baseline written to {args.save}", file=sys.stderr)
+    if args.compare:
+        problems = compare(fastest, baseline, args.threshold)
+        if problems:
+            print("REGRESSIONS vs baseline:")
+            for line in problems:
+                print(f"  {line}")
+            return 1
+        print("no regressions vs baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,64 @@
+"""
+Cold-start benchmark: time to import app.main and serve the first tools/list,
+each in a fresh interpreter, with and without the precompiled registry bundle.
+Usage:
+  python -m benchmarks.startup [--runs 5]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+_PROBE = r"""
+import time, json, sys
+t0 = time.perf_counter()
+import app.main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as c:
+    r = c.post("/mcp", json={"jsonrpc": "2.0", "id": 1, "method": "tools/list"}, headers={"x-api-key": "bench"})
+    assert r.status_code == 200, r.status_code
+t2 = time.perf_counter()
+from app.tools import REGISTRY
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "first_list_ms": (t2 - t0) * 1000, "registry": REGISTRY.source,
+                  "lazy": {m: m in sys.modules for m in ("jsonschema", "sqlalchemy", "sentry_sdk")}}))
+"""
+
+
+def _run(env: dict) -> dict:
+    out = subprocess.run([sys.executable, "-c", _PROBE], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv: list) -> int:
+    p = argparse.ArgumentParser(prog="python -m benchmarks.startup")
+    p.add_argument("--runs", type=int, default=5)
+    args = p.parse_args(argv)
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    with tempfile.TemporaryDirectory() as tmp:
+        base = dict(os.environ, PYTHONPATH=root, API_KEY="bench", LOG_LEVEL="WARNING",
+                    DB_URL=f"sqlite:///{tmp}/startup.db")
+        bundle = os.path.join(tmp, "registry.bundle.json")
+        subprocess.run([sys.executable, "-m", "app.registry", "build", "--out", bundle], env=base, check=True,
+                       capture_output=True)
+        modes = {
+            "schemas": dict(base, TOOL_REGISTRY_BUNDLE=os.path.join(tmp, "missing.json")),
+            "bundle": dict(base, TOOL_REGISTRY_BUNDLE=bundle),
+        }
+        for mode, env in modes.items():
+            runs = [_run(env) for _ in range(args.runs)]
+            print(json.dumps({
+                "mode": mode,
+                "registry": runs[-1]["registry"],
+                "import_ms_median": round(statistics.median(r["import_ms"] for r in runs), 1),
+                "first_list_ms_median": round(statistics.median(r["first_list_ms"] for r in runs), 1),
+                "loaded_after_first_list": runs[-1]["lazy"],
+            }))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -5,6 +5,11 @@ Usage:
 """
 import os
 import os.path
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
 
 # ensure defaults for local run (DB-only)
 os.environ.setdefault("API_KEY", "test-key")
@@ -46,6 +51,10 @@ def main():
     must(r.status_code == 200, f"/mcp/manifest expected 200, got {r.status_code}")
     j = r.json()
     must(isinstance(j.get("tools"), list), "manifest tools missing")
+    etag = r.headers.get("etag")
+    must(bool(etag), "manifest ETag missing")
+    r = client.get("/mcp/manifest", headers={"x-api-key": os.environ["API_KEY"], "if-none-match": etag})
+    must(r.status_code == 304, f"/mcp/manifest If-None-Match expected 304, got {r.status_code}")
 
     # 4) JSON-RPC initialize
     payload = {"jsonrpc": "2.0", "id": 1, "method": "initialize"}
@@ -68,6 +77,103 @@ def main():
     j = r.json()
     must(j.get("error", {}).get("code") == -32602, "tools/call invalid param code mismatch")
 
+    # 7) JSON-RPC batch: responses in request order, notifications omitted
+    payload = [
+        {"jsonrpc": "2.0", "id": "a", "method": "tools/list", "params": {}},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "id": "b", "method": "initialize"},
+    ]
+    r = client.post("/mcp", headers={"x-api-key": os.environ["API_KEY"]}, json=payload)
+    must(r.status_code == 200, f"/mcp batch expected 200, got {r.status_code}")
+    j = r.json()
+    must(isinstance(j, list) and [x.get("id") for x in j] == ["a", "b"], "batch responses out of order or notification answered")
+
+    # 8) restricted key: tools outside its allowed_tools are refused (-32601) on tools/call
+    master = {"x-api-key": os.environ["API_KEY"]}
+    r = client.post("/admin/api-keys", headers=master, json={"template": "custom", "allowed_tools": ["todo.lists.get"]})
+    must(r.status_code == 200, f"/admin/api-keys expected 200, got {r.status_code}")
+    restricted = {"x-api-key": r.json()["api_key"]}
+    payload = {"jsonrpc": "2.0", "id": 4, "method": "tools/call", "params": {"name": "todo.tasks.create", "arguments": {"list_id": "x", "title": "t"}}}
+    r = client.post("/mcp", headers=restricted, json=payload)
+    must(r.json().get("error", {}).get("code") == -32601, "restricted key called a tool outside allowed_tools")
+    # ... and a key with no role and an empty allowed_tools can call nothing
+    r = client.patch(f"/admin/api-keys/{restricted['x-api-key']}", headers=master, json={"allowed_tools": [], "role": ""})
+    must(r.status_code == 200, f"PATCH /admin/api-keys expected 200, got {r.status_code}")
+    payload = {"jsonrpc": "2.0", "id": 5, "method": "tools/call", "params": {"name": "todo.lists.get", "arguments": {}}}
+    r = client.post("/mcp", headers=restricted, json=payload)
+    must(r.json().get("error", {}).get("code") == -32601, "key without any grant was allowed to call a tool")
+    client.delete(f"/admin/api-keys/{restricted['x-api-key']}", headers=master)
+
+    # 9) coordination (COORD_BACKEND=sqlite): two workers on one file share token buckets and breakers
+    from app.coordination import SQLiteBackend
+    path = os.path.join(tempfile.mkdtemp(), "coord.db")
+    w1, w2 = SQLiteBackend(path), SQLiteBackend(path)
+    must(w1.reserve("smoke", 0.01, 2) == 0.0 and w2.reserve("smoke", 0.01, 2) == 0.0, "burst tokens not granted")
+    must(w1.reserve("smoke", 0.01, 2) > 0, "reservation past the shared burst was not rate-limited")
+    must(not w1.record("smoke", False, 2, 60.0) and w2.record("smoke", False, 2, 60.0), "breaker did not open on a failure streak spread over workers")
+    must(w1.open_until("smoke") > time.time(), "breaker opened by one worker is not visible to the other")
+
+    # 10) invalidation: an event published by another process reaches every subscriber here exactly once
+    from app import invalidation
+    got = []
+    unsubscribe = [invalidation.subscribe("token", lambda k, n=n: got.append((n, k))) for n in (1, 2)]
+    invalidation.poll()  # the first poll only places the cursor at the head
+    nonce = uuid.uuid4().hex
+    code = f"from app import invalidation; invalidation.publish('token', {nonce!r}, apply_local=False)"
+    subprocess.run([sys.executable, "-c", code], check=True, env=os.environ.copy())
+    must(invalidation.poll() >= 1, "poll applied no event from the other process")
+    must(sorted(x for x in got if x[1] == nonce) == [(1, nonce), (2, nonce)], "remote event did not reach both subscribers")
+    must(invalidation.poll() == 0, "an already applied event was delivered again")
+    invalidation.publish("token", nonce + "-own")
+    must(invalidation.poll() == 0, "this process's own event was re-applied by the poller")
+    for unsub in unsubscribe:
+        unsub()
+
+    # 11) affinity: a worker leaving the ring moves only its own keys (to their next rank), and they return with it
+    from app.affinity import AffinityRouter, rank
+    router = AffinityRouter([f"http://w{i}" for i in range(4)])
+    keys = [f"k:{i}" for i in range(1000)]
+    before = {k: router.candidates(k)[0] for k in keys}
+    router.mark_down("http://w1")
+    after = {k: router.candidates(k)[0] for k in keys}
+    moved = {k for k in keys if after[k] != before[k]}
+    must(bool(moved) and moved == {k for k in keys if before[k] == "http://w1"}, "rebalance moved keys owned by healthy workers")
+    must(all(after[k] == rank(k, router.upstreams)[1] for k in moved), "moved keys did not go to their next-ranked worker")
+    router.mark_up("http://w1")
+    must(all(router.candidates(k)[0] == before[k] for k in keys), "keys did not move back when the worker returned")
+
+    # 12) SSE ring buffer: overflow drops the oldest frames; Last-Event-ID replays what is still buffered
+    from app.sse import SseHub
+    channel = SseHub(buffer_size=4, ttl_sec=60.0, max_channels=8).channel("smoke")
+    ids = [channel.publish(f"e{i}") for i in range(1, 7)]
+    must(channel.dropped == 2, f"expected 2 dropped frames, got {channel.dropped}")
+
+    def replay(last_id):
+        return [d for _, d in channel.since(channel.resume_seq(last_id))]
+
+    must(replay(ids[3]) == ["e5", "e6"], "Last-Event-ID did not replay exactly the missed frames")
+    must(replay(ids[0]) == ["e3", "e4", "e5", "e6"], "resume from an evicted id must replay the whole buffer")
+    must(replay("0000-3") == ["e3", "e4", "e5", "e6"], "id from another channel epoch must replay the whole buffer")
+    must(replay(None) == [], "a new subscriber was sent a replay")
+
+    # 13) sessions: an idle Mcp-Session-Id expires and is refused with 404 (client must re-initialize)
+    from app import main as server
+    r = client.post("/mcp", headers=master, json={"jsonrpc": "2.0", "id": 6, "method": "initialize"})
+    sid = r.headers.get("mcp-session-id")
+    must(bool(sid), "initialize did not issue an Mcp-Session-Id")
+    payload = {"jsonrpc": "2.0", "id": 7, "method": "tools/list", "params": {}}
+    r = client.post("/mcp", headers={**master, "mcp-session-id": sid}, json=payload)
+    must(r.status_code == 200, f"/mcp with a live session expected 200, got {r.status_code}")
+    live = len(server._sessions)
+    ttl, server._sessions.ttl_sec = server._sessions.ttl_sec, 0.0
+    try:
+        time.sleep(0.01)
+        r = client.post("/mcp", headers={**master, "mcp-session-id": sid}, json=payload)
+    finally:
+        server._sessions.ttl_sec = ttl
+    must(r.status_code == 404, f"/mcp with an expired session expected 404, got {r.status_code}")
+    must(len(server._sessions) == live - 1, "expired session was not closed")
+
     print("SMOKE OK")
 
 